@@ -4,6 +4,12 @@ import create_shopping_list
 import send_ingredients_to_openai
 import move_temp_to_trash
 import process_recipe
+from page_cache import get_page_cache
+from strategy_cache import get_strategy_cache
+from llm_cache import get_llm_cache
+from llm_providers import get_provider_router
+from model_cascade import get_model_cascade
+from aisle_classifier import get_aisle_classifier
 from modify_recipe import modify_recipe  # Import modify_recipe correctly
 
 # Get the root directory of the application (the directory where this script is located)
@@ -13,6 +19,24 @@ root_directory = os.path.dirname(os.path.abspath(__file__))
 temp_folder_path = os.path.join(root_directory, 'temp')
 trash_folder_path = os.path.join(root_directory, 'trash')
 
+def process_and_modify(recipe_input):
+    """Process one recipe input, a list of URLs, a folder of images or a scanned document as a single batch, and let the user modify each result."""
+    if isinstance(recipe_input, list):
+        json_file_paths = process_recipe.process_recipes(recipe_input)
+    elif process_recipe.is_valid_directory(recipe_input):
+        json_file_paths = process_recipe.process_image_folder(recipe_input)
+    elif process_recipe.is_multipage_document(recipe_input):
+        json_file_paths = process_recipe.process_document(recipe_input)
+    else:
+        json_file_paths = [process_recipe.process_recipe(recipe_input)]
+
+    for json_file_path in json_file_paths:
+        # Modify the recipe JSON file as needed
+        if json_file_path:  # Check if a valid path was returned
+            modify_recipe(json_file_path)
+        else:
+            print("No JSON file path returned from process_recipe.")
+
 def main():
     # Load environment variables
     load_dotenv()
@@ -38,14 +62,8 @@ def main():
         # Check if recipe_input is valid (not None or empty)
         if recipe_input:
             try:
-                # Process the recipe input and get the JSON file path
-                json_file_path = process_recipe.process_recipe(recipe_input)
-                
-                # Modify the recipe JSON file as needed
-                if json_file_path:  # Check if a valid path was returned
-                    modify_recipe(json_file_path)
-                else:
-                    print("No JSON file path returned from process_recipe.")
+                # Process the recipe input(s) and modify the resulting JSON files
+                process_and_modify(recipe_input)
             except Exception as e:
                 print(f"Error processing recipe input: {e}")
                 break
@@ -63,15 +81,17 @@ def main():
         # Otherwise, process the next recipe input
         if next_action:
             try:
-                json_file_path = process_recipe.process_recipe(next_action)
-                if json_file_path:  # Check if a valid path was returned
-                    modify_recipe(json_file_path)
-                else:
-                    print("No JSON file path returned from process_recipe.")
+                process_and_modify(process_recipe.split_recipe_urls(next_action) or next_action)
             except Exception as e:
                 print(f"Error processing next recipe input: {e}")
                 break
 
+    # Report how many recipe pages and LLM answers were served from the on-disk caches, and which scraping tier each site needs
+    get_page_cache().print_stats()
+    get_strategy_cache().print_stats()
+    get_llm_cache().print_stats()
+    get_provider_router().print_stats()
+
     # Call the function to create a shopping list once the loop ends
     print("Creating shopping list...")
     try:
@@ -85,6 +105,10 @@ def main():
     except Exception as e:
         print(f"Error creating shopping list or sending ingredients: {e}")
 
+    # Report how often the cheaper models' answers were good enough, including the shopping list merge
+    get_model_cascade().print_stats()
+    get_aisle_classifier().print_stats()
+
     # Move temporary files to trash
     try:
         move_temp_to_trash.move_temp_to_trash()
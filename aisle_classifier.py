@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import difflib
+import threading
+from disk_cache import cache_folder_path
+from ingredient_parser import AISLES, AISLE_KEYWORDS
+
+# Where learned aisles are kept between runs
+AISLE_INDEX_PATH = os.path.join(cache_folder_path, 'aisle_index.json')
+
+# How similar an unknown word must be to a known one (0-1) to be treated as a misspelling of it. Only words
+# of at least FUZZY_MIN_LENGTH letters are corrected, and only toward known words of at least that length and
+# within one letter of their own, as short words are too easily one letter away from an unrelated one ('sport' and 'port').
+FUZZY_CUTOFF = 0.85
+FUZZY_MIN_LENGTH = 5
+
+# Ingredients the keyword list in ingredient_parser does not cover, or places in the wrong aisle
+CURATED_AISLES = [
+    ("Produce", ['bean sprout', 'green bean', 'runner bean', 'broad bean', 'sweet potato',
+                 'red onion', 'garlic clove', 'fresh ginger', 'chive', 'dill', 'sage', 'tarragon', 'lemongrass',
+                 'beetroot', 'radish', 'fennel', 'asparagus', 'sweetcorn', 'corn on the cob', 'rocket', 'watercress',
+                 'pear', 'grape', 'strawberry', 'raspberry', 'blueberry', 'mango', 'pineapple', 'peach', 'plum',
+                 'cherry tomato', 'jalapeno', 'parsnip', 'turnip', 'swede', 'okra', 'edamame']),
+    ("Fresh meats", ['chicken breast', 'chicken thigh', 'minced beef', 'beef mince', 'pork mince', 'lamb mince',
+                     'pork belly', 'pork chop', 'lamb chop', 'haddock', 'mackerel', 'trout', 'sea bass', 'scallop',
+                     'mussel', 'squid', 'crab']),
+    ("Cooked Meats", ['smoked salmon', 'cooked ham', 'parma ham', 'serrano ham', 'pastrami', 'corned beef']),
+    ("Milk/Butter/Cream/Cheese/Yoghurts", ['double cream', 'single cream', 'sour cream', 'buttermilk', 'halloumi',
+                                          'gruyere', 'brie', 'goat cheese', 'paneer', 'ghee', 'margarine']),
+    ("Eggs/Sugar/Bread/Baking goods", ['caster sugar', 'icing sugar', 'brown sugar', 'self raising flour',
+                                       'plain flour', 'baking paper', 'pitta', 'naan', 'bun', 'baguette',
+                                       'gelatine', 'food colouring']),
+    ("Oil/Jam/Tinned fruit/Honey/Spices/Stock", ['black pepper', 'white pepper', 'red pepper flake', 'stock cube',
+                                                 'garam masala', 'curry powder', 'chilli powder', 'chili powder',
+                                                 'cayenne', 'coriander seed', 'cumin seed', 'fennel seed',
+                                                 'mustard seed', 'cardamom', 'clove', 'star anise', 'saffron',
+                                                 'allspice', 'five spice', 'smoked paprika', 'maple syrup',
+                                                 'golden syrup', 'olive oil', 'sesame oil', 'marmalade',
+                                                 'ground ginger', 'ground coriander', 'ground cinnamon',
+                                                 'ground cumin', 'ground nutmeg', 'ground turmeric', 'ground clove']),
+    ("Sauces/Mayonnaise/Pickles/Rice/Pulses", ['fish sauce', 'oyster sauce', 'hoisin', 'worcestershire sauce',
+                                               'tahini', 'pesto', 'harissa', 'sriracha', 'caper', 'gherkin',
+                                               'basmati', 'arborio', 'quinoa', 'couscous', 'bulgur']),
+    ("Tinned Foods/Pasta/Soups", ['chopped tomato', 'tinned tomato', 'canned tomato', 'tomato paste', 'tomato puree',
+                                  'fusilli', 'rigatoni', 'tagliatelle', 'lasagne', 'orzo', 'gnocchi', 'egg noodle',
+                                  'rice noodle', 'kidney bean', 'baked bean']),
+    ("Dried fruits, seeds & nuts", ['sesame seed', 'sunflower seed', 'pumpkin seed', 'chia seed', 'flaxseed',
+                                    'desiccated coconut', 'cranberry', 'prune', 'fig', 'ground almond']),
+    ("Coffee/Cereal", ['porridge oat', 'rolled oat', 'muesli', 'cornflake']),
+    ("Biscuits/Chocolate/Sweets/Tea", ['dark chocolate', 'milk chocolate', 'white chocolate', 'chocolate chip',
+                                       'digestive', 'shortbread', 'green tea', 'sprinkle']),
+    ("Fizzy drinks/Crackers/Nuts/Crisps", ['crisp', 'cracker', 'tortilla chip', 'cola', 'lemonade', 'tonic',
+                                           'soda water', 'ginger beer', 'salted peanut', 'pretzel']),
+    ("Cordials/Bottled water", ['sparkling water', 'elderflower cordial']),
+    ("Wine/Beer/Cider", ['red wine', 'white wine', 'port', 'gin', 'whisky', 'whiskey', 'stout', 'ale']),
+]
+
+# Learned aisles are ignored for these, since they say nothing about where an ingredient is bought
+_UNLEARNABLE_AISLES = ('other', 'unknown')
+_AISLE_LOOKUP = {aisle.lower(): aisle for aisle in AISLES}
+_WORD_RE = re.compile(r"[a-z]+")
+
+def singularise(word):
+    """Reduce a plural word to its singular form with simple English rules ('tomatoes' -> 'tomato')."""
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+def ingredient_tokens(name):
+    """Split an ingredient name into lowercase, singular words, without notes in brackets or after a comma.
+
+    Preparation words are kept: 'chopped tomatoes' and 'minced beef' are bought in different aisles than
+    'tomatoes' and 'beef'.
+    """
+    name = re.sub(r'\([^)]*\)', ' ', str(name)).split(',')[0]
+    return tuple(singularise(word) for word in _WORD_RE.findall(name.lower()))
+
+class AisleClassifier:
+    """Assigns ingredients to shopping aisles locally, so no model call is needed for it.
+
+    Known ingredient names are kept in a trie of words. A name is looked up by finding every known phrase in it;
+    the phrase that ends closest to the end of the name wins, since that is usually the noun ('chicken stock' is
+    stock), and ties go to the longer phrase. Words that match nothing are compared to the known words with
+    difflib to catch misspellings. A learned aisle replaces the keyword or curated aisle of the same name.
+
+    Args:
+        index_path (str, optional): The JSON file holding the learned aisles.
+    """
+
+    def __init__(self, index_path=AISLE_INDEX_PATH):
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        self._trie = {}
+        self._words = {}           # Word length -> known words of that length
+        self._results = {}
+        self._learned = self._load_learned()
+        self.stats = {'learned': 0, 'matched': 0, 'fuzzy': 0, 'other': 0}
+
+        for aisles in (AISLE_KEYWORDS, CURATED_AISLES):
+            for aisle, names in aisles:
+                for name in names:
+                    self._insert(ingredient_tokens(name), aisle, learned=False)
+        for key, votes in self._learned.items():
+            self._insert(tuple(key.split()), max(votes, key=votes.get), learned=True)
+
+    def _load_learned(self):
+        """Load the learned aisles ({ingredient: {aisle: times seen}}), starting empty if the file is missing or unreadable."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_learned(self):
+        """Write the learned aisles atomically so a crash never leaves the file half written."""
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._learned, file)
+        os.replace(tmp_path, self.index_path)
+
+    def _insert(self, tokens, aisle, learned):
+        """Add a phrase to the trie. A keyword already in the trie keeps its first aisle; a learned aisle replaces it."""
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            self._words.setdefault(len(token), set()).add(token)
+            node = node.setdefault(token, {})
+        if learned or None not in node:
+            node[None] = (aisle, learned)
+
+    def _match(self, tokens):
+        """Find the best known phrase in a sequence of words.
+
+        Returns:
+            tuple or None: (aisle, learned) for the phrase ending last, or the longest of those.
+        """
+        best = None
+        for start in range(len(tokens)):
+            node = self._trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node:
+                    score = (end, end - start)
+                    if best is None or score > best[0]:
+                        best = (score, node[None])
+        return best[1] if best else None
+
+    def classify(self, ingredient_name):
+        """Return the shopping aisle of an ingredient, or 'Other' if nothing about its name is known."""
+        with self._lock:
+            aisle = self._results.get(ingredient_name)
+            if aisle is not None:
+                return aisle
+
+            tokens = ingredient_tokens(ingredient_name)
+            match = self._match(tokens)
+            if match is not None:
+                aisle = match[0]
+                self.stats['learned' if match[1] else 'matched'] += 1
+            else:
+                corrected = tuple(self._correct(token) for token in tokens)
+                match = self._match(corrected) if corrected != tokens else None
+                aisle = match[0] if match else "Other"
+                self.stats['fuzzy' if match else 'other'] += 1
+            self._results[ingredient_name] = aisle
+            return aisle
+
+    def _correct(self, token):
+        """Return the known word a long enough word is most likely a misspelling of, or the word itself."""
+        if len(token) < FUZZY_MIN_LENGTH:
+            return token
+        candidates = [word for length in range(max(len(token) - 1, FUZZY_MIN_LENGTH), len(token) + 2) for word in self._words.get(length, ())]
+        return (difflib.get_close_matches(token, candidates, n=1, cutoff=FUZZY_CUTOFF) or [token])[0]
+
+    def learn(self, ingredient_name, aisle, save=True):
+        """Remember the aisle of an ingredient, e.g. a correction. The aisle seen most often for a name is the one used.
+
+        Returns:
+            bool: True if the aisle was recorded, False if it is not one of the known aisles.
+        """
+        aisle = _AISLE_LOOKUP.get(str(aisle).strip().lower())
+        tokens = ingredient_tokens(ingredient_name)
+        if aisle is None or aisle.lower() in _UNLEARNABLE_AISLES or not tokens:
+            return False
+        key = ' '.join(tokens)
+        with self._lock:
+            votes = self._learned.setdefault(key, {})
+            votes[aisle] = votes.get(aisle, 0) + 1
+            self._insert(tokens, max(votes, key=votes.get), learned=True)
+            self._results.clear()
+            if save:
+                self._save_learned()
+        return True
+
+    def fill_aisles(self, ingredients):
+        """Give every ingredient whose aisle is missing, 'Unknown' or not one of the known aisles a local aisle.
+
+        Returns:
+            int: How many aisles were filled in.
+        """
+        filled = 0
+        for ingredient in ingredients:
+            aisle = _AISLE_LOOKUP.get(str(ingredient.get('aisle', '')).strip().lower())
+            if aisle is None:
+                ingredient['aisle'] = self.classify(ingredient.get('ingredient', ''))
+                filled += 1
+            elif aisle != ingredient['aisle']:
+                ingredient['aisle'] = aisle
+        return filled
+
+    def print_stats(self):
+        """Print how the ingredients classified so far were matched."""
+        total = sum(self.stats.values())
+        if total:
+            print(f"Aisle classifier: {total} ingredient names, {self.stats['learned']} from learned aisles, "
+                  f"{self.stats['matched']} from the ingredient list, {self.stats['fuzzy']} by fuzzy match, "
+                  f"{self.stats['other']} unknown (Other).")
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_aisle_classifier():
+    """Return the shared aisle classifier, building its index on first use."""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = AisleClassifier()
+        return _classifier
+
+# Example usage:
+# get_aisle_classifier().classify('2 tins chopped tomatoes')  # 'Tinned Foods/Pasta/Soups'
+# get_aisle_classifier().learn('samphire', 'Produce')
@@ -0,0 +1,68 @@
+import os
+import sys
+import glob
+import time
+from ocr_engine import ENGINES
+from scrape_text_from_image import preprocess_image, IMAGE_EXTENSIONS
+
+def load_images(images_directory):
+    """Preprocess every image in a folder once, so only the OCR step is timed."""
+    paths = sorted(path for path in glob.glob(os.path.join(images_directory, '*')) if path.lower().endswith(IMAGE_EXTENSIONS))
+    return [(os.path.basename(path), preprocess_image(path)) for path in paths]
+
+def benchmark_engine(name, images):
+    """OCR every image with one engine.
+
+    Returns:
+        dict: The engine start-up time, per-image OCR times and texts, or None if the engine is unavailable.
+    """
+    start = time.perf_counter()
+    try:
+        engine = ENGINES[name]()
+    except (ImportError, RuntimeError) as e:
+        print(f"{name}: unavailable ({e})")
+        return None
+    startup = time.perf_counter() - start
+
+    times, texts = [], []
+    for _, image in images:
+        start = time.perf_counter()
+        texts.append(engine.image_to_string(image))
+        times.append(time.perf_counter() - start)
+    engine.close()
+    return {'startup': startup, 'times': times, 'texts': texts}
+
+def run_benchmark(images_directory):
+    """Compare the in-process tesserocr engine with the pytesseract subprocess path on a fixed image set."""
+    images = load_images(images_directory)
+    if not images:
+        print(f"No images found in {images_directory}.")
+        return
+
+    print(f"Benchmarking OCR on {len(images)} images from {images_directory}.\n")
+    print(f"{'engine':<14}{'start-up (s)':>14}{'total OCR (s)':>15}{'per image (s)':>15}")
+    results = {}
+    for name in ENGINES:
+        result = benchmark_engine(name, images)
+        if result is None:
+            continue
+        results[name] = result
+        total = sum(result['times'])
+        print(f"{name:<14}{result['startup']:>14.3f}{total:>15.3f}{total / len(images):>15.3f}")
+
+    # Both engines run the same Tesseract model, so the text should match
+    if len(results) == 2:
+        differing = [images[i][0] for i, (a, b) in enumerate(zip(*(r['texts'] for r in results.values()))) if a.strip() != b.strip()]
+        if differing:
+            print(f"\nText differs between engines for: {', '.join(differing)}")
+        else:
+            print("\nBoth engines produced identical text for every image.")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_ocr.py /path/to/images")
+    else:
+        run_benchmark(sys.argv[1])
+
+# Example usage:
+# python benchmark_ocr.py /path/to/cookbook/photos
@@ -0,0 +1,86 @@
+import os
+import sys
+import glob
+import time
+import tracemalloc
+from parse_html import available_backends, make_soup
+from section_extractor import find_recipe_sections
+from page_cache import get_page_cache
+
+# The keywords and sufficiency rule used by scrape_with_beautifulsoup
+KEYWORDS = ["ingredients", "method", "instructions", "directions", "steps", "preparation"]
+
+def load_pages(pages_directory=None):
+    """Load the saved pages to benchmark.
+
+    Args:
+        pages_directory (str, optional): A folder of saved .html pages. Defaults to the pages stored in the page cache.
+
+    Returns:
+        list: (name, raw HTML bytes) for each page.
+    """
+    if pages_directory:
+        paths = sorted(glob.glob(os.path.join(pages_directory, '*.htm*')))
+    else:
+        pages_directory = get_page_cache().directory
+        paths = sorted(path for path in glob.glob(os.path.join(pages_directory, '*')) if not path.endswith('.json'))
+
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            pages.append((os.path.basename(path), file.read()))
+    return pages
+
+def benchmark_backend(pages, backend, targeted, repeat=3):
+    """Time parsing every page with one backend and measure the peak memory of a single parse.
+
+    Peak memory is measured with tracemalloc, so it covers the Python objects of the soup but not memory
+    allocated internally by C libraries (libxml2, lexbor) while they parse.
+
+    Returns:
+        dict: Total best-of-repeat parse time in seconds, worst peak memory in bytes and sections found.
+    """
+    total_time = 0.0
+    peak_memory = 0
+    sections_found = 0
+    for name, html in pages:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            make_soup(html, backend=backend, targeted=targeted)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        total_time += best
+
+        tracemalloc.start()
+        soup = make_soup(html, backend=backend, targeted=targeted)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        # Check the faster modes still find the same recipe sections
+        sections_found += len(find_recipe_sections(soup, KEYWORDS, lambda stats: stats.words > 10))
+
+    return {'time': total_time, 'peak_memory': peak_memory, 'sections': sections_found}
+
+def run_benchmark(pages_directory=None, repeat=3):
+    """Benchmark every installed backend, with and without targeted parsing, and print a comparison table."""
+    pages = load_pages(pages_directory)
+    if not pages:
+        print("No saved pages found to benchmark. Scrape a few recipes first or pass a folder of .html files.")
+        return
+
+    total_mb = sum(len(html) for _, html in pages) / (1024 * 1024)
+    print(f"Benchmarking {len(pages)} pages ({total_mb:.1f} MB), best of {repeat} runs per page.\n")
+    print(f"{'backend':<14}{'targeted':<10}{'parse time (s)':>16}{'peak memory (MB)':>18}{'sections':>10}")
+
+    for backend in available_backends():
+        for targeted in (False, True):
+            result = benchmark_backend(pages, backend, targeted, repeat=repeat)
+            print(f"{backend:<14}{str(targeted):<10}{result['time']:>16.3f}"
+                  f"{result['peak_memory'] / (1024 * 1024):>18.1f}{result['sections']:>10}")
+
+if __name__ == '__main__':
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
+
+# Example usage:
+# python benchmark_parsers.py /path/to/saved/pages
@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Get the root directory of the application (the directory where this script is located)
+root_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Where the accepted start-up time is kept, so later runs can be compared against it
+BASELINE_PATH = os.path.join(root_directory, 'startup_baseline.json')
+
+# Libraries that must only be imported by the code path that needs them, never at start-up
+HEAVY_MODULES = (
+    'selenium', 'cv2', 'numpy', 'PIL', 'pytesseract', 'tesserocr', 'fitz', 'pdf2image',
+    'bs4', 'requests', 'openai', 'anthropic', 'tiktoken',
+)
+
+# Start-up may be this much slower than the baseline (as a fraction, and at least MIN_REGRESSION_MS) before it counts as a regression
+REGRESSION_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 20.0
+
+def measure_imports(module):
+    """Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: Module name -> (self time, cumulative time) in milliseconds, for every module imported.
+    """
+    env = dict(os.environ)
+    # The API keys are not needed to import anything, and their absence catches clients built at import time
+    env.pop('OPENAI_API_KEY', None)
+    env.pop('ANTHROPIC_API_KEY', None)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=root_directory, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return timings
+
+def run_benchmark(module='_main_', runs=5, top=15, save=False):
+    """Measure how long the app takes to import and check which heavy libraries it loads at start-up.
+
+    The median of several runs is compared with the saved baseline. A slower start-up, or a heavy library
+    that was not imported at start-up before, counts as a regression.
+
+    Args:
+        module (str, optional): The module to import.
+        runs (int, optional): How many fresh interpreters to time.
+        top (int, optional): How many of the slowest imports to list.
+        save (bool, optional): Save this run as the new baseline.
+
+    Returns:
+        bool: True if there is no regression against the baseline.
+    """
+    measurements = [measure_imports(module) for _ in range(runs)]
+    totals = [timings[module][1] for timings in measurements]
+    total = statistics.median(totals)
+    timings = measurements[totals.index(min(totals))]
+    heavy = sorted({name.split('.')[0] for name in timings} & set(HEAVY_MODULES))
+
+    print(f"Importing {module}: {total:.1f} ms (median of {runs} runs, fastest {min(totals):.1f} ms).\n")
+    print(f"{'module':<50}{'self (ms)':>12}{'cumulative (ms)':>18}")
+    for name, (self_ms, cumulative_ms) in sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:top]:
+        print(f"{name:<50}{self_ms:>12.1f}{cumulative_ms:>18.1f}")
+    print(f"\nHeavy libraries imported at start-up: {', '.join(heavy) if heavy else 'none'}")
+
+    passed = True
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as file:
+            baseline = json.load(file).get(module)
+        if baseline:
+            allowed = max(baseline['total_ms'] * (1 + REGRESSION_TOLERANCE), baseline['total_ms'] + MIN_REGRESSION_MS)
+            print(f"Baseline: {baseline['total_ms']:.1f} ms, regression threshold {allowed:.1f} ms.")
+            if total > allowed:
+                print(f"REGRESSION: start-up is {total - baseline['total_ms']:.1f} ms slower than the baseline.")
+                passed = False
+            new_heavy = sorted(set(heavy) - set(baseline['heavy_modules']))
+            if new_heavy:
+                print(f"REGRESSION: now imported at start-up: {', '.join(new_heavy)}.")
+                passed = False
+            if passed:
+                print("No start-up regression.")
+
+    if save:
+        baselines = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, 'r', encoding='utf-8') as file:
+                baselines = json.load(file)
+        baselines[module] = {'total_ms': round(total, 1), 'heavy_modules': heavy}
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, indent=4)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    return passed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the app's imports and fail if start-up has regressed against the saved baseline.")
+    parser.add_argument('--module', default='_main_', help="Module to import (default: _main_)")
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreters to time")
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest imports to list")
+    parser.add_argument('--save', action='store_true', help="Save this run as the new baseline")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.module, args.runs, args.top, args.save) else 1)
+
+# Example usage:
+# python benchmark_startup.py --save
+# python benchmark_startup.py
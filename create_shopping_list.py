@@ -1,6 +1,7 @@
 import os
 import json
 from send_recipe_to_openai import send_recipe_to_openai
+from aisle_classifier import get_aisle_classifier
 from dotenv import load_dotenv
 
 def process_and_merge_ingredients(folder_path):
@@ -29,6 +30,11 @@ def process_and_merge_ingredients(folder_path):
             with open(json_file_path, 'r', encoding='utf-8') as json_file:
                 data = json.load(json_file)
                 merged_ingredients.extend(data.get('ingredients', []))
+
+    # Ingredients added by hand, or saved before aisles were assigned locally, get their aisle here
+    filled = get_aisle_classifier().fill_aisles(merged_ingredients)
+    if filled:
+        print(f"Assigned aisles to {filled} ingredients locally.")
     
     # Sort ingredients by aisle and name
     merged_ingredients.sort(key=lambda x: (x.get('aisle', '').lower(), x.get('ingredient', '').lower()))
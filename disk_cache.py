@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+
+# Get the root directory of the application (the directory where this script is located)
+root_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Define the path for the 'cache' folder. Unlike 'temp', it is not emptied at the end of a run.
+cache_folder_path = os.path.join(root_directory, 'cache')
+
+class DiskCache:
+    """A persistent key/value store on disk with size and age based LRU eviction.
+
+    Each entry is stored as its own file inside the cache directory, and an 'index.json' file keeps
+    the metadata needed for eviction (size, creation time, last access time) along with any extra
+    metadata the caller wants to keep next to the data. Access times are only updated in memory on a hit;
+    they are written with the next change to the index, or at exit.
+
+    Args:
+        name (str): The name of the sub-folder of 'cache' used by this store.
+        max_bytes (int): Total size the stored data may reach before the least recently used entries are evicted.
+        max_age (float, optional): Age in seconds after which an entry is evicted regardless of use.
+    """
+
+    def __init__(self, name, max_bytes, max_age=None):
+        self.directory = os.path.join(cache_folder_path, name)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.RLock()
+        self._dirty = False        # Access times changed since the index was last written
+
+        # Ensure the cache folder exists
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        self._index = self._load_index()
+        atexit.register(self.flush)
+
+    def _load_index(self):
+        """Load the index from disk, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """Write the index atomically so a crash never leaves it half written."""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._index, file)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def flush(self):
+        """Write the access times recorded since the index was last saved."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _data_path(self, key):
+        """Map a key to the file holding its data."""
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def _remove(self, key):
+        """Remove an entry and its data file. The caller holds the lock and saves the index."""
+        self._index.pop(key, None)
+        try:
+            os.remove(self._data_path(key))
+        except OSError:
+            pass
+
+    def get(self, key, count=True):
+        """Return the data and metadata stored for a key, or None if it is not cached.
+
+        Args:
+            key (str): The key to look up.
+            count (bool, optional): If False, the lookup is not counted in the hit/miss statistics.
+
+        Returns:
+            tuple or None: (data bytes, metadata dict, seconds since the entry was stored) if found.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            data = None
+            if entry is not None:
+                if self.max_age is not None and time.time() - entry['created'] > self.max_age:
+                    # Expired entries are dropped as soon as they are seen
+                    self._remove(key)
+                    self.stats['evictions'] += 1
+                    self._save_index()
+                else:
+                    try:
+                        with open(self._data_path(key), 'rb') as file:
+                            data = file.read()
+                    except OSError:
+                        self._remove(key)
+                        self._save_index()
+
+            if data is None:
+                if count:
+                    self.stats['misses'] += 1
+                return None
+
+            if count:
+                self.stats['hits'] += 1
+            entry['last_access'] = time.time()
+            self._dirty = True
+            return data, entry.get('meta', {}), time.time() - entry['created']
+
+    def put(self, key, data, meta=None):
+        """Store data (bytes or str) and optional JSON-serialisable metadata under a key, then evict if needed."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        with self._lock:
+            with open(self._data_path(key), 'wb') as file:
+                file.write(data)
+
+            now = time.time()
+            self._index[key] = {'size': len(data), 'created': now, 'last_access': now, 'meta': meta or {}}
+            self._evict()
+            self._save_index()
+
+    def touch(self, key, meta=None):
+        """Mark an entry as freshly stored without rewriting its data, optionally updating its metadata."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return
+            now = time.time()
+            entry['created'] = now
+            entry['last_access'] = now
+            if meta is not None:
+                entry['meta'] = meta
+            self._save_index()
+
+    def total_bytes(self):
+        """Return the total size of the stored data."""
+        with self._lock:
+            return sum(entry['size'] for entry in self._index.values())
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones until the store fits in max_bytes."""
+        now = time.time()
+        if self.max_age is not None:
+            for key in [key for key, entry in self._index.items() if now - entry['created'] > self.max_age]:
+                self._remove(key)
+                self.stats['evictions'] += 1
+
+        total = sum(entry['size'] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_access']):
+            total -= self._index[key]['size']
+            self._remove(key)
+            self.stats['evictions'] += 1
+            if total <= self.max_bytes:
+                break
+
+    def evict(self):
+        """Run eviction on demand (it also runs automatically after every put)."""
+        with self._lock:
+            self._evict()
+            self._save_index()
+
+    def clear(self):
+        """Remove every entry from the store."""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+            self._save_index()
+
+# Example usage:
+# cache = DiskCache('example', max_bytes=10 * 1024 * 1024, max_age=24 * 60 * 60)
+# cache.put('key', b'value', meta={'source': 'example'})
+# cache.get('key')
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import queue
+import threading
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+from ocr_engine import get_engine
+from ocr_layout import find_title_blocks, crop_region, PSM_SINGLE_LINE
+from ocr_cache import get_ocr_cache, hash_image_file
+from scrape_text_from_image import preprocess_array, ocr_settings
+
+DOCUMENT_EXTENSIONS = ('.pdf', '.tif', '.tiff')
+
+# Pages are rasterised at the resolution Tesseract works best at
+RASTER_DPI = 300
+
+# The most rasterised pages waiting for OCR at any time. This is what keeps memory flat for long documents.
+PAGE_QUEUE_SIZE = 2
+
+# Large type that starts a recipe section rather than a new recipe
+SECTION_HEADER_RE = re.compile(r'^\W*(ingredients?|method|instructions|directions|steps|serves|makes|to serve)\b', re.IGNORECASE)
+
+def is_multipage_document(path):
+    """Check if a file is a PDF or a TIFF with more than one page."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        return True
+    if extension in ('.tif', '.tiff'):
+        try:
+            with Image.open(path) as image:
+                return getattr(image, 'n_frames', 1) > 1
+        except OSError:
+            return False
+    return False
+
+def _iter_pdf_pages(path, dpi):
+    """Rasterise a PDF one page at a time with PyMuPDF, or pdf2image (poppler) if it is not installed."""
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(path) as document:
+            for page in document:
+                pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+                rgb = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+                yield cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        return
+
+    try:
+        from pdf2image import convert_from_path, pdfinfo_from_path
+    except ImportError as e:
+        raise ImportError("Reading PDFs requires PyMuPDF (pip install pymupdf) or pdf2image (pip install pdf2image).") from e
+
+    for number in range(1, pdfinfo_from_path(path)['Pages'] + 1):
+        page = convert_from_path(path, dpi=dpi, first_page=number, last_page=number)[0]
+        yield cv2.cvtColor(np.array(page.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+def _iter_tiff_pages(path):
+    """Decode a multi-page TIFF one frame at a time."""
+    with Image.open(path) as image:
+        for frame in ImageSequence.Iterator(image):
+            yield cv2.cvtColor(np.array(frame.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+def iter_document_pages(path, dpi=RASTER_DPI):
+    """Yield each page of a PDF or TIFF as an OpenCV (BGR) image, decoding only one page at a time."""
+    if path.lower().endswith('.pdf'):
+        return _iter_pdf_pages(path, dpi)
+    return _iter_tiff_pages(path)
+
+def read_page(img, engine):
+    """OCR one page, cutting it at every recipe title.
+
+    Returns:
+        list: (title or None, text) for each horizontal band of the page. The first band has no title
+              and continues the recipe from the previous page.
+    """
+    binary = preprocess_array(img)
+
+    titles = []
+    for block in find_title_blocks(binary):
+        title = ' '.join(engine.image_to_string(crop_region(binary, block), psm=PSM_SINGLE_LINE).split())
+        if title and not SECTION_HEADER_RE.match(title):
+            titles.append((block[1], title))
+
+    # The page is cut into bands just above each title, so a title and everything below it go together
+    cuts = [0] + [max(top - 5, 0) for top, _ in titles] + [binary.shape[0]]
+    labels = [None] + [title for _, title in titles]
+    segments = []
+    for label, top, bottom in zip(labels, cuts, cuts[1:]):
+        if bottom - top < 10:
+            text = ''
+        else:
+            text = engine.image_to_string(Image.fromarray(binary[top:bottom])).strip()
+        if label is not None or text:
+            segments.append((label, text))
+    return segments
+
+def _rasterise_pages(path, dpi, pages, stop):
+    """Producer thread: rasterise pages into the bounded queue, blocking while it is full."""
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for number, img in enumerate(iter_document_pages(path, dpi), start=1):
+            if not put((number, img)):
+                return
+    except Exception as e:
+        put(e)
+    put(None)
+
+def iter_document_recipes(path, dpi=RASTER_DPI, use_cache=True):
+    """Read a multi-page PDF or TIFF and yield each recipe as soon as its last page has been read.
+
+    A background thread rasterises the next page while the current one is preprocessed and OCR'd. At most
+    PAGE_QUEUE_SIZE pages wait in between, so memory does not grow with the length of the document.
+    A new recipe starts at every title (text set much larger than the body text on its page). Text before
+    the first title is treated as a chapter introduction and skipped, unless the document has no titles.
+
+    Args:
+        path (str): The PDF or TIFF file.
+        dpi (int, optional): The resolution PDF pages are rasterised at.
+        use_cache (bool, optional): Serve pages read before from the OCR cache.
+
+    Yields:
+        tuple: (recipe title or None, recipe text).
+    """
+    document_hash = hash_image_file(path) if use_cache else None
+    settings = dict(ocr_settings(ingredients_only=False), dpi=dpi, split='titles')
+    cache = get_ocr_cache()
+    engine = get_engine()
+
+    pages = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(target=_rasterise_pages, args=(path, dpi, pages, stop), daemon=True)
+    producer.start()
+
+    title, parts, found_title = None, [], False
+    try:
+        while True:
+            item = pages.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            number, img = item
+            page_key = f'{document_hash}#page{number}'
+            cached = cache.lookup(page_key, settings) if document_hash else None
+            if cached is not None:
+                segments = json.loads(cached)
+            else:
+                segments = read_page(img, engine)
+                if document_hash:
+                    cache.store(page_key, settings, json.dumps(segments), path)
+            del img
+
+            print(f"Read page {number} of {os.path.basename(path)}"
+                  f"{' (cached)' if cached is not None else ''}: {sum(1 for label, _ in segments if label)} recipe titles.")
+            for label, text in segments:
+                if label is not None:
+                    if found_title and parts:
+                        yield title, '\n'.join(parts)
+                    elif parts:
+                        print(f"Skipping {len(' '.join(parts).split())} words before the first recipe title.")
+                    title, parts, found_title = label, [], True
+                if text:
+                    parts.append(text)
+
+        if parts:
+            yield title, '\n'.join(parts)
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+def _recipe_filename(document_path, title, index, used):
+    """Name a recipe's text file after its title, which the LLM prompt falls back to for the recipe name."""
+    base_name = os.path.splitext(os.path.basename(document_path))[0]
+    slug = re.sub(r'[^a-z0-9]+', '-', (title or '').lower()).strip('-') or f'{base_name}-{index}'
+    name, counter = slug, 2
+    while name in used:
+        name, counter = f'{slug}-{counter}', counter + 1
+    used.add(name)
+    return name + '.txt'
+
+def scrape_text_from_document(path, dpi=RASTER_DPI):
+    """OCR a multi-page PDF or TIFF, saving each recipe to its own text file in the temp folder as soon as it is read.
+
+    Yields:
+        str: The text file path of each recipe.
+    """
+    # Get the root directory of the application (the directory where this script is located)
+    root_directory = os.path.dirname(os.path.abspath(__file__))
+    temp_folder_path = os.path.join(root_directory, 'temp')
+    if not os.path.exists(temp_folder_path):
+        os.makedirs(temp_folder_path)
+
+    used = set()
+    for index, (title, text) in enumerate(iter_document_recipes(path, dpi), start=1):
+        text_file_path = os.path.join(temp_folder_path, _recipe_filename(path, title, index, used))
+        with open(text_file_path, 'w', encoding='utf-8') as text_file:
+            text_file.write(text)
+        print(f"Recipe '{title or 'Untitled'}' extracted and saved to {text_file_path}")
+        yield text_file_path
+    get_ocr_cache().print_stats()
+
+# Example usage:
+# for text_file_path in scrape_text_from_document('/path/to/your/cookbook-chapter.pdf'):
+#     print(text_file_path)
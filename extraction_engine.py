@@ -0,0 +1,470 @@
+import os
+import time
+import random
+import asyncio
+import atexit
+import threading
+from text_reduction import count_tokens, reduce_for_prompt
+from llm_providers import get_provider_router, record_openai_usage
+from model_cascade import validate_recipe_json
+from send_recipe_to_openai import (
+    MODEL, SYSTEM_PROMPT, read_recipe_file, recipe_name_from_filename, build_messages,
+    parse_recipe_response, save_recipe_json, cached_recipe_json, cache_recipe_json,
+    build_batch_prompt_parts, parse_batch_response, build_recipe_prompt_parts,
+)
+
+# OpenAI rate limits for the account, which can be set with OPENAI_REQUESTS_PER_MINUTE and OPENAI_TOKENS_PER_MINUTE
+# in the .env file. The defaults are GPT-4's usage tier 1 limits.
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 10000
+
+# The most requests in flight at once, whatever the rate limits allow
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Tokens reserved for the model's answer when estimating a request's size. A recipe's ingredient JSON is rarely longer.
+RESPONSE_TOKEN_ESTIMATE = 800
+
+# Recipes queued together are sent in one request, so the instructions are paid for once. A batch is sent
+# once it holds this many tokens of recipe text or this many recipes, or when no recipe has been queued for
+# BATCH_LINGER_SECONDS. Set OPENAI_BATCH_TOKEN_BUDGET=0 in the .env file to send every recipe on its own.
+DEFAULT_BATCH_TOKEN_BUDGET = 3000
+MAX_BATCH_RECIPES = 5
+BATCH_LINGER_SECONDS = 0.5
+
+MAX_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+class TokenBucket:
+    """A token bucket that refills continuously at a per-minute rate, for use from one asyncio event loop.
+
+    Args:
+        per_minute (float): How many units are added each minute, which is also the bucket's capacity.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount):
+        """Wait until amount units are available and take them. Requests larger than the capacity wait for a full bucket."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount):
+        """Give back (positive) or take away (negative) units once a request's real size is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        """Empty the bucket, so the next request waits for the bucket to refill."""
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+class RateLimiter:
+    """Schedules requests within requests-per-minute and tokens-per-minute limits.
+
+    When the server still answers 429, everyone waits for its Retry-After time, and the rates are cut
+    by a quarter. They recover by 5% after each successful request, back up to the configured limits.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.limits = (requests_per_minute, tokens_per_minute)
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.stats = {'requests': 0, 'rate_limited': 0, 'retries': 0, 'waited': 0.0}
+
+    async def acquire(self, estimated_tokens):
+        """Wait for a request slot and estimated_tokens of token budget."""
+        start = time.monotonic()
+        while time.monotonic() < self.paused_until:
+            await asyncio.sleep(self.paused_until - time.monotonic())
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+        self.stats['requests'] += 1
+        self.stats['waited'] += time.monotonic() - start
+
+    def refund(self, estimated_tokens):
+        """Give back the token budget taken for a request that failed before the server counted it."""
+        self.tokens.adjust(estimated_tokens)
+
+    def settle(self, estimated_tokens, used_tokens):
+        """Correct the token budget with the real usage reported by the server."""
+        if used_tokens is not None:
+            self.tokens.adjust(estimated_tokens - used_tokens)
+
+    def on_rate_limited(self, retry_after):
+        """Back off after a 429: pause every request for retry_after seconds and slow down."""
+        self.stats['rate_limited'] += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self.tokens.drain()
+        self._set_scale(self.scale * 0.75)
+
+    def on_success(self):
+        self._set_scale(self.scale * 1.05)
+
+    def _set_scale(self, scale):
+        self.scale = min(max(scale, 0.1), 1.0)
+        for bucket, limit in zip((self.requests, self.tokens), self.limits):
+            bucket.capacity = limit * self.scale
+            bucket.rate = limit * self.scale / 60.0
+
+def retry_after_seconds(error, attempt):
+    """Return how long to wait before retrying: the server's Retry-After if it sent one, else exponential backoff with jitter."""
+    response = getattr(error, 'response', None)
+    headers = response.headers if response is not None else {}
+    for name, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+class ExtractionEngine:
+    """Sends recipe files to the LLM providers concurrently from a background asyncio event loop.
+
+    Requests are scheduled within the account's OpenAI rate limits, and each recipe's JSON file is written
+    as soon as its response arrives. The cheaper tiers of the model cascade are asked directly and retried on
+    429s, timeouts and server errors; the full request goes through the provider router, so the configured
+    provider order, hedging and failover apply. submit() can be called from any thread, so text can be handed
+    over while scraping or OCR is still running.
+
+    Recipes submitted close together are packed into batch requests up to batch_token_budget. The batch
+    response is split back into one JSON file per recipe, and any recipe missing from it is sent again
+    on its own.
+
+    Args:
+        requests_per_minute (int, optional): The account's request rate limit.
+        tokens_per_minute (int, optional): The account's token rate limit.
+        max_concurrency (int, optional): The most requests in flight at once.
+        batch_token_budget (int, optional): The most recipe text tokens in one batch request. 0 disables batching.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, batch_token_budget=DEFAULT_BATCH_TOKEN_BUDGET):
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.batch_token_budget = batch_token_budget
+        self.batch_stats = {'batches': 0, 'batched_recipes': 0, 'batch_retries': 0}
+        self._pending = []         # (recipe, future) waiting to be sent in the next batch
+        self._pending_tokens = 0
+        self._flush_timer = None
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='extraction-engine', daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        """Create the async OpenAI client on first use, inside the event loop. Retries are handled here instead."""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+        return self._client
+
+    async def _complete(self, messages, estimated_tokens, model=MODEL):
+        """Send one chat completion, retrying with backoff. Returns the response text."""
+        import openai
+
+        client = self._get_client()
+        for attempt in range(MAX_ATTEMPTS):
+            await self.limiter.acquire(estimated_tokens)
+            try:
+                async with self._semaphore:
+                    response = await client.chat.completions.create(model=model, messages=messages, stream=False)
+            except openai.RateLimitError as e:
+                self.limiter.refund(estimated_tokens)
+                if getattr(e, 'code', None) == 'insufficient_quota':
+                    # The account is out of credit, which waiting does not fix
+                    print("OpenAI quota exceeded, check the account's plan and billing details.")
+                    raise
+                wait = retry_after_seconds(e, attempt)
+                self.limiter.on_rate_limited(wait)
+                print(f"Rate limited by OpenAI, retrying in {wait:.1f}s.")
+            except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+                self.limiter.refund(estimated_tokens)
+                wait = retry_after_seconds(e, attempt)
+                print(f"OpenAI request failed ({type(e).__name__}), retrying in {wait:.1f}s.")
+                await asyncio.sleep(wait)
+            except Exception:
+                self.limiter.refund(estimated_tokens)
+                raise
+            else:
+                usage = getattr(response, 'usage', None)
+                self.limiter.settle(estimated_tokens, usage.total_tokens if usage else None)
+                record_openai_usage(usage)
+                self.limiter.on_success()
+                return response.choices[0].message.content
+            self.limiter.stats['retries'] += 1
+        raise RuntimeError(f"OpenAI request failed after {MAX_ATTEMPTS} attempts.")
+
+    async def _route(self, prompt, estimated_tokens, providers):
+        """Send the full request through the provider router, which hedges slow providers and fails over on errors.
+
+        Returns:
+            tuple: (provider that answered, response text).
+        """
+        await self.limiter.acquire(estimated_tokens)
+        try:
+            async with self._semaphore:
+                return await asyncio.to_thread(get_provider_router().request, SYSTEM_PROMPT, prompt, True, providers)
+        except Exception:
+            self.limiter.refund(estimated_tokens)
+            raise
+
+    def _prepare(self, file_path):
+        """Read and reduce a recipe file.
+
+        Returns:
+            tuple: (recipe dict, None), or (None, JSON file path) if the recipe was answered from the LLM response cache.
+        """
+        fallback_name = recipe_name_from_filename(file_path)
+        dynamic_content = reduce_for_prompt(read_recipe_file(file_path), model=MODEL)
+        router = get_provider_router()
+        for model in router.cached_models(router.model_cascade()):
+            result_json = cached_recipe_json(dynamic_content, fallback_name, model=model)
+            if result_json is not None:
+                print(f"Recipe JSON for {os.path.basename(file_path)} served from the LLM response cache.")
+                return None, save_recipe_json(result_json, file_path)
+        recipe = {
+            'file_path': file_path,
+            'fallback_name': fallback_name,
+            'dynamic_content': dynamic_content,
+            'tokens': count_tokens(dynamic_content, MODEL),
+        }
+        return recipe, None
+
+    def _save(self, recipe, result_json, model):
+        cache_recipe_json(recipe['dynamic_content'], recipe['fallback_name'], result_json, model=model)
+        return save_recipe_json(result_json, recipe['file_path'])
+
+    async def _extract_recipe(self, recipe, start_tier=0):
+        """Send one recipe on its own and return its JSON file path, or None on failure.
+
+        The model cascade's cheaper tiers are asked in turn, from start_tier, until an answer passes validation.
+        If none does, the full request goes through the provider router with the cascade's last model.
+        """
+        router = get_provider_router()
+        cascade = router.model_cascade()
+        prompt_parts = build_recipe_prompt_parts(recipe['dynamic_content'], recipe['fallback_name'])
+        messages = build_messages(''.join(prompt_parts))
+        estimated_tokens = sum(count_tokens(message['content'], MODEL) for message in messages) + RESPONSE_TOKEN_ESTIMATE
+
+        for model in cascade.models[start_tier:-1] if cascade else []:
+            start = time.perf_counter()
+            result_json = None
+            try:
+                full_response = await self._complete(messages, estimated_tokens, model)
+                result_json = parse_recipe_response(full_response, recipe['fallback_name'])
+            except Exception as e:
+                print(f"Failed to extract {os.path.basename(recipe['file_path'])} with {model}: {e}")
+            if cascade.accept(model, result_json, validate_recipe_json, time.perf_counter() - start):
+                return self._save_or_none(recipe, result_json, model)
+
+        start = time.perf_counter()
+        try:
+            provider, full_response = await self._route(prompt_parts, estimated_tokens, router.final_providers(cascade))
+        except Exception as e:
+            print(f"Failed to extract {os.path.basename(recipe['file_path'])}: {e}")
+            return None
+        result_json = parse_recipe_response(full_response, recipe['fallback_name'])
+        if cascade:
+            cascade.record(provider.model, time.perf_counter() - start, not validate_recipe_json(result_json) if result_json else False)
+        if result_json is None:
+            return None
+        return self._save_or_none(recipe, result_json, provider.model)
+
+    def _save_or_none(self, recipe, result_json, model):
+        """Save a recipe's JSON and return the file path, or None if it could not be saved."""
+        try:
+            return self._save(recipe, result_json, model)
+        except Exception as e:
+            print(f"Failed to save {os.path.basename(recipe['file_path'])}: {e}")
+            return None
+
+    async def _extract_batch(self, batch):
+        """Send several recipes in one request and resolve each recipe's future with its JSON file path.
+
+        The batch goes to the cheapest model in the cascade, or through the provider router if there is no
+        cheaper tier. Recipes that the batch response does not cover, or whose answers fail validation, are
+        retried on their own from the next tier up. Every future is resolved, with None for a recipe that
+        failed, even if something unexpected goes wrong.
+        """
+        try:
+            await self._send_batch(batch)
+        finally:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _send_batch(self, batch):
+        recipes = [recipe for recipe, _ in batch]
+        results = [None] * len(recipes)
+        router = get_provider_router()
+        cascade = router.model_cascade()
+        # The cheapest tier is asked directly; with no cheaper tier, the batch is the full request
+        model = cascade.models[0] if cascade and len(cascade.models) > 1 else None
+        routed = model is None
+        start = time.perf_counter()
+        try:
+            prompt_parts = build_batch_prompt_parts([(recipe['dynamic_content'], recipe['fallback_name']) for recipe in recipes])
+            messages = build_messages(''.join(prompt_parts))
+            estimated_tokens = (sum(count_tokens(message['content'], MODEL) for message in messages)
+                                + RESPONSE_TOKEN_ESTIMATE * len(recipes))
+
+            if not routed:
+                full_response = await self._complete(messages, estimated_tokens, model)
+            else:
+                provider, full_response = await self._route(prompt_parts, estimated_tokens, router.final_providers(cascade))
+                model = provider.model
+            results = parse_batch_response(full_response, [recipe['fallback_name'] for recipe in recipes])
+            self.batch_stats['batches'] += 1
+            self.batch_stats['batched_recipes'] += len(recipes)
+        except Exception as e:
+            print(f"Batch of {len(recipes)} recipes failed: {e}")
+
+        latency = (time.perf_counter() - start) / len(recipes)
+        retries = []
+        for (recipe, future), result_json in zip(batch, results):
+            if result_json is None:
+                accepted = False
+            elif not routed:
+                accepted = cascade.accept(model, result_json, validate_recipe_json, latency)
+            else:
+                # The full request's answer is used as it is, as there is no larger model to ask
+                if cascade:
+                    cascade.record(model, latency, not validate_recipe_json(result_json))
+                accepted = True
+            if not accepted:
+                retries.append((recipe, future))
+            elif not future.done():
+                future.set_result(self._save_or_none(recipe, result_json, model))
+
+        if retries:
+            print(f"Retrying {len(retries)} of {len(recipes)} recipes from the batch on their own.")
+            self.batch_stats['batch_retries'] += len(retries)
+            json_file_paths = await asyncio.gather(*(self._extract_recipe(recipe, start_tier=1) for recipe, _ in retries))
+            for (_, future), json_file_path in zip(retries, json_file_paths):
+                if not future.done():
+                    future.set_result(json_file_path)
+
+    def _flush(self):
+        """Send the pending recipes: a single recipe on its own, several as a batch."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if len(batch) == 1:
+            recipe, future = batch[0]
+            task = self._loop.create_task(self._extract_recipe(recipe))
+            task.add_done_callback(lambda done: self._resolve(future, done, recipe))
+        elif batch:
+            self._loop.create_task(self._extract_batch(batch))
+
+    @staticmethod
+    def _resolve(future, task, recipe):
+        """Resolve a recipe's future with its finished task's result, or with None if the task failed."""
+        if future.done():
+            return
+        if task.cancelled() or task.exception() is not None:
+            if not task.cancelled():
+                print(f"Failed to extract {os.path.basename(recipe['file_path'])}: {task.exception()}")
+            future.set_result(None)
+        else:
+            future.set_result(task.result())
+
+    async def _extract(self, file_path):
+        """Extract one recipe file to JSON and return the JSON file path, or None on failure."""
+        try:
+            # Reading, reducing and counting the tokens of a recipe is blocking work, kept off the event loop
+            recipe, json_file_path = await asyncio.to_thread(self._prepare, file_path)
+        except Exception as e:
+            print(f"Failed to extract {os.path.basename(file_path)}: {e}")
+            return None
+        if recipe is None:
+            return json_file_path
+        if not self.batch_token_budget:
+            return await self._extract_recipe(recipe)
+
+        # Start a new batch if this recipe would take the pending one over its budget
+        if self._pending and self._pending_tokens + recipe['tokens'] > self.batch_token_budget:
+            self._flush()
+        future = self._loop.create_future()
+        self._pending.append((recipe, future))
+        self._pending_tokens += recipe['tokens']
+        if len(self._pending) >= MAX_BATCH_RECIPES or self._pending_tokens >= self.batch_token_budget:
+            self._flush()
+        else:
+            # Wait a moment for more recipes to arrive before sending a partial batch
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._flush_timer = self._loop.call_later(BATCH_LINGER_SECONDS, self._flush)
+        return await future
+
+    def submit(self, file_path):
+        """Queue a recipe file for extraction.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the JSON file path, or None on failure.
+        """
+        return asyncio.run_coroutine_threadsafe(self._extract(file_path), self._loop)
+
+    def print_stats(self):
+        """Print how many requests were made and how much rate limiting slowed them down."""
+        stats = self.limiter.stats
+        if stats['requests']:
+            print(f"OpenAI requests: {stats['requests']} sent, {stats['rate_limited']} rate limited (429), "
+                  f"{stats['retries']} retried, {stats['waited']:.1f}s spent waiting for rate limits.")
+        if self.batch_stats['batches']:
+            print(f"Batched extraction: {self.batch_stats['batched_recipes']} recipes sent in {self.batch_stats['batches']} "
+                  f"batch requests, {self.batch_stats['batch_retries']} retried on their own.")
+
+    def close(self):
+        """Stop the event loop thread."""
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_extraction_engine():
+    """Return the shared extraction engine, starting it on first use.
+
+    The rate limits and batch budget are read here rather than at import time, so the values from the .env file
+    loaded by main() are used.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ExtractionEngine(
+                requests_per_minute=int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=int(os.getenv('OPENAI_TOKENS_PER_MINUTE', DEFAULT_TOKENS_PER_MINUTE)),
+                batch_token_budget=int(os.getenv('OPENAI_BATCH_TOKEN_BUDGET', DEFAULT_BATCH_TOKEN_BUDGET)),
+            )
+            atexit.register(_engine.close)
+        return _engine
+
+# Example usage:
+# json_file_path = get_extraction_engine().submit('/path/to/recipe.txt').result()
@@ -0,0 +1,220 @@
+import re
+
+# The shopping aisles used by the extraction prompts
+AISLES = [
+    "Produce",
+    "Fresh meats",
+    "Cooked Meats",
+    "Milk/Butter/Cream/Cheese/Yoghurts",
+    "Eggs/Sugar/Bread/Baking goods",
+    "Oil/Jam/Tinned fruit/Honey/Spices/Stock",
+    "Sauces/Mayonnaise/Pickles/Rice/Pulses",
+    "Tinned Foods/Pasta/Soups",
+    "Dried fruits, seeds & nuts",
+    "Coffee/Cereal",
+    "Biscuits/Chocolate/Sweets/Tea",
+    "Fizzy drinks/Crackers/Nuts/Crisps",
+    "Cordials/Bottled water",
+    "Wine/Beer/Cider",
+    "Other",
+]
+
+# Every way a unit is written, mapped to the standardized unit used in the extraction prompt
+UNIT_SYNONYMS = {
+    'tsp': ['tsp', 'tsps', 'teaspoon', 'teaspoons', 't'],
+    'tbsp': ['tbsp', 'tbsps', 'tbs', 'tbl', 'tablespoon', 'tablespoons', 'T'],
+    'cup': ['cup', 'cups', 'c'],
+    'fl oz': ['fl oz', 'fl. oz', 'fl. oz.', 'fluid ounce', 'fluid ounces'],
+    'ml': ['ml', 'mls', 'millilitre', 'millilitres', 'milliliter', 'milliliters'],
+    'l': ['l', 'litre', 'litres', 'liter', 'liters'],
+    'pt': ['pt', 'pint', 'pints'],
+    'qt': ['qt', 'quart', 'quarts'],
+    'gal': ['gal', 'gallon', 'gallons'],
+    'g': ['g', 'gr', 'gram', 'grams', 'gramme', 'grammes'],
+    'kg': ['kg', 'kgs', 'kilogram', 'kilograms', 'kilo', 'kilos'],
+    'oz': ['oz', 'ounce', 'ounces'],
+    'lb': ['lb', 'lbs', 'pound', 'pounds'],
+    'piece': ['piece', 'pieces', 'pc', 'pcs'],
+    'clove': ['clove', 'cloves'],
+    'slice': ['slice', 'slices'],
+    'whole': ['whole'],
+    'bunch': ['bunch', 'bunches'],
+    'head': ['head', 'heads'],
+    'stalk': ['stalk', 'stalks'],
+    'stick': ['stick', 'sticks'],
+    'can': ['can', 'cans', 'tin', 'tins'],
+    'jar': ['jar', 'jars'],
+    'dash': ['dash', 'dashes'],
+    'pinch': ['pinch', 'pinches'],
+    'drop': ['drop', 'drops'],
+    'splash': ['splash', 'splashes'],
+}
+
+# Case matters for the single letter forms (t = tsp, T = tbsp), everything else is matched case-insensitively
+UNIT_LOOKUP = {}
+for _unit, _synonyms in UNIT_SYNONYMS.items():
+    for _synonym in _synonyms:
+        UNIT_LOOKUP[_synonym if len(_synonym) == 1 else _synonym.lower()] = _unit
+
+# Qualitative amounts go in the unittype field with no quantity
+QUALITATIVE_UNITS = ['to taste', 'as needed', 'as required', 'to serve', 'for serving', 'for garnish', 'a handful', 'handful']
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅕': '1/5', '⅖': '2/5', '⅗': '3/5',
+    '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8', '⁄': '/',
+}
+
+WORD_NUMBERS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'half': 0.5}
+
+# Preparation words removed from ingredient names, as the extraction prompt asks
+PREPARATION_WORDS = [
+    'chopped', 'finely', 'roughly', 'coarsely', 'thinly', 'thickly', 'diced', 'minced', 'sliced', 'grated',
+    'crushed', 'peeled', 'halved', 'quartered', 'trimmed', 'shredded', 'softened', 'melted', 'beaten',
+    'sifted', 'drained', 'rinsed', 'cubed', 'julienned', 'deseeded', 'seeded', 'torn', 'toasted', 'freshly',
+    'room temperature', 'at room temperature', 'to serve', 'for serving', 'for garnish', 'optional',
+]
+
+# A number: mixed fraction (1 1/2), fraction (1/2), decimal (1.5) or integer
+_NUMBER = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)'
+_QUANTITY_RE = re.compile(rf'^\s*({_NUMBER})(?:\s*(?:-|–|to)\s*({_NUMBER}))?\s*')
+_PREPARATION_RE = re.compile(r'\b(?:' + '|'.join(sorted(map(re.escape, PREPARATION_WORDS), key=len, reverse=True)) + r')\b', re.IGNORECASE)
+
+# Keywords used to guess an ingredient's aisle, the seed of the aisle classifier's ingredient index
+AISLE_KEYWORDS = [
+    ("Cooked Meats", ['ham', 'salami', 'chorizo', 'prosciutto', 'pancetta', 'pepperoni', 'bacon']),
+    ("Fresh meats", ['chicken', 'beef', 'pork', 'lamb', 'mince', 'turkey', 'duck', 'steak', 'sausage', 'fish', 'salmon',
+                     'cod', 'prawn', 'shrimp', 'tuna steak', 'veal', 'thigh', 'breast']),
+    ("Milk/Butter/Cream/Cheese/Yoghurts", ['milk', 'butter', 'cream', 'cheese', 'parmesan', 'mozzarella', 'cheddar',
+                                          'yoghurt', 'yogurt', 'creme fraiche', 'feta', 'ricotta', 'mascarpone']),
+    ("Eggs/Sugar/Bread/Baking goods", ['egg', 'sugar', 'flour', 'bread', 'yeast', 'baking powder', 'baking soda',
+                                       'bicarbonate', 'cornstarch', 'cornflour', 'vanilla', 'cocoa', 'breadcrumb', 'tortilla']),
+    ("Sauces/Mayonnaise/Pickles/Rice/Pulses", ['soy sauce', 'sauce', 'mayonnaise', 'ketchup', 'mustard', 'vinegar', 'pickle',
+                                               'rice', 'lentil', 'chickpea', 'bean', 'miso', 'paste']),
+    ("Tinned Foods/Pasta/Soups", ['pasta', 'spaghetti', 'noodle', 'penne', 'linguine', 'macaroni', 'tinned', 'canned',
+                                  'tomato puree', 'passata', 'coconut milk', 'soup']),
+    ("Oil/Jam/Tinned fruit/Honey/Spices/Stock", ['oil', 'jam', 'honey', 'stock', 'broth', 'salt', 'pepper', 'cumin',
+                                                 'paprika', 'cinnamon', 'turmeric', 'chilli flakes', 'chili flakes',
+                                                 'oregano', 'nutmeg', 'spice', 'bay leaf', 'bay leaves', 'peppercorn', 'syrup']),
+    ("Dried fruits, seeds & nuts", ['raisin', 'sultana', 'seed', 'almond', 'walnut', 'cashew', 'peanut', 'pecan',
+                                    'pine nut', 'hazelnut', 'pistachio', 'date', 'apricot']),
+    ("Coffee/Cereal", ['coffee', 'espresso', 'oats', 'cereal', 'granola']),
+    ("Biscuits/Chocolate/Sweets/Tea", ['chocolate', 'biscuit', 'tea', 'cookie', 'marshmallow']),
+    ("Wine/Beer/Cider", ['wine', 'beer', 'cider', 'sherry', 'brandy', 'rum', 'vodka', 'mirin', 'sake', 'shaoxing']),
+    ("Cordials/Bottled water", ['cordial', 'water']),
+    ("Produce", ['onion', 'garlic', 'ginger', 'tomato', 'potato', 'carrot', 'celery', 'pepper', 'chilli', 'chili',
+                 'lemon', 'lime', 'orange', 'apple', 'banana', 'spinach', 'lettuce', 'cabbage', 'mushroom', 'herb',
+                 'parsley', 'coriander', 'cilantro', 'basil', 'mint', 'thyme', 'rosemary', 'leek', 'shallot',
+                 'scallion', 'spring onion', 'courgette', 'zucchini', 'aubergine', 'eggplant', 'avocado', 'cucumber',
+                 'broccoli', 'cauliflower', 'kale', 'pak choi', 'bok choy', 'squash', 'pumpkin', 'berries', 'pea',
+                 'bell pepper', 'red pepper', 'green pepper', 'yellow pepper']),
+]
+
+def parse_number(text):
+    """Convert '1 1/2', '1/2', '1,5' or '1.5' to a float."""
+    text = text.strip().replace(',', '.')
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/', 1)
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+def format_quantity(value):
+    """Format a quantity as the string the rest of the app expects, e.g. 2 -> '2', 1.5 -> '1.5'."""
+    value = round(value, 2)
+    return str(int(value)) if value == int(value) else str(value)
+
+def normalise_fractions(text):
+    """Replace unicode fractions with plain ones, e.g. '1½' -> '1 1/2'."""
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        text = re.sub(rf'(\d)?{symbol}', lambda match: (match.group(1) + ' ' if match.group(1) else '') + fraction, text)
+    return text
+
+def clean_ingredient_name(name):
+    """Strip notes, preparation instructions and stray punctuation from an ingredient name."""
+    name = re.sub(r'\([^)]*\)', ' ', name)  # Remove parenthetical notes, e.g. "(400g)"
+    name = name.split(',')[0]                # Drop anything after a comma, e.g. ", finely chopped"
+    name = re.sub(r'^\s*of\s+', '', name, flags=re.IGNORECASE)
+    name = _PREPARATION_RE.sub(' ', name)
+    name = re.sub(r'\s+', ' ', name).strip(' -–;:.*')
+    return name
+
+def parse_ingredient_line(line):
+    """Split an ingredient line such as '1½ cups plain flour, sifted' into quantity, unit and name.
+
+    Args:
+        line (str): One ingredient as written in the recipe.
+
+    Returns:
+        dict: {'quantity': str or None, 'unittype': str or None, 'ingredient': str}
+    """
+    text = normalise_fractions(line).strip()
+    quantity = None
+    unittype = None
+
+    lowered = text.lower()
+    for qualitative in QUALITATIVE_UNITS:
+        if qualitative in lowered:
+            unittype = qualitative.replace('a handful', 'handful')
+            text = re.sub(rf',?\s*{re.escape(qualitative)}', '', text, flags=re.IGNORECASE)
+            break
+
+    match = _QUANTITY_RE.match(text)
+    if match:
+        # For ranges such as '2-3 cloves' buy the upper amount
+        quantity = parse_number(match.group(2) or match.group(1))
+        text = text[match.end():]
+    else:
+        first_word = text.split(' ', 1)[0].lower() if text else ''
+        if first_word in WORD_NUMBERS:
+            quantity = WORD_NUMBERS[first_word]
+            text = text[len(first_word):].lstrip()
+
+    # A size in brackets right after the number, e.g. '1 (400g) can tomatoes', is a note not the unit
+    text = re.sub(r'^\([^)]*\)\s*', '', text)
+
+    words = text.split()
+    for length in (2, 1):
+        candidate = ' '.join(words[:length]).rstrip('.')
+        unit = UNIT_LOOKUP.get(candidate) or UNIT_LOOKUP.get(candidate.lower()) if candidate else None
+        if unit and len(words) > length:
+            unittype = unit
+            text = ' '.join(words[length:])
+            break
+
+    if quantity is not None and unittype is None:
+        unittype = 'whole'
+    if unittype in QUALITATIVE_UNITS or unittype == 'handful':
+        quantity = None
+
+    return {
+        'quantity': format_quantity(quantity) if quantity is not None else None,
+        'unittype': unittype,
+        'ingredient': clean_ingredient_name(text) or line.strip(),
+    }
+
+def build_ingredient_entries(lines):
+    """Parse a list of ingredient lines into the ingredient JSON entries the LLM would return.
+
+    Returns:
+        list: Entries with quantity, unittype, ingredient, aisle and a sequential ID.
+    """
+    from aisle_classifier import get_aisle_classifier  # aisle_classifier builds its index from this module
+    classifier = get_aisle_classifier()
+    entries = []
+    for line in lines:
+        if not line or not line.strip():
+            continue
+        entry = parse_ingredient_line(line)
+        entry['aisle'] = classifier.classify(entry['ingredient'])
+        # Tinned tomatoes, beans etc. are bought from the tinned aisle, not as fresh produce
+        if entry['unittype'] == 'can' and entry['aisle'] == "Produce":
+            entry['aisle'] = "Tinned Foods/Pasta/Soups"
+        entry['ID'] = len(entries) + 1
+        entries.append(entry)
+    return entries
+
+# Example usage:
+# parse_ingredient_line('2 cloves garlic, minced')  # {'quantity': '2', 'unittype': 'clove', 'ingredient': 'garlic'}
@@ -0,0 +1,62 @@
+import json
+import hashlib
+import threading
+from disk_cache import DiskCache
+
+# Parsed LLM results are small JSON documents; entries unused for this long are dropped even if there is room
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+def template_version(template_text):
+    """Return a short fingerprint of a prompt template.
+
+    It is part of every cache key, so editing a prompt template automatically stops old responses from
+    being served.
+    """
+    return hashlib.sha256(template_text.encode('utf-8')).hexdigest()[:12]
+
+def llm_cache_key(model, system_prompt, version, input_text):
+    """Build the cache key for one LLM call from everything that determines its answer."""
+    return hashlib.sha256(json.dumps([model, system_prompt, version, input_text]).encode('utf-8')).hexdigest()
+
+class LLMCache(DiskCache):
+    """Cache of parsed LLM results, so identical recipe text or ingredient lists are only sent once."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_age=MAX_AGE_SECONDS):
+        super().__init__('llm', max_bytes=max_bytes, max_age=max_age)
+
+    def lookup(self, model, system_prompt, version, input_text):
+        """Return the cached result for a call, or None if it has not been made before."""
+        cached = self.get(llm_cache_key(model, system_prompt, version, input_text))
+        if cached is None:
+            return None
+        try:
+            return json.loads(cached[0])
+        except ValueError:
+            return None
+
+    def store(self, model, system_prompt, version, input_text, result):
+        """Store the parsed result of a call."""
+        self.put(llm_cache_key(model, system_prompt, version, input_text), json.dumps(result),
+                 meta={'model': model, 'template_version': version})
+
+    def print_stats(self):
+        """Print how many LLM calls were answered from the cache."""
+        total = self.stats['hits'] + self.stats['misses']
+        if total:
+            print(f"LLM cache: {self.stats['hits']}/{total} calls answered from cache "
+                  f"({self.total_bytes() / 1024:.0f} KB on disk).")
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Return the shared LLM response cache, creating it on first use."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
+
+# Example usage:
+# result = get_llm_cache().lookup('gpt-4', SYSTEM_PROMPT, template_version(template), recipe_text)
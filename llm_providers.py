@@ -0,0 +1,446 @@
+import os
+import time
+import queue
+import threading
+from text_reduction import reduce_for_prompt
+from stream_json import StreamingJSONParser
+from model_cascade import get_model_cascade, validate_recipe_json
+from send_recipe_to_openai import (
+    MODEL, SYSTEM_PROMPT, chunk_text, read_recipe_file, recipe_name_from_filename, build_recipe_prompt_parts,
+    parse_recipe_response, save_recipe_json, cached_recipe_json, cache_recipe_json,
+)
+
+ANTHROPIC_MODEL = "claude-3-5-sonnet-20240620"
+ANTHROPIC_MAX_TOKENS = 2000
+
+# The providers to use, in order of preference, as provider:model pairs. Anthropic is only added by default
+# when an Anthropic API key is set. Can be set with LLM_PROVIDERS in the .env file, e.g. LLM_PROVIDERS=anthropic,openai:gpt-4
+DEFAULT_PROVIDERS = f'openai:{MODEL}'
+DEFAULT_PROVIDERS_WITH_ANTHROPIC = f'openai:{MODEL},anthropic:{ANTHROPIC_MODEL}'
+
+# If the first token has not arrived after this many seconds, the next provider is asked as well and the
+# first complete answer is used. Can be set with LLM_HEDGE_AFTER_SECONDS in the .env file.
+DEFAULT_HEDGE_AFTER_SECONDS = 4.0
+
+# The SDKs' own retries are kept short, since failing over to the next provider is usually quicker
+PROVIDER_MAX_RETRIES = 1
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+def record_prompt_usage(provider_name, prompt_tokens, cached_tokens):
+    """Record how many prompt tokens a request used and how many of them the provider served from its prompt cache."""
+    with _usage_lock:
+        usage = _usage.setdefault(provider_name, {'requests': 0, 'prompt_tokens': 0, 'cached_tokens': 0})
+        usage['requests'] += 1
+        usage['prompt_tokens'] += prompt_tokens or 0
+        usage['cached_tokens'] += cached_tokens or 0
+
+def print_prompt_cache_stats():
+    """Print the share of prompt tokens each provider read from its prompt cache."""
+    with _usage_lock:
+        for provider_name, usage in _usage.items():
+            if usage['prompt_tokens']:
+                print(f"{provider_name} prompt cache: {usage['cached_tokens']}/{usage['prompt_tokens']} prompt tokens cached "
+                      f"({usage['cached_tokens'] / usage['prompt_tokens']:.0%}) over {usage['requests']} requests.")
+
+def prompt_text(prompt):
+    """Return a prompt given either as a string or as (static prefix, variable part) as one string."""
+    return prompt if isinstance(prompt, str) else ''.join(prompt)
+
+def record_openai_usage(usage):
+    """Record the prompt and cached token counts from an OpenAI response's usage."""
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    record_prompt_usage('openai', usage.prompt_tokens, getattr(details, 'cached_tokens', 0) if details else 0)
+
+class OpenAIProvider:
+    """Chat completions from OpenAI.
+
+    OpenAI caches long prompt prefixes automatically, so a prompt only has to start with the same bytes
+    to benefit; the static prefix and the variable part are simply joined.
+    """
+
+    name = 'openai'
+
+    def __init__(self, model=MODEL):
+        self.model = model
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                self._client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=PROVIDER_MAX_RETRIES)
+            return self._client
+
+    def complete(self, system_prompt, prompt):
+        """Return the model's whole answer to a prompt (a string, or a static prefix and variable part)."""
+        response = self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt_text(prompt)}
+            ],
+            stream=False
+        )
+        record_openai_usage(response.usage)
+        return response.choices[0].message.content
+
+    def stream(self, system_prompt, prompt):
+        """Yield the model's answer to a prompt chunk by chunk. Closing the generator closes the connection."""
+        response = self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt_text(prompt)}
+            ],
+            stream=True,
+            stream_options={"include_usage": True}  # The last chunk carries the token usage
+        )
+        try:
+            for chunk in response:
+                if not chunk.choices:
+                    record_openai_usage(chunk.usage)
+                    continue
+                yield chunk_text(chunk) or ''
+        finally:
+            response.close()
+
+class AnthropicProvider:
+    """Messages from Anthropic.
+
+    Anthropic only caches a prompt prefix that is marked with cache_control, so the static prefix is sent
+    as its own content block with the marker, and the variable part as a second block.
+    """
+
+    name = 'anthropic'
+
+    def __init__(self, model=ANTHROPIC_MODEL):
+        self.model = model
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                import anthropic
+
+                self._client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'), max_retries=PROVIDER_MAX_RETRIES)
+            return self._client
+
+    def _request(self, system_prompt, prompt):
+        """Build the request arguments, marking the system prompt and static prefix for caching."""
+        if isinstance(prompt, str):
+            content = [{"type": "text", "text": prompt}]
+        else:
+            static_prefix, variable = prompt
+            content = [
+                {"type": "text", "text": static_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": variable},
+            ]
+        return {
+            'model': self.model,
+            'max_tokens': ANTHROPIC_MAX_TOKENS,
+            'system': system_prompt,
+            'messages': [{"role": "user", "content": content}],
+        }
+
+    @staticmethod
+    def _record_usage(usage):
+        cached = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        written = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        record_prompt_usage('anthropic', (usage.input_tokens or 0) + cached + written, cached)
+
+    def complete(self, system_prompt, prompt):
+        """Return the model's whole answer to a prompt (a string, or a static prefix and variable part)."""
+        response = self._get_client().messages.create(**self._request(system_prompt, prompt))
+        self._record_usage(response.usage)
+        return ''.join(block.text for block in response.content if block.type == 'text')
+
+    def stream(self, system_prompt, prompt):
+        """Yield the model's answer to a prompt chunk by chunk. Closing the generator closes the connection."""
+        with self._get_client().messages.stream(**self._request(system_prompt, prompt)) as stream:
+            for event in stream:
+                if event.type == 'message_start':
+                    # The prompt's token usage, including the cached tokens, arrives before the first token
+                    self._record_usage(event.message.usage)
+                elif event.type == 'content_block_delta' and event.delta.type == 'text_delta':
+                    yield event.delta.text
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'anthropic': AnthropicProvider,
+}
+
+def parse_provider_list(spec):
+    """Create providers from a comma separated list of provider or provider:model names."""
+    providers = []
+    for entry in spec.split(','):
+        name, _, model = entry.strip().partition(':')
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider '{name}'. Choose from: {', '.join(PROVIDERS)}.")
+        providers.append(PROVIDERS[name](model) if model else PROVIDERS[name]())
+    return providers
+
+class ProviderRouter:
+    """Sends prompts to one of several LLM providers, hedging slow requests and failing over on errors.
+
+    The first provider is asked first. If it has not produced a first token within hedge_after seconds,
+    the next provider is asked as well and whichever gives a complete, valid JSON answer first is used;
+    the other stream is closed. If a provider fails (an error, a rate limit or malformed JSON), the next
+    one is asked straight away.
+
+    Args:
+        providers (list): The providers in order of preference.
+        hedge_after (float, optional): How long to wait for the first token before asking the next provider.
+    """
+
+    def __init__(self, providers, hedge_after=DEFAULT_HEDGE_AFTER_SECONDS):
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.stats = {'requests': 0, 'hedged': 0, 'failovers': 0, 'wins': {}, 'latency': 0.0,
+                      'first_tokens': 0, 'time_to_first_token': 0.0}
+        self._stats_lock = threading.Lock()
+        self._tier_providers = {}
+
+    def _tier_provider(self, model):
+        """Return the OpenAI provider for one of the cascade's models, creating it on first use."""
+        with self._stats_lock:
+            if model not in self._tier_providers:
+                self._tier_providers[model] = OpenAIProvider(model)
+            return self._tier_providers[model]
+
+    def final_providers(self, cascade):
+        """Return the providers for the full hedged request.
+
+        With a model cascade, the cascade's last model takes the place of the preferred OpenAI provider, so
+        the hedged request is made with the model the cascade escalates to.
+        """
+        if cascade is None:
+            return self.providers
+        return [self._tier_provider(cascade.models[-1])] + self.providers[1:]
+
+    def model_cascade(self):
+        """Return the model cascade, or None. It is made of OpenAI models, so it only applies when OpenAI is the preferred provider."""
+        return get_model_cascade() if self.providers[0].name == 'openai' else None
+
+    def cached_models(self, cascade):
+        """Return every model whose cached answer to a prompt can be used: the cascade's tiers, then the providers'."""
+        cascade_models = cascade.models if cascade else []
+        return list(dict.fromkeys(cascade_models + [provider.model for provider in self.final_providers(cascade)]))
+
+    def _attempt(self, index, provider, system_prompt, prompt, stream, events, cancelled):
+        """Run one provider's request on a worker thread, reporting 'first' and 'done' events to the queue.
+
+        Events carry the provider's index in the router's list, which tells apart a provider listed twice.
+        """
+        reported = False
+        try:
+            parser = StreamingJSONParser()
+            if stream:
+                chunks = provider.stream(system_prompt, prompt)
+                started = False
+                try:
+                    for text in chunks:
+                        if cancelled.is_set():
+                            return
+                        if text and not started:
+                            started = True
+                            events.put(('first', index, provider, None))
+                        if reported:
+                            continue  # Only the token usage is left to read
+                        parser.feed(text)
+                        if parser.done:
+                            # Hand the answer over straight away; the rest of the stream is read for its usage
+                            parser.result()
+                            events.put(('done', index, provider, parser.text))
+                            reported = True
+                finally:
+                    chunks.close()
+                if reported:
+                    return
+            else:
+                parser.feed(provider.complete(system_prompt, prompt) or '')
+            parser.result()  # Raises if the answer did not hold complete JSON
+            events.put(('done', index, provider, parser.text))
+        except Exception as e:
+            if not reported:
+                events.put(('done', index, provider, e))
+
+    def request(self, system_prompt, prompt, stream=True, providers=None):
+        """Get an answer holding valid JSON from the fastest healthy provider.
+
+        Args:
+            providers (list, optional): The providers to ask, in order. Defaults to the router's own.
+
+        Returns:
+            tuple: (provider that answered, response text).
+
+        Raises:
+            RuntimeError: If every provider failed.
+        """
+        providers = providers or self.providers
+        events = queue.Queue()
+        attempts = {}              # provider index -> (start time, cancel event); a provider may be listed twice
+        start = time.monotonic()
+        next_index = 0
+        running = 0
+        first_token = False
+        errors = []
+
+        def launch():
+            nonlocal next_index, running
+            index, provider = next_index, providers[next_index]
+            next_index += 1
+            running += 1
+            attempts[index] = (time.monotonic(), threading.Event())
+            threading.Thread(target=self._attempt, args=(index, provider, system_prompt, prompt, stream, events, attempts[index][1]),
+                             name=f'llm-{provider.name}-{index}', daemon=True).start()
+
+        launch()
+        hedge_at = start + self.hedge_after
+        winner = None
+        try:
+            while running:
+                can_hedge = not first_token and next_index < len(providers)
+                try:
+                    kind, index, provider, value = events.get(timeout=max(0.0, hedge_at - time.monotonic()) if can_hedge else None)
+                except queue.Empty:
+                    print(f"No response within {self.hedge_after:.1f}s, also asking {providers[next_index].name}.")
+                    self._count('hedged')
+                    launch()
+                    hedge_at = time.monotonic() + self.hedge_after
+                    continue
+
+                if kind == 'first':
+                    first_token = True
+                    self._record_first_token(time.monotonic() - attempts[index][0])
+                    continue
+
+                running -= 1
+                if not isinstance(value, Exception):
+                    winner = index
+                    self._record_win(provider, time.monotonic() - start)
+                    return provider, value
+
+                errors.append(f"{provider.name}: {value}")
+                print(f"{provider.name} ({provider.model}) failed: {value}")
+                if next_index < len(providers):
+                    print(f"Failing over to {providers[next_index].name}.")
+                    self._count('failovers')
+                    launch()
+                    hedge_at = time.monotonic() + self.hedge_after
+        finally:
+            # Close the other streams that are still running
+            for index, (_, cancelled) in attempts.items():
+                if index != winner:
+                    cancelled.set()
+        raise RuntimeError(f"Every LLM provider failed ({'; '.join(errors)}).")
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _record_first_token(self, seconds):
+        with self._stats_lock:
+            self.stats['first_tokens'] += 1
+            self.stats['time_to_first_token'] += seconds
+
+    def _record_win(self, provider, latency):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['latency'] += latency
+            self.stats['wins'][provider.name] = self.stats['wins'].get(provider.name, 0) + 1
+
+    def extract_recipe(self, file_path, stream=True):
+        """Extract a recipe text file to JSON with the first provider that answers.
+
+        Args:
+            file_path (str): The path to the input file (.html or .txt) containing the recipe.
+            stream (bool, optional): Stream the answers, which lets slow requests be hedged on their first token.
+
+        Returns:
+            str or None: The JSON file path, or None if every provider failed.
+        """
+        # Only the ingredient lists are needed, so drop method steps, comments and page furniture first
+        dynamic_content = reduce_for_prompt(read_recipe_file(file_path), model=MODEL)
+        fallback_name = recipe_name_from_filename(file_path)
+
+        cascade = self.model_cascade()
+        cascade_models = cascade.models if cascade else []
+        providers = self.final_providers(cascade)
+
+        # Identical recipe text has been extracted before by one of the models, so skip the API call
+        for model in self.cached_models(cascade):
+            result_json = cached_recipe_json(dynamic_content, fallback_name, model=model)
+            if result_json is not None:
+                print("Recipe JSON served from the LLM response cache.")
+                return save_recipe_json(result_json, file_path)
+
+        # The static instructions are kept apart from the recipe so the providers can cache them
+        final_prompt = build_recipe_prompt_parts(dynamic_content, fallback_name)
+
+        # The cheaper models in the cascade are asked first, on their own. Only when none of their answers
+        # passes validation is the full hedged request made.
+        for model in cascade_models[:-1]:
+            start = time.perf_counter()
+            result_json = None
+            try:
+                provider = self._tier_provider(model)
+                result_json = parse_recipe_response(provider.complete(SYSTEM_PROMPT, final_prompt) or '', fallback_name)
+            except Exception as e:
+                print(f"Request to {model} failed: {e}")
+            if cascade.accept(model, result_json, validate_recipe_json, time.perf_counter() - start):
+                cache_recipe_json(dynamic_content, fallback_name, result_json, model=model)
+                return save_recipe_json(result_json, file_path)
+
+        start = time.perf_counter()
+        try:
+            provider, full_response = self.request(SYSTEM_PROMPT, final_prompt, stream=stream, providers=providers)
+        except RuntimeError as e:
+            print(e)
+            return None
+        print(f"Recipe extracted by {provider.name} ({provider.model}).")
+
+        result_json = parse_recipe_response(full_response, fallback_name)
+        if cascade:
+            cascade.record(provider.model, time.perf_counter() - start, not validate_recipe_json(result_json) if result_json else False)
+        if result_json is None:
+            return None
+        cache_recipe_json(dynamic_content, fallback_name, result_json, model=provider.model)
+        return save_recipe_json(result_json, file_path)
+
+    def print_stats(self):
+        """Print which providers answered, how fast, how often requests were hedged or failed over, and prompt cache use."""
+        stats = self.stats
+        if stats['requests']:
+            wins = ', '.join(f"{name} {count}" for name, count in stats['wins'].items())
+            print(f"LLM providers: {stats['requests']} answers ({wins}), {stats['latency'] / stats['requests']:.1f}s on average, "
+                  f"{stats['hedged']} hedged, {stats['failovers']} failed over.")
+        if stats['first_tokens']:
+            print(f"Time to first token: {stats['time_to_first_token'] / stats['first_tokens']:.2f}s on average "
+                  f"over {stats['first_tokens']} streamed requests.")
+        print_prompt_cache_stats()
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_provider_router():
+    """Return the shared provider router, configured from LLM_PROVIDERS, creating it on first use.
+
+    The variables are read here rather than at import time, so the values from the .env file loaded by main() are used.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            spec = os.getenv('LLM_PROVIDERS') or (DEFAULT_PROVIDERS_WITH_ANTHROPIC if os.getenv('ANTHROPIC_API_KEY') else DEFAULT_PROVIDERS)
+            hedge_after = float(os.getenv('LLM_HEDGE_AFTER_SECONDS', DEFAULT_HEDGE_AFTER_SECONDS))
+            _router = ProviderRouter(parse_provider_list(spec), hedge_after)
+        return _router
+
+# Example usage:
+# json_file_path = get_provider_router().extract_recipe('/path/to/recipe.txt')
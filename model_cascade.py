@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+from ingredient_parser import UNIT_LOOKUP
+
+# OpenAI models to try in order, cheapest first. A tier's answer is only used if it passes validation,
+# otherwise the next tier is asked. The last tier's answer is always used. Can be set with OPENAI_MODEL_CASCADE
+# in the .env file; OPENAI_MODEL_CASCADE=gpt-4 sends everything straight to GPT-4.
+DEFAULT_CASCADE_MODELS = 'gpt-4o-mini,gpt-4'
+
+_EMPTY_VALUES = ('', 'null', 'none', 'n/a')
+
+def _is_empty(value):
+    return value is None or str(value).strip().lower() in _EMPTY_VALUES
+
+def is_standard_unit(unittype):
+    """Check if a unit is one of the standardized units from the extraction prompt (in any of its spellings)."""
+    unittype = str(unittype).strip()
+    return unittype in UNIT_LOOKUP or unittype.lower() in UNIT_LOOKUP
+
+def validate_recipe_json(result_json):
+    """Check an extracted recipe against the format the prompt asks for.
+
+    Every ingredient needs a name. A measured ingredient needs a decimal quantity and one of the standardized
+    units; ingredients without a quantity may use a qualitative unit such as 'to taste'. Aisles are not
+    checked, as they are assigned locally rather than by the model.
+
+    Returns:
+        list: Descriptions of the problems found. Empty if the recipe is valid.
+    """
+    if not isinstance(result_json, dict):
+        return ["the answer is not a JSON object"]
+    ingredients = result_json.get('ingredients')
+    if not isinstance(ingredients, list) or not ingredients:
+        return ["no ingredients"]
+
+    problems = []
+    for ingredient in ingredients:
+        if not isinstance(ingredient, dict) or _is_empty(ingredient.get('ingredient')):
+            problems.append("an ingredient without a name")
+            continue
+        name = ingredient['ingredient']
+        quantity, unittype = ingredient.get('quantity'), ingredient.get('unittype')
+        if _is_empty(quantity):
+            continue
+        try:
+            float(str(quantity).strip())
+        except ValueError:
+            problems.append(f"quantity '{quantity}' for {name} is not a decimal number")
+        if not _is_empty(unittype) and not is_standard_unit(unittype):
+            problems.append(f"non-standard unit '{unittype}' for {name}")
+    return problems
+
+def validate_shopping_list(shopping_list):
+    """Check a merged shopping list: aisles, each holding named ingredients.
+
+    Returns:
+        list: Descriptions of the problems found. Empty if the shopping list is valid.
+    """
+    aisles = shopping_list.get('shoppingList') if isinstance(shopping_list, dict) else None
+    if not isinstance(aisles, dict) or not aisles:
+        return ["no shopping list"]
+
+    problems = []
+    for aisle, items in aisles.items():
+        if not isinstance(items, list):
+            problems.append(f"aisle '{aisle}' is not a list")
+            continue
+        for item in items:
+            if not isinstance(item, dict) or _is_empty(item.get('ingredient')):
+                problems.append(f"an item without a name in '{aisle}'")
+    return problems
+
+class ModelCascade:
+    """Tries models cheapest first and escalates to a larger model only when the answer fails validation.
+
+    Keeps each tier's hit rate (answers accepted out of answers requested) and latency.
+
+    Args:
+        models (list): Model names, cheapest first.
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self.stats = {model: {'requests': 0, 'accepted': 0, 'latency': 0.0} for model in models}
+        self._lock = threading.Lock()
+
+    def record(self, model, latency, accepted):
+        """Record one request to a tier."""
+        with self._lock:
+            stats = self.stats.setdefault(model, {'requests': 0, 'accepted': 0, 'latency': 0.0})
+            stats['requests'] += 1
+            stats['accepted'] += int(accepted)
+            stats['latency'] += latency
+
+    def is_last(self, model):
+        return model == self.models[-1]
+
+    def accept(self, model, result, validate, latency):
+        """Decide whether a tier's answer is used, recording the outcome.
+
+        Returns:
+            bool: True if the answer is used, False if the next tier should be asked.
+        """
+        problems = validate(result) if result is not None else ["no answer"]
+        accepted = not problems or self.is_last(model)
+        self.record(model, latency, not problems)
+        if problems:
+            summary = '; '.join(problems[:3]) + ('; ...' if len(problems) > 3 else '')
+            if accepted:
+                print(f"The {model} answer failed validation ({summary}), but there is no larger model to ask.")
+            else:
+                print(f"The {model} answer failed validation ({summary}), escalating to the next model.")
+        return accepted
+
+    def run(self, request, validate, start_tier=0):
+        """Ask each tier in turn until an answer passes validation.
+
+        Args:
+            request (callable): Called with a model name, returns the parsed answer or None on failure.
+            validate (callable): Returns the list of problems with an answer.
+            start_tier (int, optional): The first tier to ask, e.g. 1 if the cheapest tier already failed.
+
+        Returns:
+            tuple: (model that answered, answer). The answer is None if the last tier failed as well.
+        """
+        result = None
+        for model in self.models[start_tier:]:
+            start = time.perf_counter()
+            try:
+                result = request(model)
+            except Exception as e:
+                print(f"Request to {model} failed: {e}")
+                result = None
+            if self.accept(model, result, validate, time.perf_counter() - start):
+                return model, result
+        return self.models[-1], result
+
+    def print_stats(self):
+        """Print each tier's hit rate and average latency."""
+        lines = []
+        for model, stats in self.stats.items():
+            if stats['requests']:
+                lines.append(f"{model} {stats['accepted']}/{stats['requests']} accepted "
+                             f"({stats['accepted'] / stats['requests']:.0%}), {stats['latency'] / stats['requests']:.1f}s average")
+        if lines:
+            print("Model cascade: " + ", ".join(lines) + ".")
+
+_cascade = None
+_cascade_lock = threading.Lock()
+
+def get_model_cascade():
+    """Return the shared model cascade, configured from OPENAI_MODEL_CASCADE, creating it on first use.
+
+    The variable is read here rather than at import time, so a value from the .env file loaded by main() is used.
+    """
+    global _cascade
+    with _cascade_lock:
+        if _cascade is None:
+            models = os.getenv('OPENAI_MODEL_CASCADE') or DEFAULT_CASCADE_MODELS
+            _cascade = ModelCascade([model.strip() for model in models.split(',') if model.strip()])
+        return _cascade
+
+# Example usage:
+# model, result_json = get_model_cascade().run(lambda model: extract(model), validate_recipe_json)
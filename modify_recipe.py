@@ -1,5 +1,6 @@
 import json
 import re
+from aisle_classifier import get_aisle_classifier
 
 def modify_recipe(file_path, operation=None, ingredient_id=None, quantity=None, unittype=None, ingredient_name=None, multiplier=None):
     """
@@ -38,7 +39,7 @@ def modify_recipe(file_path, operation=None, ingredient_id=None, quantity=None,
             'ingredient': ingredient_name, 
             'quantity': quantity, 
             'unittype': unittype,
-            "aisle": "Unknown",
+            "aisle": get_aisle_classifier().classify(ingredient_name),
             'ID': new_id
         })
         display_ingredients(ingredients)
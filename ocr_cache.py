@@ -0,0 +1,63 @@
+import json
+import hashlib
+import threading
+from disk_cache import DiskCache
+
+# OCR text is small, so this holds tens of thousands of pages; the least recently used are evicted first
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+def hash_image_file(image_path):
+    """Return the SHA-256 of an image file's contents."""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def ocr_cache_key(image_hash, settings):
+    """Build the cache key for an image and the preprocessing/Tesseract settings it was read with.
+
+    Any change to the settings (contrast, threshold, --oem/--psm, ...) gives a new key, so old text is
+    never served for a different configuration.
+    """
+    return image_hash + ':' + json.dumps(settings, sort_keys=True)
+
+class OcrCache(DiskCache):
+    """Cache of OCR text keyed by image content, so the same photo is never read twice.
+
+    Keys come from the file contents rather than the filename, so a renamed copy of a photo is a hit
+    and a different photo saved under an old name is a miss.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        super().__init__('ocr', max_bytes=max_bytes)
+
+    def lookup(self, image_hash, settings):
+        """Return the cached text for an image, or None if it has not been read with these settings."""
+        cached = self.get(ocr_cache_key(image_hash, settings))
+        return cached[0].decode('utf-8') if cached else None
+
+    def store(self, image_hash, settings, text, image_path=None):
+        """Store the text read from an image."""
+        self.put(ocr_cache_key(image_hash, settings), text, meta={'image_path': image_path})
+
+    def print_stats(self):
+        """Print how many images were served from the cache versus read with OCR."""
+        total = self.stats['hits'] + self.stats['misses']
+        if total:
+            print(f"OCR cache: {self.stats['hits']}/{total} images served from cache "
+                  f"({self.total_bytes() / 1024:.0f} KB on disk).")
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+def get_ocr_cache():
+    """Return the shared OCR cache, creating it on first use."""
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = OcrCache()
+        return _ocr_cache
+
+# Example usage:
+# text = get_ocr_cache().lookup(hash_image_file('/path/to/your/image.jpg'), ocr_settings())
@@ -0,0 +1,93 @@
+import threading
+
+# Tesseract settings: LSTM engine (--oem 3) with fully automatic page segmentation (--psm 3)
+OCR_LANGUAGE = 'eng'
+OCR_OEM = 3
+OCR_PSM = 3
+
+def tesseract_config(oem=OCR_OEM, psm=OCR_PSM):
+    """Return the Tesseract command line flags for the given settings, e.g. '--oem 3 --psm 3'."""
+    return f'--oem {oem} --psm {psm}'
+
+class TesserocrEngine:
+    """Keeps one Tesseract engine loaded in-process through the tesserocr C API bindings.
+
+    The language model is loaded once when the engine is created and reused for every image,
+    instead of starting a tesseract process and reloading the model per image.
+    A TesserocrEngine must only be used from one thread at a time (see get_engine).
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang=OCR_LANGUAGE, oem=OCR_OEM, psm=OCR_PSM):
+        import tesserocr
+
+        self.psm = psm
+        self._api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem, psm=psm)
+
+    def image_to_string(self, image, psm=None):
+        """OCR a PIL image and return its text."""
+        self._api.SetPageSegMode(self.psm if psm is None else psm)
+        self._api.SetImage(image)
+        text = self._api.GetUTF8Text()
+        self._api.Clear()
+        return text
+
+    def close(self):
+        """Release the engine and its loaded model."""
+        self._api.End()
+
+class PytesseractEngine:
+    """Runs the tesseract command line program through pytesseract, one process per image."""
+
+    name = 'pytesseract'
+
+    def __init__(self, lang=OCR_LANGUAGE, oem=OCR_OEM, psm=OCR_PSM):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        self.lang = lang
+        self.oem = oem
+        self.psm = psm
+
+    def image_to_string(self, image, psm=None):
+        """OCR a PIL image and return its text."""
+        config = tesseract_config(self.oem, self.psm if psm is None else psm)
+        return self._pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+    def close(self):
+        pass
+
+ENGINES = {'tesserocr': TesserocrEngine, 'pytesseract': PytesseractEngine}
+
+def create_engine(name=None):
+    """Create an OCR engine, preferring the in-process tesserocr engine and falling back to pytesseract.
+
+    Args:
+        name (str, optional): 'tesserocr' or 'pytesseract' to force a specific engine.
+
+    Returns:
+        TesserocrEngine or PytesseractEngine: The engine.
+    """
+    if name:
+        return ENGINES[name]()
+    try:
+        return TesserocrEngine()
+    except (ImportError, RuntimeError) as e:
+        # tesserocr is not installed, or could not find the tessdata language files
+        print(f"In-process Tesseract engine unavailable ({e}), falling back to pytesseract.")
+        return PytesseractEngine()
+
+# One engine per thread (and therefore per worker process), as Tesseract's API is not thread-safe
+_engines = threading.local()
+
+def get_engine():
+    """Return this thread's OCR engine, creating and loading it on first use."""
+    engine = getattr(_engines, 'engine', None)
+    if engine is None:
+        engine = create_engine()
+        _engines.engine = engine
+    return engine
+
+# Example usage:
+# text = get_engine().image_to_string(Image.open('/path/to/your/image.jpg'))
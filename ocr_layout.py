@@ -0,0 +1,165 @@
+import re
+import cv2
+import numpy as np
+from PIL import Image
+
+# Longest side an image is scaled down to before OCR. This is about 300 DPI for an A4 page, which is
+# plenty for Tesseract; full resolution phone photos only make every step slower.
+MAX_OCR_SIDE = 3500
+
+# Tesseract page segmentation modes used for the layout steps
+PSM_SINGLE_LINE = 7
+PSM_SINGLE_COLUMN = 4
+
+# The number of text blocks whose first line is read while looking for the ingredients header
+MAX_HEADER_PROBES = 15
+
+# A block counts as a title when its characters are at least this many times taller than the page's body text
+TITLE_SCALE = 1.6
+
+INGREDIENT_HEADER_RE = re.compile(r'ingred', re.IGNORECASE)
+
+def downscale_for_ocr(img, max_side=MAX_OCR_SIDE):
+    """Scale an OpenCV image down so its longest side is at most max_side pixels. Smaller images are left alone."""
+    height, width = img.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+def estimate_char_height(ink):
+    """Estimate the typical character height from the median height of the page's connected ink blobs."""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    heights = heights[heights > 3]
+    return int(np.median(heights)) if heights.size else 10
+
+def detect_text_blocks(binary):
+    """Find the blocks of text on a binarised page (dark text on a light background).
+
+    Characters are smeared together with a dilation sized from the typical character height: wide enough
+    to join words into lines and tall enough to join lines into paragraphs, but not to bridge the wider
+    gaps between columns and paragraphs. Each connected blob becomes one block.
+
+    Returns:
+        list: (x, y, width, height) boxes sorted top to bottom, then left to right.
+    """
+    height, width = binary.shape[:2]
+    ink = cv2.bitwise_not(binary)
+    char_height = estimate_char_height(ink)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (char_height * 2, char_height * 2))
+    merged = cv2.dilate(ink, kernel, iterations=1)
+    contours, _ = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = width * height * 0.001
+    blocks = [cv2.boundingRect(contour) for contour in contours]
+    blocks = [block for block in blocks if block[2] * block[3] >= min_area and block[3] >= 8]
+    return sorted(blocks, key=lambda block: (block[1], block[0]))
+
+def count_text_lines(binary, block):
+    """Count the lines of text in a block from the gaps in its horizontal ink profile."""
+    x, y, w, h = block
+    ink_rows = (binary[y:y + h, x:x + w] < 128).sum(axis=1) > max(w * 0.01, 1)
+    # A line starts wherever an inked row follows an empty one
+    return int(ink_rows[0]) + int(np.count_nonzero(ink_rows[1:] & ~ink_rows[:-1]))
+
+def first_line_box(binary, block):
+    """Return the box around the first line of text in a block."""
+    x, y, w, h = block
+    ink_rows = (binary[y:y + h, x:x + w] < 128).sum(axis=1) > max(w * 0.01, 1)
+    rows = np.flatnonzero(ink_rows)
+    if rows.size == 0:
+        return block
+    start = rows[0]
+    end = start
+    while end + 1 < h and ink_rows[end + 1]:
+        end += 1
+    pad = max((end - start) // 3, 2)
+    top = max(start - pad, 0)
+    return (x, y + top, w, min(end + pad, h) - top)
+
+def looks_like_list(binary, block, page_width):
+    """Check if a block has the shape of an ingredient list: several short lines in a narrow column."""
+    lines = count_text_lines(binary, block)
+    return lines >= 3 and block[2] < page_width * 0.6 and block[3] / lines < block[2] / 3
+
+def crop_region(binary, box, pad=10):
+    """Cut a box, with a little padding, out of a page and return it as a PIL image."""
+    x, y, w, h = box
+    page_height, page_width = binary.shape[:2]
+    return Image.fromarray(binary[max(y - pad, 0):min(y + h + pad, page_height), max(x - pad, 0):min(x + w + pad, page_width)])
+
+def _same_column(block, other):
+    """Check if two blocks overlap horizontally by at least half the narrower one."""
+    overlap = min(block[0] + block[2], other[0] + other[2]) - max(block[0], other[0])
+    return overlap >= min(block[2], other[2]) / 2
+
+def find_ingredient_regions(binary, engine):
+    """Locate the ingredient list on a preprocessed page.
+
+    The first line of the largest text blocks is read to find an 'Ingredients' header. The header's block
+    is selected, or if the header stands on its own, the block directly below it in the same column. If no
+    header is found, the blocks shaped like a list (several short lines in a narrow column) are used instead.
+
+    Args:
+        binary (numpy.ndarray): The preprocessed, binarised page.
+        engine: The OCR engine from ocr_engine.get_engine().
+
+    Returns:
+        list: The (x, y, width, height) regions to OCR, or an empty list if no ingredient list was found.
+    """
+    page_width = binary.shape[1]
+    blocks = detect_text_blocks(binary)
+    if len(blocks) < 2:
+        return []
+
+    # Read only the first line of the biggest blocks, in page order
+    largest = sorted(blocks, key=lambda block: block[2] * block[3], reverse=True)[:MAX_HEADER_PROBES]
+    for block in sorted(largest, key=lambda block: (block[1], block[0])):
+        header_text = engine.image_to_string(crop_region(binary, first_line_box(binary, block)), psm=PSM_SINGLE_LINE)
+        if not INGREDIENT_HEADER_RE.search(header_text):
+            continue
+
+        regions = [block]
+        if count_text_lines(binary, block) <= 1:
+            # The header was set apart from its list, which is the next block down in the same column
+            below = [other for other in blocks if other[1] >= block[1] + block[3] and _same_column(block, other)]
+            regions.extend(below[:1])
+        return regions
+
+    return [block for block in blocks if looks_like_list(binary, block, page_width)]
+
+def find_title_blocks(binary):
+    """Find the blocks set in much larger type than the rest of the page, such as recipe titles.
+
+    Returns:
+        list: (x, y, width, height) boxes of short (at most 3 line) blocks whose characters are at least
+              TITLE_SCALE times the page's typical character height, top to bottom. Blocks on the same
+              line are merged.
+    """
+    ink = cv2.bitwise_not(binary)
+    page_char_height = estimate_char_height(ink)
+    titles = []
+    for block in detect_text_blocks(binary):
+        x, y, w, h = block
+        if count_text_lines(binary, block) > 3:
+            continue
+        if estimate_char_height(ink[y:y + h, x:x + w]) < page_char_height * TITLE_SCALE:
+            continue
+        # Large type has wide word gaps, so one title can be split into blocks side by side on the same line
+        if titles and y < titles[-1][1] + titles[-1][3] / 2:
+            px, py, pw, ph = titles[-1]
+            left, top = min(px, x), min(py, y)
+            titles[-1] = (left, top, max(px + pw, x + w) - left, max(py + ph, y + h) - top)
+        else:
+            titles.append(block)
+    return titles
+
+def ocr_regions(binary, regions, engine):
+    """OCR each region as a single column of text and join the results in page order."""
+    return '\n'.join(engine.image_to_string(crop_region(binary, region), psm=PSM_SINGLE_COLUMN).strip() for region in regions)
+
+# Example usage:
+# regions = find_ingredient_regions(binary, get_engine())
+# text = ocr_regions(binary, regions, get_engine())
@@ -0,0 +1,125 @@
+import threading
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from disk_cache import DiskCache
+
+# Pages fetched within this window are served straight from disk without touching the network
+FRESHNESS_SECONDS = 7 * 24 * 60 * 60
+
+# Pages older than this, or beyond the size limit (least recently used first), are evicted
+MAX_AGE_SECONDS = 60 * 24 * 60 * 60
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# Query parameters that only track where a visitor came from and never change the page
+TRACKING_PARAMS = ('fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'igshid')
+
+def canonical_url(url):
+    """Normalise a URL so trivially different links to the same recipe share one cache entry.
+
+    The scheme and host are lower-cased, default ports, fragments, tracking parameters and trailing
+    slashes are dropped, and the remaining query parameters are sorted.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    path = parsed.path.rstrip('/') or '/'
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not name.lower().startswith('utm_') and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse((scheme, netloc, path, '', urlencode(query), ''))
+
+class PageCache(DiskCache):
+    """Cache of downloaded HTML pages keyed by canonical URL, with the validators needed for conditional GETs."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_age=MAX_AGE_SECONDS, freshness=FRESHNESS_SECONDS):
+        super().__init__('pages', max_bytes=max_bytes, max_age=max_age)
+        self.freshness = freshness
+        self.stats['revalidated'] = 0
+
+    def lookup(self, url, allow_partial=True):
+        """Look up a page.
+
+        Args:
+            url (str): The page to look up.
+            allow_partial (bool, optional): If False, a page whose download was stopped early counts as not cached.
+
+        Returns:
+            tuple: (body, conditional request headers, is_fresh). The body is None if the page is not
+                   cached. If is_fresh is True the body can be used without contacting the server.
+        """
+        cached = self.get(canonical_url(url), count=False)
+        if cached is None:
+            return None, {}, False
+
+        body, meta, age = cached
+        if meta.get('partial') and not allow_partial:
+            return None, {}, False
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return body, headers, age < self.freshness
+
+    def record_hit(self):
+        """Count a page served from disk without any network request."""
+        with self._lock:
+            self.stats['hits'] += 1
+
+    def record_revalidated(self, url, response):
+        """Count a 304 response and restart the freshness window of the cached page."""
+        key = canonical_url(url)
+        with self._lock:
+            self.stats['revalidated'] += 1
+            cached = self._index.get(key)
+            meta = dict(cached['meta']) if cached else {}
+            # Servers may send updated validators along with the 304
+            meta.update(self._validators(response, keep=meta))
+            self.touch(key, meta=meta)
+
+    def store(self, url, body, response, partial=False):
+        """Count a downloaded page and store it together with its ETag/Last-Modified validators.
+
+        partial marks a body whose download was stopped early, which callers needing the whole page skip.
+        """
+        with self._lock:
+            self.stats['misses'] += 1
+        meta = self._validators(response)
+        if partial:
+            meta['partial'] = True
+        self.put(canonical_url(url), body, meta=meta)
+
+    @staticmethod
+    def _validators(response, keep=None):
+        """Pull the ETag and Last-Modified headers out of a response."""
+        keep = keep or {}
+        return {
+            'etag': response.headers.get('ETag', keep.get('etag')),
+            'last_modified': response.headers.get('Last-Modified', keep.get('last_modified')),
+        }
+
+    def print_stats(self):
+        """Print how many pages were served from the cache versus downloaded."""
+        served = self.stats['hits'] + self.stats['revalidated']
+        total = served + self.stats['misses']
+        if total:
+            print(f"Page cache: {self.stats['hits']} fresh hits, {self.stats['revalidated']} revalidated (304), "
+                  f"{self.stats['misses']} downloaded - {served}/{total} pages served from cache "
+                  f"({self.total_bytes() / (1024 * 1024):.1f} MB on disk).")
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache():
+    """Return the shared page cache, creating it on first use."""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
+
+# Example usage:
+# body, headers, is_fresh = get_page_cache().lookup('https://chejorge.com/2020/07/24/vegan-dan-dan-noodles/')
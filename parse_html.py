@@ -0,0 +1,104 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+from section_extractor import HEADER_TAGS, CONTAINER_TAGS
+
+# Backends in order of preference when none is requested (see benchmark_parsers.py). 'selectolax' uses
+# the lexbor engine to strip unwanted elements before building the soup, 'html.parser' is always available.
+BACKENDS = ['lxml', 'selectolax', 'html.parser', 'html5lib']
+DEFAULT_BACKEND = None  # None picks the fastest installed backend
+
+# The only elements the section extractor looks at. Anything outside them is never built into the tree.
+TARGET_TAGS = HEADER_TAGS + list(CONTAINER_TAGS)
+
+# Elements whose content is never recipe text. JSON-LD scripts are kept for the structured data extractor.
+UNWANTED_TAGS = ['script', 'style', 'noscript', 'svg', 'iframe', 'template']
+_UNWANTED_PATTERN = (
+    r'<!--.*?-->'
+    r'|<script\b(?![^>]*application/ld\+json)[^>]*>.*?</script\s*>'
+    r'|<(style|noscript|svg|iframe|template)\b[^>]*>.*?</\1\s*>'
+)
+_UNWANTED_RE = re.compile(_UNWANTED_PATTERN, re.IGNORECASE | re.DOTALL)
+_UNWANTED_RE_BYTES = re.compile(_UNWANTED_PATTERN.encode('ascii'), re.IGNORECASE | re.DOTALL)
+
+def is_backend_available(backend):
+    """Check if the library behind a backend is installed."""
+    try:
+        if backend == 'selectolax':
+            from selectolax.lexbor import LexborHTMLParser  # noqa: F401
+        elif backend == 'lxml':
+            import lxml  # noqa: F401
+        elif backend == 'html5lib':
+            import html5lib  # noqa: F401
+        elif backend != 'html.parser':
+            return False
+    except ImportError:
+        return False
+    return True
+
+def available_backends():
+    """Return the installed backends in order of preference."""
+    return [backend for backend in BACKENDS if is_backend_available(backend)]
+
+def resolve_backend(backend=None):
+    """Pick the backend to use, falling back to the fastest installed one."""
+    backend = backend or DEFAULT_BACKEND
+    if backend:
+        if not is_backend_available(backend):
+            raise ValueError(f"HTML parser backend '{backend}' is not installed. Available: {', '.join(available_backends())}")
+        return backend
+    return available_backends()[0]
+
+def strip_unwanted(markup):
+    """Remove comments, scripts, styles and other non-text elements before parsing.
+
+    Args:
+        markup (str or bytes): The raw HTML.
+
+    Returns:
+        str or bytes: The HTML without those elements, of the same type as the input.
+    """
+    pattern = _UNWANTED_RE_BYTES if isinstance(markup, bytes) else _UNWANTED_RE
+    return pattern.sub(b'' if isinstance(markup, bytes) else '', markup)
+
+def _strip_with_lexbor(markup):
+    """Use selectolax's lexbor engine to drop unwanted elements, returning the cleaned HTML."""
+    from selectolax.lexbor import LexborHTMLParser
+
+    if isinstance(markup, bytes):
+        markup = markup.decode('utf-8', errors='replace')
+    tree = LexborHTMLParser(markup)
+    for node in tree.css(', '.join(UNWANTED_TAGS)):
+        if node.tag != 'script' or 'ld+json' not in (node.attributes.get('type') or ''):
+            node.decompose()
+    return tree.html or ''
+
+def make_soup(markup, backend=None, targeted=False):
+    """Parse HTML into a BeautifulSoup tree with the selected backend.
+
+    Args:
+        markup (str or bytes): The raw HTML.
+        backend (str, optional): One of BACKENDS. Defaults to the fastest installed backend.
+        targeted (bool, optional): If True, comments, scripts and styles are skipped and only header and
+            section/div/span elements (with everything inside them) are built into the tree.
+
+    Returns:
+        BeautifulSoup: The parsed document.
+    """
+    backend = resolve_backend(backend)
+    tree_builder = backend
+
+    if backend == 'selectolax':
+        # lexbor does the heavy lifting of throwing away unwanted elements, the soup is built from what is left
+        markup = _strip_with_lexbor(markup)
+        tree_builder = 'lxml' if is_backend_available('lxml') else 'html.parser'
+    elif targeted:
+        markup = strip_unwanted(markup)
+
+    # html5lib always builds the full tree, so there is nothing to gain from a strainer
+    if targeted and tree_builder != 'html5lib':
+        return BeautifulSoup(markup, tree_builder, parse_only=SoupStrainer(TARGET_TAGS))
+    return BeautifulSoup(markup, tree_builder)
+
+# Example usage:
+# soup = make_soup(html, targeted=True)
+# soup = make_soup(html, backend='lxml')
@@ -1,9 +1,17 @@
 import os
 import re
-import scrape_with_beautifulsoup
-import scrape_with_selenium
-import scrape_text_from_image
-import send_recipe_to_openai
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from page_cache import get_page_cache
+from strategy_cache import get_strategy_cache
+from llm_providers import get_provider_router
+
+# The scrapers, OCR and document modules pull in requests/bs4, Selenium, OpenCV, NumPy, PIL and Tesseract,
+# and the extraction engine pulls in asyncio, so each one is imported inside the function that first needs it. Starting the app, or adding a recipe
+# from a website, then never loads the OCR stack, and Selenium is only loaded when a page needs a browser.
+
+# Documents that may hold several pages (see document_ingest.DOCUMENT_EXTENSIONS)
+DOCUMENT_EXTENSIONS = ('.pdf', '.tif', '.tiff')
 
 # Get the root directory of the application (the directory where this script is located)
 root_directory = os.path.dirname(os.path.abspath(__file__))
@@ -20,18 +28,44 @@ def is_valid_filepath(filepath):
     """Check if the input is a valid file path (Mac or PC)."""
     return os.path.isfile(filepath)
 
+def split_recipe_urls(recipe_input):
+    """Split an input holding several whitespace or comma separated URLs into a list.
+
+    Returns:
+        list or None: The URLs if the input contains more than one and all of them are valid, otherwise None.
+    """
+    parts = recipe_input.replace(',', ' ').split()
+    if len(parts) > 1 and all(is_valid_url(part) for part in parts):
+        return parts
+    return None
+
+def is_multipage_document(path):
+    """Check if the input is a PDF or multi-page TIFF (e.g. a scanned cookbook chapter)."""
+    if not (is_valid_filepath(path) and path.lower().endswith(DOCUMENT_EXTENSIONS)):
+        return False
+    import document_ingest
+
+    return document_ingest.is_multipage_document(path)
+
+def is_valid_directory(path):
+    """Check if the input is an existing folder (e.g. of cookbook photos)."""
+    return os.path.isdir(path)
+
 def get_recipe_input():
-    """Prompt the user for input and validate it as a URL or file path."""
+    """Prompt the user for input and validate it as a URL, a list of URLs, a file path (image, PDF or TIFF) or a folder of images."""
     while True:
-        recipe_input = input("\n\nPlease provide a recipe for Chefbuddy to analyse.  \n\nIf the recipe is a website, please ensure you provide the full HTTP/HTTPS address.  \n\nIf the recipe is an image, please provide the file path to the image stored on your computer. \n\nTo cancel this operation hit 'enter':\n")
+        recipe_input = input("\n\nPlease provide a recipe for Chefbuddy to analyse.  \n\nIf the recipe is a website, please ensure you provide the full HTTP/HTTPS address.  You can paste several addresses separated by spaces to add a whole meal plan at once.  \n\nIf the recipe is an image or a scanned PDF, please provide the file path to it on your computer, or the path to a folder to add every image in it. \n\nTo cancel this operation hit 'enter':\n")
 
         if not recipe_input.strip():
             print("\nNo input provided. Continuing with remaining steps.")
             return None
-                
-        if is_valid_url(recipe_input):
+
+        recipe_urls = split_recipe_urls(recipe_input)
+        if recipe_urls:
+            return recipe_urls
+        elif is_valid_url(recipe_input):
             return recipe_input
-        elif is_valid_filepath(recipe_input):
+        elif is_valid_filepath(recipe_input) or is_valid_directory(recipe_input):
             return recipe_input
         else:
             print("\nInvalid input. Please enter a valid URL or file path.")
@@ -40,9 +74,108 @@ def get_recipe_input():
             print("  - File path (Mac): /Users/username/Documents/recipe.txt")
             print("  - File path (PC): C:\\Users\\username\\Documents\\recipe.txt\n")
 
+def try_tier(tier, url):
+    """Scrape a URL with one tier.
+
+    Returns:
+        tuple: (success, json_file_path, save_path). The structured tier produces the JSON file directly,
+               the static and browser tiers produce a text file for the LLM.
+    """
+    if tier == 'structured':
+        import structured_data
+
+        json_file_path = structured_data.scrape_structured_recipe(url)
+        return bool(json_file_path), json_file_path, None
+
+    if tier == 'static':
+        import scrape_with_beautifulsoup
+
+        # URL input: Attempt to scrape the recipe using BeautifulSoup
+        save_path = scrape_with_beautifulsoup.scrape_with_beautifulsoup(url, return_filepath=True)
+    else:
+        import scrape_with_selenium
+
+        save_path = scrape_with_selenium.scrape_with_selenium(url)
+
+    # Debug: Print the returned save_path
+    print(f"Scraped content save path ({tier}): {save_path}")
+
+    # Validate if the scraping worked by checking the file contents
+    if save_path and os.path.exists(save_path):
+        with open(save_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+            print(f"Content of {os.path.basename(save_path)}:\n{content}")
+        return "NO TEXT FOUND" not in content, None, save_path
+
+    print(f"File at {save_path} does not exist or could not be accessed. Scraping might have failed.")
+    return False, None, save_path
+
+def scrape_recipe_url(url):
+    """Scrape a recipe page, trying the tiers in the order the domain's strategy record suggests.
+
+    Domains that always need JavaScript go straight to Selenium, while new domains try structured data,
+    then BeautifulSoup, then Selenium. Every outcome is recorded so the next visit starts with the tier
+    that worked.
+
+    Returns:
+        tuple: (json_file_path, save_path). json_file_path is set if the structured tier succeeded, otherwise
+               save_path is the text file to send to the LLM (or None if every tier failed to save one).
+    """
+    strategies = get_strategy_cache()
+    last_save_path = None
+    for tier in strategies.plan(url):
+        print(f"Attempting to scrape {url} for ingredients using the {tier} tier.")
+        success, json_file_path, save_path = try_tier(tier, url)
+        strategies.record(url, tier, success)
+        if success:
+            return json_file_path, save_path
+        last_save_path = save_path or last_save_path
+
+    return None, last_save_path
+
+def extract_recipe_json(save_path):
+    """Send a scraped or OCR'd recipe text file to the LLM providers and return the path of the JSON file created.
+
+    Slow requests are hedged and failed requests fail over to the next provider (see llm_providers).
+
+    Returns:
+        str: The path to the JSON file created by the LLM, or None if processing fails.
+    """
+    # If save_path was set and file exists, send the recipe to the LLM for further processing
+    if save_path and os.path.exists(save_path):
+        print(f"Sending the processed recipe file {os.path.basename(save_path)} for analysis.")
+        json_file_path = get_provider_router().extract_recipe(save_path)
+
+        # Return the JSON file path if it exists
+        if json_file_path and os.path.exists(json_file_path):
+            print(f"JSON file successfully created at: {json_file_path}")
+            return json_file_path
+        else:
+            print("LLM processing failed or returned an invalid file path.")
+            return None
+    else:
+        print("No valid file path available to send to OpenAI.")
+        return None
+
+def submit_recipe_json(save_path):
+    """Queue a scraped or OCR'd recipe text file on the concurrent extraction engine.
+
+    Returns:
+        concurrent.futures.Future or None: Resolves to the JSON file path (or None on failure). None if there is no file to send.
+    """
+    from extraction_engine import get_extraction_engine
+
+    if save_path and os.path.exists(save_path):
+        print(f"Queueing the processed recipe file {os.path.basename(save_path)} for OpenAI analysis.")
+        return get_extraction_engine().submit(save_path)
+    print("No valid file path available to send to OpenAI.")
+    return None
+
 def process_recipe(recipe_input):
     """Process a single recipe input by scraping and sending it to OpenAI.
 
+    URLs whose page carries schema.org Recipe structured data are converted locally instead.
+
     Args:
         recipe_input (str): A URL or file path to process the recipe from.
         
@@ -52,45 +185,111 @@ def process_recipe(recipe_input):
     save_path = None  # Initialize save_path to ensure it's defined in all branches
 
     if is_valid_url(recipe_input):
-        # URL input: Attempt to scrape the recipe using BeautifulSoup
-        print(f"Attempting to scrape {recipe_input} for ingredients using BeautifulSoup.")
-        save_path = scrape_with_beautifulsoup.scrape_with_beautifulsoup(recipe_input, return_filepath=True)
-
-        # Debug: Print the returned save_path
-        print(f"Scraped content save path: {save_path}")
-
-        # Validate if the scraping worked by checking the file contents
-        if save_path and os.path.exists(save_path):
-            with open(save_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                print(f"Content of {os.path.basename(save_path)}:\n{content}")
-                
-                # If the content contains "NO TEXT FOUND", use Selenium to scrape
-                if "NO TEXT FOUND" in content:
-                    print(f"'NO TEXT FOUND' detected, reprocessing with Selenium: {recipe_input}")
-                    save_path = scrape_with_selenium.scrape_with_selenium(recipe_input)
-                    print(f"Selenium scraping save path: {save_path}")
-        else:
-            print(f"File at {save_path} does not exist or could not be accessed. Scraping might have failed.")
+        # Scrape with the tier that works for this domain. Structured data gives the JSON without any LLM call
+        json_file_path, save_path = scrape_recipe_url(recipe_input)
+        if json_file_path:
+            return json_file_path
     
     elif is_valid_filepath(recipe_input):
+        import scrape_text_from_image
+
         # File path input: Process the file using the image text extraction function
         print(f"Processing file path: {recipe_input}")
         save_path = scrape_text_from_image.scrape_text_from_image(recipe_input)
         print(f"Image extraction save path: {save_path}")
 
-    # If save_path was set and file exists, send the recipe to OpenAI for further processing
-    if save_path and os.path.exists(save_path):
-        print(f"Sending the processed recipe file {os.path.basename(save_path)} to OpenAI for analysis.")
-        json_file_path = send_recipe_to_openai.send_recipe_to_openai(save_path, return_json_filepath=True)
+    return extract_recipe_json(save_path)
 
-        # Return the JSON file path if it exists
-        if json_file_path and os.path.exists(json_file_path):
-            print(f"JSON file successfully created at: {json_file_path}")
-            return json_file_path
+def process_image_folder(images):
+    """OCR a folder (or list) of recipe images in parallel and send each one to OpenAI as soon as its text is ready.
+
+    Args:
+        images (str or list): A folder of images, or a list of image files and/or folders.
+
+    Returns:
+        list: The JSON file path (or None on failure) for each image, in the order the images finished.
+    """
+    import scrape_text_from_image
+    from extraction_engine import get_extraction_engine
+
+    futures = []
+    for image_path, save_path in scrape_text_from_image.scrape_text_from_images(images):
+        print(f"Image extraction save path for {os.path.basename(image_path)}: {save_path}")
+        futures.append(submit_recipe_json(save_path))
+    json_file_paths = [future.result() if future else None for future in futures]
+    get_extraction_engine().print_stats()
+    return json_file_paths
+
+def process_document(document_path):
+    """OCR a scanned PDF or multi-page TIFF and send each recipe in it to OpenAI as soon as it has been read.
+
+    The LLM calls run on the extraction engine while the following pages are still being OCR'd.
+
+    Args:
+        document_path (str): The PDF or TIFF file.
+
+    Returns:
+        list: The JSON file path (or None on failure) for each recipe, in the order they appear in the document.
+    """
+    import document_ingest
+    from extraction_engine import get_extraction_engine
+
+    print(f"Processing document: {document_path}")
+    futures = [submit_recipe_json(save_path) for save_path in document_ingest.scrape_text_from_document(document_path)]
+    json_file_paths = [future.result() if future else None for future in futures]
+    get_extraction_engine().print_stats()
+    return json_file_paths
+
+def prewarm_browsers(count):
+    """Start launching up to count headless browsers (at most the pool size) in the background."""
+    from browser_pool import get_browser_pool
+
+    threading.Thread(target=get_browser_pool().prewarm, args=(count,), name='browser-prewarm', daemon=True).start()
+
+def process_recipes(recipe_inputs, max_concurrency=None):
+    """Process several recipe inputs, scraping all of the URLs concurrently up front.
+
+    Each URL follows its domain's scraping strategy. Static fetches share the pooled HTTP session and
+    browser renders share the warm browser pool, so both run in parallel up to their pool sizes.
+    Each page's text is queued on the extraction engine as soon as it has been scraped, so the OpenAI
+    calls run concurrently with each other and with the remaining scrapes.
+
+    Args:
+        recipe_inputs (list): URLs and/or file paths to process.
+        max_concurrency (int, optional): The maximum number of pages scraped at the same time.
+            Defaults to scrape_with_beautifulsoup.DEFAULT_MAX_CONCURRENCY.
+
+    Returns:
+        list: The JSON file path (or None on failure) for each input, in the same order as the input.
+    """
+    import scrape_with_beautifulsoup
+    from extraction_engine import get_extraction_engine
+
+    max_concurrency = max_concurrency or scrape_with_beautifulsoup.DEFAULT_MAX_CONCURRENCY
+    urls = list(dict.fromkeys(recipe_input for recipe_input in recipe_inputs if is_valid_url(recipe_input)))
+    print(f"Scraping {len(urls)} recipe pages with up to {max_concurrency} concurrent requests.")
+    scrape_with_beautifulsoup.get_session(pool_size=max_concurrency)
+
+    # Domains known to need a browser get one launched while the other pages are fetched
+    browser_urls = sum(1 for url in urls if get_strategy_cache().preferred_tier(url) == 'browser')
+    if browser_urls:
+        prewarm_browsers(browser_urls)
+
+    extracted = {}
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {executor.submit(scrape_recipe_url, url): url for url in urls}
+        for future in as_completed(futures):
+            json_file_path, save_path = future.result()
+            # Structured data gives the JSON straight away, other pages go to the LLM
+            extracted[futures[future]] = json_file_path or submit_recipe_json(save_path)
+    get_page_cache().print_stats()
+
+    results = []
+    for recipe_input in recipe_inputs:
+        if recipe_input in extracted:
+            result = extracted[recipe_input]
+            results.append(result if result is None or isinstance(result, str) else result.result())
         else:
-            print("OpenAI processing failed or returned an invalid file path.")
-            return None
-    else:
-        print("No valid file path available to send to OpenAI.")
-        return None
+            results.append(process_recipe(recipe_input))
+    get_extraction_engine().print_stats()
+    return results
@@ -1,91 +1,326 @@
-import pytesseract
 from PIL import Image
 import os
+import json
 import cv2
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ocr_engine import get_engine, OCR_LANGUAGE, OCR_OEM, OCR_PSM
+from ocr_layout import downscale_for_ocr, find_ingredient_regions, ocr_regions, MAX_OCR_SIDE
+from ocr_cache import get_ocr_cache, hash_image_file
 
-def adjust_contrast(gray_image):
-    alpha = 1.5  # Contrast control (1.0-3.0). Adjust as needed.
-    beta = 0     # Brightness control (0-100). Adjust as needed.
-    adjusted = cv2.convertScaleAbs(gray_image, alpha=alpha, beta=beta)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp')
+
+# Text files are named <image name>__<start of the image hash>.txt. recipe_name_from_filename drops the suffix.
+IMAGE_HASH_SEPARATOR = '__'
+IMAGE_HASH_SUFFIX_LENGTH = 8
+
+# Only OCR the ingredient list of each page rather than headnotes, photos and page furniture.
+# The recipe name falls back to the image's filename in the LLM prompt.
+OCR_INGREDIENTS_ONLY = True
+
+# Get the root directory of the application (the directory where this script is located)
+root_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Preprocessing settings written by tune_preprocessing.py. Any setting missing from it keeps its default.
+PREPROCESS_CONFIG_PATH = os.path.join(root_directory, 'preprocess_config.json')
+
+DEFAULT_PREPROCESS_CONFIG = {
+    'alpha': 1.5,               # Contrast control (1.0-3.0)
+    'beta': 0,                  # Brightness control (0-100)
+    'threshold': 'adaptive',    # 'adaptive' (Gaussian, per neighbourhood) or 'otsu' (one threshold for the page)
+    'block_size': 15,           # Neighbourhood size of the adaptive threshold (odd)
+    'c': 3,                     # Constant subtracted from the neighbourhood mean
+    'median_blur': 3,           # Kernel size of the noise removing median blur (odd, 0 to skip it)
+    'max_side': MAX_OCR_SIDE,   # Longest side images are scaled down to
+}
+
+def load_preprocess_config(path=PREPROCESS_CONFIG_PATH):
+    """Return the default preprocessing settings, updated with any saved in the config file."""
+    config = dict(DEFAULT_PREPROCESS_CONFIG)
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            config.update(json.load(file))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable preprocessing config {path}: {e}")
+    return config
+
+def save_preprocess_config(config, path=PREPROCESS_CONFIG_PATH):
+    """Save preprocessing settings for preprocess_image to use from now on."""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(config, file, indent=2)
+    print(f"Preprocessing settings saved to {path}")
+
+preprocess_config = load_preprocess_config()
+
+def ocr_settings(ingredients_only=OCR_INGREDIENTS_ONLY):
+    """Return every setting that changes the OCR text, which is part of the OCR cache key."""
+    return dict(preprocess_config, lang=OCR_LANGUAGE, oem=OCR_OEM, psm=OCR_PSM, ingredients_only=ingredients_only)
+
+def adjust_contrast(gray_image, config=None):
+    config = config or preprocess_config
+    adjusted = cv2.convertScaleAbs(gray_image, alpha=config['alpha'], beta=config['beta'])
     return adjusted
 
-def preprocess_image(image_path):
-    # Load the image using OpenCV
-    img = cv2.imread(image_path)
-    
-    # Check if the image was loaded successfully
-    if img is None:
-        raise ValueError(f"Failed to load image from path: {image_path}. Please check the file format and path.")
-    
+def preprocess_array(img, config=None):
+    """Binarise an OpenCV (BGR) image for OCR and return it as a numpy array.
+
+    Args:
+        img (numpy.ndarray): The image.
+        config (dict, optional): Preprocessing settings. Defaults to the saved settings (see load_preprocess_config).
+    """
+    config = config or preprocess_config
+
+    # Large photos are scaled down first, as every later step scales with the pixel count
+    img = downscale_for_ocr(img, config['max_side'])
+
     # Convert to grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
     # Adjust contrast
-    gray = adjust_contrast(gray)
+    gray = adjust_contrast(gray, config)
     # Optionally save the image for debugging
     # cv2.imwrite('gray_contrast.png', gray)
 
-    # Apply adaptive thresholding to binarize the image
-    binary = cv2.adaptiveThreshold(
-        gray, 255, 
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        cv2.THRESH_BINARY, 
-        15, 3  # Adjusted parameters
-    )
+    # Binarize the image, with one threshold per neighbourhood or one for the whole page
+    if config['threshold'] == 'otsu':
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    else:
+        binary = cv2.adaptiveThreshold(
+            gray, 255, 
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+            cv2.THRESH_BINARY, 
+            config['block_size'], config['c']
+        )
     # Optionally save the image for debugging
     # cv2.imwrite('binary.png', binary)
 
     # Remove noise by applying median blur
-    denoised = cv2.medianBlur(binary, 3)
+    if not config['median_blur']:
+        return binary
+    denoised = cv2.medianBlur(binary, config['median_blur'])
     # Optionally save the image for debugging
     # cv2.imwrite('denoised.png', denoised)
 
+    return denoised
+
+def load_image(image_path):
+    """Load an image with OpenCV, raising ValueError if it cannot be read."""
+    img = cv2.imread(image_path)
+    
+    # Check if the image was loaded successfully
+    if img is None:
+        raise ValueError(f"Failed to load image from path: {image_path}. Please check the file format and path.")
+    return img
+
+def preprocess_image(image_path):
     # Return the processed image in PIL format
-    return Image.fromarray(denoised)
+    return Image.fromarray(preprocess_array(load_image(image_path)))
+
+def _ingredient_text(binary, engine, verbose=True):
+    """OCR only the ingredient list of a preprocessed page, or return None if it cannot be located."""
+    regions = find_ingredient_regions(binary, engine)
+    if not regions:
+        return None
+    if verbose:
+        print(f"Found the ingredient list in {len(regions)} of the page's text blocks.")
+    return ocr_regions(binary, regions, engine)
 
-def scrape_text_from_image(image_path):
+def extract_ingredient_text(image_path, engine=None):
+    """OCR only the ingredient list of a recipe image.
+
+    Returns:
+        str: The ingredient text, or None if no ingredient list could be located on the page.
+    """
+    return _ingredient_text(np.array(preprocess_image(image_path)), engine or get_engine())
+
+def read_array_text(img, ingredients_only=OCR_INGREDIENTS_ONLY, config=None, engine=None, verbose=True):
+    """Preprocess and OCR a decoded (BGR) image, returning its text.
+
+    This is the whole OCR path of the app, which tune_preprocessing.py also times and scores.
+
+    Args:
+        img (numpy.ndarray): The image.
+        ingredients_only (bool, optional): Only OCR the ingredient list, falling back to the whole page
+            if it cannot be located.
+        config (dict, optional): Preprocessing settings. Defaults to the saved settings.
+        engine (optional): The OCR engine. Defaults to this process's engine.
+        verbose (bool, optional): Report when the ingredient list was found.
+    """
+    engine = engine or get_engine()
+    binary = preprocess_array(img, config)
+    text = _ingredient_text(binary, engine, verbose) if ingredients_only else None
+    if text is None:
+        # Extract text from the whole page with this worker's Tesseract engine (--oem 3 --psm 3), which stays
+        # loaded between images instead of starting a new tesseract process each time
+        text = engine.image_to_string(Image.fromarray(binary))
+    return text
+
+def read_image_text(image_path, ingredients_only=OCR_INGREDIENTS_ONLY):
+    """Preprocess and OCR an image, returning its text."""
+    return read_array_text(load_image(image_path), ingredients_only)
+
+def save_image_text(image_path, text, image_hash=None):
+    """Save the text read from an image to the temp folder and return the text file path.
+
+    The start of the image's hash is added to the file name, so images with the same name in different
+    folders get their own text files.
+    """
+    # Get the root directory of the application (the directory where this script is located)
+    root_directory = os.path.dirname(os.path.abspath(__file__))
+
+    # Define the path for the 'temp' folder
+    temp_folder_path = os.path.join(root_directory, 'temp')
+
+    # Ensure the 'temp' folder exists
+    if not os.path.exists(temp_folder_path):
+        os.makedirs(temp_folder_path)
+
+    # Get the base name of the image file (without extension)
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    if image_hash:
+        base_name += IMAGE_HASH_SEPARATOR + image_hash[:IMAGE_HASH_SUFFIX_LENGTH]
+    
+    # Define the path for the text file in the 'temp' folder
+    text_file_path = os.path.join(temp_folder_path, base_name + '.txt')
+    
+    # Save the extracted text to the text file
+    with open(text_file_path, 'w', encoding='utf-8') as text_file:
+        text_file.write(text)
+    
+    print(f"Text successfully extracted and saved to {text_file_path}")
+    return text_file_path
+
+def scrape_text_from_image(image_path, ingredients_only=OCR_INGREDIENTS_ONLY, use_cache=True):
+    """OCR a recipe image and save the text to the temp folder.
+
+    Args:
+        image_path (str): The image file.
+        ingredients_only (bool, optional): Only OCR the ingredient list, falling back to the whole page
+            if it cannot be located.
+        use_cache (bool, optional): Serve the text from the OCR cache if this image has been read before
+            with the same settings, and store newly read text in it.
+
+    Returns:
+        str: The text file path, or None on failure.
+    """
     try:
         # Verify the image path exists
         if not os.path.exists(image_path):
             print(f"Image file not found at path: {image_path}")
             return None
 
-        # Preprocess the image to improve OCR results
-        img = preprocess_image(image_path)
+        text = None
+        image_hash = hash_image_file(image_path)
+        if use_cache:
+            settings = ocr_settings(ingredients_only)
+            text = get_ocr_cache().lookup(image_hash, settings)
+            if text is not None:
+                print(f"OCR text for {os.path.basename(image_path)} served from cache.")
 
-        # Set Tesseract configuration for better accuracy
-        custom_config = r'--oem 3 --psm 3'
+        if text is None:
+            text = read_image_text(image_path, ingredients_only)
+            if use_cache:
+                get_ocr_cache().store(image_hash, settings, text, image_path)
 
-        # Extract text from the image using Tesseract with custom configuration
-        text = pytesseract.image_to_string(img, config=custom_config)
+        return save_image_text(image_path, text, image_hash)
 
-        # Get the root directory of the application (the directory where this script is located)
-        root_directory = os.path.dirname(os.path.abspath(__file__))
+    except Exception as e:
+        print(f"An error occurred while processing the image: {e}")
+        return None  # Return None in case of an error
 
-        # Define the path for the 'temp' folder
-        temp_folder_path = os.path.join(root_directory, 'temp')
+def _read_image_text_worker(image_path, ingredients_only):
+    """Read an image's text in a batch worker process. The text is returned to the parent, which saves and caches it."""
+    try:
+        return read_image_text(image_path, ingredients_only)
+    except Exception as e:
+        print(f"An error occurred while processing the image {image_path}: {e}")
+        return None
 
-        # Ensure the 'temp' folder exists
-        if not os.path.exists(temp_folder_path):
-            os.makedirs(temp_folder_path)
+def _init_ocr_worker():
+    """Set up a batch OCR worker process: one thread per library, and the OCR engine loaded up front."""
+    # Each process handles one image at a time, so stop OpenCV and Tesseract's OpenMP from
+    # spawning extra threads that would fight the other workers for the same cores
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    cv2.setNumThreads(1)
+    get_engine()
 
-        # Get the base name of the image file (without extension)
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-        
-        # Define the path for the text file in the 'temp' folder
-        text_file_path = os.path.join(temp_folder_path, base_name + '.txt')
-        
-        # Save the extracted text to the text file
-        with open(text_file_path, 'w', encoding='utf-8') as text_file:
-            text_file.write(text)
-        
-        print(f"Text successfully extracted and saved to {text_file_path}")
-        return text_file_path
+def list_images(images):
+    """Expand a folder, or a list of files and folders, into the image files to process."""
+    if isinstance(images, str):
+        images = [images]
 
-    except Exception as e:
-        print(f"An error occurred while processing the image: {e}")
-        return None  # Return None in case of an error
+    image_paths = []
+    for path in images:
+        if os.path.isdir(path):
+            image_paths.extend(sorted(
+                os.path.join(path, filename) for filename in os.listdir(path)
+                if filename.lower().endswith(IMAGE_EXTENSIONS)
+            ))
+        else:
+            image_paths.append(path)
+    return image_paths
+
+def scrape_text_from_images(images, max_workers=None, ingredients_only=OCR_INGREDIENTS_ONLY):
+    """OCR many images in parallel, yielding each result as soon as it is ready.
+
+    Preprocessing and OCR are CPU-bound, so the images are spread across a pool of worker
+    processes (one per core by default), each with its own OCR engine. Images already in the
+    OCR cache are returned straight away without starting any workers.
+
+    Args:
+        images (str or list): A folder of images, or a list of image files and/or folders.
+        max_workers (int, optional): The number of worker processes. Defaults to the number of cores.
+        ingredients_only (bool, optional): Only OCR each image's ingredient list (see scrape_text_from_image).
+
+    Yields:
+        tuple: (image path, text file path or None on failure), in the order the images finish.
+    """
+    image_paths = list_images(images)
+    if not image_paths:
+        print("No images found to process.")
+        return
+
+    # Images read before with the same settings are served from the OCR cache in this process. The workers
+    # skip the cache, as its index is kept in memory and must only be written from one process.
+    cache = get_ocr_cache()
+    settings = ocr_settings(ingredients_only)
+    pending = {}
+    for image_path in image_paths:
+        try:
+            image_hash = hash_image_file(image_path)
+        except OSError:
+            image_hash = None
+        text = cache.lookup(image_hash, settings) if image_hash else None
+        if text is not None:
+            print(f"OCR text for {os.path.basename(image_path)} served from cache.")
+            yield image_path, save_image_text(image_path, text, image_hash)
+        else:
+            pending[image_path] = image_hash
+
+    if pending:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        print(f"Extracting text from {len(pending)} images using {max_workers} worker processes.")
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_ocr_worker) as executor:
+            futures = {
+                executor.submit(_read_image_text_worker, image_path, ingredients_only): image_path
+                for image_path in pending
+            }
+            for future in as_completed(futures):
+                image_path = futures[future]
+                image_hash = pending[image_path]
+                text = future.result()
+                if text is None:
+                    yield image_path, None
+                    continue
+                if image_hash:
+                    cache.store(image_hash, settings, text, image_path)
+                yield image_path, save_image_text(image_path, text, image_hash)
+    cache.print_stats()
 
 # Example usage:
 # scrape_text_from_image('/path/to/your/image.jpg')
+# scrape_text_from_image('/path/to/your/image.jpg', ingredients_only=False)
+# for image_path, text_file_path in scrape_text_from_images('/path/to/your/images'):
+#     print(image_path, text_file_path)
@@ -1,66 +1,149 @@
 import os
+import threading
+import tracemalloc
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, unquote
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from page_cache import get_page_cache
+from section_extractor import extract_recipe_text
+from parse_html import make_soup
+from streaming_fetch import read_streamed_body, DEFAULT_MAX_BYTES
+
+# Headers to mimic a browser
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36'
+}
+
+# Number of pages process_recipes fetches at once, and the size of the connection pool kept per host
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Stream page bodies and stop downloading once the recipe sections have been received
+STREAM_PAGES = True
+
+# One long-lived session shared by every fetch so connections are kept alive and reused per host
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+def get_session(pool_size=DEFAULT_MAX_CONCURRENCY):
+    """Return the shared requests session, creating it on first use.
+
+    Args:
+        pool_size (int, optional): The number of keep-alive connections to hold open per host.
+
+    Returns:
+        requests.Session: The pooled session used for all page fetches.
+    """
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(BROWSER_HEADERS)
+
+        # (Re)mount the adapter if the pool needs to grow to serve more concurrent fetches
+        if pool_size > _session_pool_size:
+            # Set up the connection pool with retry strategy
+            retries = Retry(total=1, backoff_factor=1, status_forcelist=[502, 503, 504, 522, 524])
+            adapter = HTTPAdapter(max_retries=retries, pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session_pool_size = pool_size
+        return _session
+
+def url_to_filename(url):
+    """Extract the path from the URL and convert it to a valid .txt filename."""
+    parsed_url = urlparse(url)
+    path_parts = parsed_url.path.strip('/').split('/')
+    filename = (path_parts[-1] if path_parts[-1] else 'default') + '.txt'
+    return unquote(filename).replace('/', '_').replace('\\', '_')  # Sanitize the filename
+
+def fetch_page(url, use_cache=True, stream=STREAM_PAGES, max_bytes=DEFAULT_MAX_BYTES):
+    """Fetch the raw HTML of a page through the shared session and the on-disk page cache.
+
+    Pages still inside the cache's freshness window are returned without any network request.
+    Older cached pages are revalidated with a conditional GET and reused on a 304 response.
+
+    Args:
+        url (str): The page to download.
+        use_cache (bool, optional): If False, always download the page and leave the cache untouched.
+        stream (bool, optional): If True, read the body incrementally and stop once the ingredients and
+            method sections have closed, skipping the comments and ads that usually follow them.
+        max_bytes (int, optional): The most bytes to download when streaming.
+
+    A body whose download was stopped early is cached as partial, and is only reused by other streamed fetches.
+
+    Returns:
+        bytes: The response body.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails or returns an error status.
+    """
+    cache = get_page_cache() if use_cache else None
+    cached_body, conditional_headers = None, {}
+    partial = False
+    if cache:
+        cached_body, conditional_headers, is_fresh = cache.lookup(url, allow_partial=stream)
+        if cached_body is not None and is_fresh:
+            cache.record_hit()
+            print(f"Using cached copy of {url}")
+            return cached_body
+
+    # Send a GET request to the URL with a timeout
+    response = get_session().get(url, headers=conditional_headers, timeout=10, stream=stream)
+
+    if cache and cached_body is not None and response.status_code == 304:
+        response.close()
+        cache.record_revalidated(url, response)
+        print(f"Cached copy of {url} is still current (304 Not Modified)")
+        return cached_body
+
+    if stream:
+        if not response.ok:
+            response.close()
+        response.raise_for_status()  # Check if the request was successful
+        body, stats = read_streamed_body(response, max_bytes=max_bytes)
+        saved = f", {stats['bytes_saved'] / 1024:.0f} KB not downloaded" if stats['bytes_saved'] else ''
+        partial = stats['stopped_early']
+        stopped = "stopped early" if partial else "read in full"
+        print(f"Streamed {stats['bytes_read'] / 1024:.0f} KB of {url} ({stopped}{saved})")
+    else:
+        response.raise_for_status()  # Check if the request was successful
+        body = response.content
+
+    if cache:
+        cache.store(url, body, response, partial=partial)
+    return body
 
-def scrape_with_beautifulsoup(url, return_filepath=False):
+def scrape_with_beautifulsoup(url, return_filepath=False, measure_memory=False):
     print(f"Attempting to scrape {url} for ingredients using BeautifulSoup.")
     save_path = None
+
+    # Optionally track the peak memory used to fetch, parse and save this page
+    if measure_memory:
+        tracemalloc.start()
+
     try:
-        # Add headers to mimic a browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36'
-        }
-
-        # Set up a session with retry strategy
-        session = requests.Session()
-        retries = Retry(total=1, backoff_factor=1, status_forcelist=[502, 503, 504, 522, 524])
-        session.mount('http://', HTTPAdapter(max_retries=retries))
-        session.mount('https://', HTTPAdapter(max_retries=retries))
-
-        # Send a GET request to the URL with headers and a timeout
-        response = session.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Check if the request was successful
+        html = fetch_page(url)
 
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Parse only the headers and sections of the page using the fastest available backend
+        soup = make_soup(html, targeted=True)
 
-        # Extract the path from the URL and convert it to a valid filename
-        parsed_url = urlparse(url)
-        path_parts = parsed_url.path.strip('/').split('/')
-        filename = (path_parts[-1] if path_parts[-1] else 'default') + '.txt'
-        filename = unquote(filename).replace('/', '_').replace('\\', '_')  # Sanitize the filename
+        filename = url_to_filename(url)
 
         # Define keywords to search for in headers
         ingredient_keywords = ["ingredients"]
         instruction_keywords = ["method", "instructions", "directions", "steps", "preparation"]
 
-        # Find all headers (h1, h2, h3, etc.)
-        headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-
-        text_content = ""
-
-        def is_content_sufficient(section):
+        def is_content_sufficient(stats):
             """Check if the content of the section has more than 10 words."""
-            text = section.get_text(separator='\n').strip()
-            word_count = len(text.split())
-            return word_count > 10
+            return stats.words > 10
 
-        for header in headers:
-            header_text = header.get_text().strip().lower()
-
-            # Check for ingredients or instructions sections
-            if any(keyword in header_text for keyword in ingredient_keywords + instruction_keywords):
-                parent_section = header.find_parent(['section', 'div', 'span'], class_=True)
-                while parent_section and not is_content_sufficient(parent_section):
-                    parent_section = parent_section.find_parent(['section', 'div', 'span'], class_=True)
-
-                if parent_section and is_content_sufficient(parent_section):
-                    # Append only the text content of the section
-                    text_content += parent_section.get_text(separator='\n').strip() + "\n\n"
-                    print(f"Section found and added to text: {parent_section.name}")  # Debug print
+        # Find the sections under ingredient or instruction headers in one pass over the page
+        text_content = ""
+        for section_text in extract_recipe_text(soup, ingredient_keywords + instruction_keywords, is_content_sufficient):
+            # Append only the text content of the section
+            text_content += section_text + "\n\n"
 
         # Check if text_content is empty or only contains insufficient content
         if not text_content.strip():
@@ -88,20 +171,6 @@ def scrape_with_beautifulsoup(url, return_filepath=False):
 
         print(f"Recipe sections successfully saved to {save_path}")
 
-        # Save the full text content of the webpage in a new file with "_fullextract" appended
-        full_extract_filename = os.path.splitext(filename)[0] + '_fullextract.txt'
-        full_extract_path = os.path.join(temp_folder_path, full_extract_filename)
-
-        # Get the full text of the webpage and clean it up
-        full_text_content = soup.get_text(separator='\n').strip()
-        full_text_content = '\n'.join([line for line in full_text_content.splitlines() if line.strip()])
-
-        # Save the cleaned full text content to the new file
-        with open(full_extract_path, 'w', encoding='utf-8') as full_file:
-            full_file.write(full_text_content)
-
-        print(f"Full webpage content successfully saved to {full_extract_path}")
-
     except requests.exceptions.RequestException as e:
         print(f"Error occurred during the request: {e}")
         # Save "NO TEXT FOUND" in case of a request error
@@ -114,6 +183,10 @@ def scrape_with_beautifulsoup(url, return_filepath=False):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         save_path = handle_no_text_found(url)
+
+    if measure_memory:
+        print(f"Peak memory while scraping {url}: {tracemalloc.get_traced_memory()[1] / (1024 * 1024):.1f} MB")
+        tracemalloc.stop()
     
     if return_filepath:
         return save_path
@@ -130,11 +203,7 @@ def handle_no_text_found(url):
     if not os.path.exists(temp_folder_path):
         os.makedirs(temp_folder_path)
 
-    # Extract the path from the URL and convert it to a valid filename
-    parsed_url = urlparse(url)
-    path_parts = parsed_url.path.strip('/').split('/')
-    filename = (path_parts[-1] if path_parts[-1] else 'default') + '.txt'
-    filename = unquote(filename).replace('/', '_').replace('\\', '_')  # Sanitize the filename
+    filename = url_to_filename(url)
 
     # Define the full path where the file will be saved in the 'temp' folder
     save_path = os.path.join(temp_folder_path, filename)
@@ -1,95 +1,109 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 import time
 import os
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
+from section_extractor import extract_recipe_text
+from parse_html import make_soup
+from browser_pool import get_browser_pool
 
-def is_content_sufficient(section):
+# The longest we wait for the recipe to appear before scraping whatever has rendered
+READY_TIMEOUT = 10
+
+# True once an ingredients header or an ingredient list is in the DOM
+READY_SCRIPT = """
+return Array.from(document.querySelectorAll('h1, h2, h3, h4, h5, h6')).some(h => /ingredients/i.test(h.textContent))
+    || document.querySelectorAll('[class*="ingredient"] li, [id*="ingredient"] li').length > 0;
+"""
+
+def wait_until_ready(driver, timeout=READY_TIMEOUT):
+    """Wait until the recipe's ingredients are in the DOM, for at most timeout seconds.
+
+    Returns:
+        bool: True if the page became ready, False if the wait timed out.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(lambda d: d.execute_script(READY_SCRIPT))
+        return True
+    except TimeoutException:
+        return False
+
+def is_content_sufficient(stats):
     """Check if the content of the section is more than two lines or two list items."""
-    text_lines = section.get_text(separator='\n').strip().splitlines()
-    list_items = section.find_all('li')
-    return len(text_lines) > 2 or len(list_items) > 2
+    return stats.lines > 2 or stats.list_items > 2
 
 def scrape_with_selenium(url):
     print(f"Attempting to scrape {url} for ingredients using Selenium.")
-    
-    # Set up the Selenium WebDriver (e.g., Chrome)
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # Run in headless mode (no browser UI)
-    driver = webdriver.Chrome(options=options)
-    
-    try:
-        # Open the webpage
-        driver.get(url)
-        time.sleep(3)  # Wait for the page to fully load (adjust as necessary)
-        
-        # Parse the page source with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        # Extract the filename from the URL
-        parsed_url = urlparse(url)
-        path_parts = parsed_url.path.strip('/').split('/')
-        filename = (path_parts[-1] if path_parts[-1] else 'default') + '.txt'  # Handle empty filename
-        filename = filename.replace('/', '_').replace('\\', '_')  # Sanitize the filename
-        
-        # Initialize a list to store the text sections
-        text_sections = []
-
-        # Define keywords to search for in headers
-        ingredient_keywords = ["ingredients"]
-        instruction_keywords = ["method", "instructions", "directions", "steps"]
-
-        # Find all headers (h1, h2, h3, etc.)
-        headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-
-        for header in headers:
-            header_text = header.get_text().strip().lower()
-
-            # Check for ingredients or instructions sections
-            if any(keyword in header_text for keyword in ingredient_keywords + instruction_keywords):
-                parent_section = header.find_parent(['section', 'div', 'span'], class_=True)
-                while parent_section and not is_content_sufficient(parent_section):
-                    parent_section = parent_section.find_parent(['section', 'div', 'span'], class_=True)
-
-                if parent_section and is_content_sufficient(parent_section):
-                    # Extract text from the section and add it to the list
-                    text_sections.append(parent_section.get_text(separator='\n').strip())
-                    print(f"Section found and added to text file: {parent_section.name}")  # Debug print
-
-        # Join the text sections into a single string with two newlines separating them
-        full_text = "\n\n".join(text_sections)
-
-        # Check if text_content is empty or only contains insufficient content
-        if not full_text.strip():
-            full_text = "NO TEXT FOUND"
-
-        # Get the root directory of the application (the directory where this script is located)
-        root_directory = os.path.dirname(os.path.abspath(__file__))
-
-        # Define the path for the 'temp' folder
-        temp_folder_path = os.path.join(root_directory, 'temp')
-
-        # Ensure the 'temp' folder exists
-        if not os.path.exists(temp_folder_path):
-            os.makedirs(temp_folder_path)
-
-        # Define the full path where the file will be saved in the 'temp' folder
-        save_path = os.path.join(temp_folder_path, filename)
-
-        # Save the text content to the file
-        with open(save_path, 'w', encoding='utf-8') as file:
-            file.write(full_text)
-
-        print(f"Recipe sections successfully saved to {save_path}")
-        return save_path
 
+    try:
+        # Check a warm headless browser out of the shared pool instead of launching a new one. A browser
+        # error propagates out of the pool's context, so the pool replaces that browser.
+        with get_browser_pool().driver() as driver:
+            page_source = _render_page(driver, url)
+        # The browser is back in the pool before the page is parsed
+        return _save_sections(page_source, url)
     except Exception as e:
         print(f"An error occurred: {e}")
         return None  # Return None in case of an error
 
-    finally:
-        driver.quit()
+def _render_page(driver, url):
+    """Render a page in the given browser and return its source. Browser errors are left to the caller."""
+    # Open the webpage and wait for the ingredients to render instead of sleeping a fixed time
+    start = time.perf_counter()
+    driver.get(url)
+    ready = wait_until_ready(driver)
+    render_time = time.perf_counter() - start
+    if ready:
+        print(f"Rendered {url} in {render_time:.2f}s")
+    else:
+        print(f"Ingredients did not appear within {READY_TIMEOUT}s on {url}, scraping what has rendered ({render_time:.2f}s)")
+    return driver.page_source
+
+def _save_sections(page_source, url):
+    """Save the recipe sections of a rendered page, returning the file path."""
+    # Parse only the headers and sections of the page source using the fastest available backend
+    soup = make_soup(page_source, targeted=True)
+    
+    # Extract the filename from the URL
+    parsed_url = urlparse(url)
+    path_parts = parsed_url.path.strip('/').split('/')
+    filename = (path_parts[-1] if path_parts[-1] else 'default') + '.txt'  # Handle empty filename
+    filename = filename.replace('/', '_').replace('\\', '_')  # Sanitize the filename
+    
+    # Define keywords to search for in headers
+    ingredient_keywords = ["ingredients"]
+    instruction_keywords = ["method", "instructions", "directions", "steps"]
+
+    # Find the sections under ingredient or instruction headers in one pass over the page
+    text_sections = extract_recipe_text(soup, ingredient_keywords + instruction_keywords, is_content_sufficient)
+
+    # Join the text sections into a single string with two newlines separating them
+    full_text = "\n\n".join(text_sections)
+
+    # Check if text_content is empty or only contains insufficient content
+    if not full_text.strip():
+        full_text = "NO TEXT FOUND"
+
+    # Get the root directory of the application (the directory where this script is located)
+    root_directory = os.path.dirname(os.path.abspath(__file__))
+
+    # Define the path for the 'temp' folder
+    temp_folder_path = os.path.join(root_directory, 'temp')
+
+    # Ensure the 'temp' folder exists
+    if not os.path.exists(temp_folder_path):
+        os.makedirs(temp_folder_path)
+
+    # Define the full path where the file will be saved in the 'temp' folder
+    save_path = os.path.join(temp_folder_path, filename)
+
+    # Save the text content to the file
+    with open(save_path, 'w', encoding='utf-8') as file:
+        file.write(full_text)
+
+    print(f"Recipe sections successfully saved to {save_path}")
+    return save_path
 
 # Example usage:
 # scrape_with_selenium('https://www.madewithlau.com/recipes/vegetable-lo-mein')
@@ -0,0 +1,138 @@
+from collections import namedtuple
+from bs4 import NavigableString, CData, Tag
+
+# Word, line and <li> counts for everything inside a tag. lines is the number of lines in
+# tag.get_text(separator='\n').strip(), blank lines between the first and last text included.
+SectionStats = namedtuple('SectionStats', ['words', 'lines', 'list_items'])
+
+HEADER_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+# Elements that can hold a recipe section (they must also carry a class attribute)
+CONTAINER_TAGS = ('section', 'div', 'span')
+
+# The string types get_text() returns by default, so comments, scripts and styles are not counted
+TEXT_TYPES = (NavigableString, CData)
+
+# Line breaks in a run of text: (text strings, line breaks, line breaks before the first non-blank
+# character, line breaks after the last one, whether the text is all whitespace)
+_NO_TEXT = (0, 0, 0, 0, True)
+
+def _count_breaks(text):
+    """Count the line breaks in text, as str.splitlines() sees them."""
+    return len((text + 'x').splitlines()) - 1
+
+def _text_breaks(text):
+    """Summarise the line breaks of one string."""
+    breaks = _count_breaks(text)
+    stripped = text.lstrip()
+    if not stripped:
+        return (1, breaks, breaks, breaks, True)
+    leading = _count_breaks(text[:len(text) - len(stripped)])
+    trailing = _count_breaks(text[len(text.rstrip()):])
+    return (1, breaks, leading, trailing, False)
+
+def _join_breaks(first, second):
+    """Summarise two runs of text joined with the '\n' separator get_text() puts between strings."""
+    if not first[0]:
+        return second
+    if not second[0]:
+        return first
+    count = first[0] + second[0]
+    breaks = first[1] + 1 + second[1]
+    if first[4] and second[4]:
+        return (count, breaks, breaks, breaks, True)
+    leading = first[1] + 1 + second[2] if first[4] else first[2]
+    trailing = first[3] + 1 + second[1] if second[4] else second[3]
+    return (count, breaks, leading, trailing, False)
+
+def _line_count(text_breaks):
+    """Number of lines in the joined text once its leading and trailing whitespace is stripped."""
+    _, breaks, leading, trailing, blank = text_breaks
+    return 0 if blank else breaks - leading - trailing + 1
+
+def compute_section_stats(root):
+    """Compute word, line and list item counts for every tag under root in a single bottom-up pass.
+
+    Walking the descendants in reverse document order visits every child before its parent, so each
+    tag's totals are complete by the time it is reached and can simply be added to its parent's.
+    Children arrive last first, so each one's text goes in front of what its parent has gathered so far.
+
+    Args:
+        root (Tag): The soup (or any tag) to analyse.
+
+    Returns:
+        dict: Maps id(tag) to the SectionStats of that tag.
+    """
+    totals = {}
+
+    def add_to_parent(element, words, text_breaks, list_items):
+        parent = element.parent
+        if parent is None:
+            return
+        parent_totals = totals.setdefault(id(parent), [0, _NO_TEXT, 0])
+        parent_totals[0] += words
+        parent_totals[1] = _join_breaks(text_breaks, parent_totals[1])
+        parent_totals[2] += list_items
+
+    for element in reversed(list(root.descendants)):
+        if isinstance(element, Tag):
+            words, text_breaks, list_items = totals.setdefault(id(element), [0, _NO_TEXT, 0])
+            if element.name == 'li':
+                list_items += 1
+            totals[id(element)] = SectionStats(words, _line_count(text_breaks), list_items)
+            add_to_parent(element, words, text_breaks, list_items)
+        elif type(element) in TEXT_TYPES:
+            add_to_parent(element, len(element.split()), _text_breaks(element), 0)
+
+    words, text_breaks, list_items = totals.get(id(root), [0, _NO_TEXT, 0])
+    totals[id(root)] = SectionStats(words, _line_count(text_breaks), list_items)
+    return totals
+
+def find_recipe_sections(soup, keywords, is_sufficient):
+    """Find the sections holding headers that mention any of the keywords.
+
+    For every matching header the nearest classed section/div/span ancestor whose stats satisfy
+    is_sufficient is selected, as the scrapers' parent walk always did. Sections selected by more than
+    one header, and sections nested inside another selected section, are only returned once.
+
+    Args:
+        soup (BeautifulSoup): The parsed page.
+        keywords (list): Lower-case words to look for in header text.
+        is_sufficient (callable): Takes a SectionStats and returns True if the section has enough content.
+
+    Returns:
+        list: The selected section tags, in the order their headers appear in the page.
+    """
+    stats = compute_section_stats(soup)
+
+    sections = []
+    selected_ids = set()
+    for header in soup.find_all(HEADER_TAGS):
+        header_text = header.get_text().strip().lower()
+        if not any(keyword in header_text for keyword in keywords):
+            continue
+
+        for parent in header.parents:
+            if parent.name in CONTAINER_TAGS and parent.has_attr('class') and is_sufficient(stats[id(parent)]):
+                if id(parent) not in selected_ids:
+                    selected_ids.add(id(parent))
+                    sections.append(parent)
+                break
+
+    # Drop sections that sit inside another selected section, their text is already included
+    return [section for section in sections if not any(id(parent) in selected_ids for parent in section.parents)]
+
+def extract_recipe_text(soup, keywords, is_sufficient):
+    """Return the text of each recipe section found by find_recipe_sections.
+
+    Returns:
+        list: One stripped text block per section.
+    """
+    text_sections = []
+    for section in find_recipe_sections(soup, keywords, is_sufficient):
+        text_sections.append(section.get_text(separator='\n').strip())
+        print(f"Section found and added to text: {section.name}")  # Debug print
+    return text_sections
+
+# Example usage:
+# extract_recipe_text(soup, ['ingredients', 'method'], lambda stats: stats.words > 10)
@@ -1,8 +1,8 @@
 import os
 import json
-import re
 import anthropic
 from dotenv import load_dotenv
+from stream_json import stream_json_with_retries, MalformedResponseError
 
 ###NOT YET USING THIS GUY BUT IT'S HERE IF NEEDED
 
@@ -43,43 +43,27 @@ def send_ingredients_list_to_anthropic(input_file_path):
     ingredient_list = json.dumps(input_data, indent=4)
     final_prompt = base_prompt + ingredient_list
 
-    # Call Anthropic's API with streaming enabled
-    with client.completions.create(
-        model="claude-3-5-sonnet-20240620",
-        max_tokens_to_sample=2000,
-        prompt=final_prompt,
-        stream=True
-    ) as stream:
-        full_response = ""
-        print("\nStreaming Response:")
-        for completion in stream:
-            chunk_text = completion.completion
-            print(chunk_text, end='')  # Print each chunk of text as it arrives
-            full_response += chunk_text
+    def open_stream():
+        # Call Anthropic's API with streaming enabled
+        return client.completions.create(
+            model="claude-3-5-sonnet-20240620",
+            max_tokens_to_sample=2000,
+            prompt=final_prompt,
+            stream=True
+        )
 
-    print("\n\nFull response received.")
-
-    # Try to extract JSON content between [JSON_START] and [JSON_END]
-    json_match = re.search(r'\[JSON_START\](.*?)\[JSON_END\]', full_response, re.DOTALL)
-
-    if not json_match:
-        print("Failed to locate JSON delimiters in the response.")
-        # Try to extract JSON-like content from the raw response
-        json_start = full_response.find("{")
-        json_end = full_response.rfind("}")
-        if json_start != -1 and json_end != -1:
-            json_content = full_response[json_start:json_end+1].strip()
-            print("Extracted JSON-like content:\n", json_content)
-        else:
-            print("Failed to extract JSON-like content.")
-            return
-    else:
-        json_content = json_match.group(1).strip()
+    # Stream the response as it is being generated. The JSON is checked as it arrives, and a response
+    # without the [JSON_START] marker is still accepted from its first '{'.
+    print("\nStreaming Response:")
+    parser = stream_json_with_retries(open_stream, lambda completion: completion.completion, allow_bare_json=True)
+    if parser is None:
+        print("Failed to get a valid JSON shopping list.")
+        return
 
     # Parse the JSON output
     try:
-        shopping_list = json.loads(json_content)
-    except json.JSONDecodeError as e:
+        shopping_list = parser.result()
+    except MalformedResponseError as e:
         print(f"Failed to decode JSON. Error: {e}")
         return
 
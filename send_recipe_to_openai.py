@@ -1,130 +1,191 @@
 import os
 import json
+import threading
 import re
-from openai import OpenAI
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache, template_version
+from text_reduction import reduce_for_prompt
+from stream_json import stream_json_with_retries
+from model_cascade import get_model_cascade, validate_recipe_json
+from aisle_classifier import get_aisle_classifier
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+_client = None
+_client_lock = threading.Lock()
 
-def send_recipe_to_openai(file_path, disable_streaming=None, return_json_filepath=False):
-    """
-    Sends recipe content to OpenAI API, processes the response, and optionally returns the JSON file path.
-    
-    Args:
-        file_path (str): The path to the input file (.html or .txt) containing the recipe.
-        disable_streaming (bool, optional): If set, disables streaming response from OpenAI.
-        return_json_filepath (bool, optional): If True, the function returns the JSON file path.
-        
-    Returns:
-        str or None: Returns the JSON file path if return_json_filepath is True; otherwise, returns None.
-    """
+def get_client():
+    """Create the OpenAI client on first use, once main() has loaded the API key from the .env file."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
 
+            _client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return _client
+
+MODEL = "gpt-4"
+SYSTEM_PROMPT = "You are a chef's bot assistant looking to extract ingredients from a recipe to create shopping list."
+
+def read_recipe_file(file_path):
+    """Read the scraped or OCR'd recipe text from a .html or .txt file."""
     # Determine file type and read content
     if file_path.endswith('.html') or file_path.endswith('.txt'):
         with open(file_path, 'r', encoding='utf-8') as file:
-            dynamic_content = file.read()
+            return file.read()
     else:
         raise ValueError("Unsupported file type. Please use a .html or .txt file.")
 
-    # Extract recipe name from filename as a fallback
+# OCR text files carry the start of their image's hash after a double underscore (see save_image_text)
+_IMAGE_HASH_SUFFIX_RE = re.compile(r'__[0-9a-f]{8}$')
+
+def recipe_name_from_filename(file_path):
+    """Turn a recipe file name into a recipe name, used when the content does not give one."""
     filename = os.path.basename(file_path)
-    recipe_name_from_filename = os.path.splitext(filename)[0].replace('-', ' ').title()
-
-    # The base prompt with clear JSON delimiters and instructions
-    base_prompt = (
-        f"Below is a text extraction from the contents of a website or image. Please extract information from this file following these steps in order:\n"
-        f"1. Identify the recipe name. If the recipe name is not found in the content, use '{recipe_name_from_filename}' as the recipe name.\n"
-        f"2. Identify each individual ingredient required for the recipe.\n"
-        f"3. For each ingredient, only extract the name of the ingredient and remove any preparation instructions associated with them, such as details on how it should be prepared (e.g., chopped, diced) or its purpose (e.g., to make a soup).\n"
-        f"4. For each ingredient, standardize the unit type into one of the following standardized units:\n"
-        f"   - Volume: teaspoon (tsp), tablespoon (tbsp), cup, fluid ounce (fl oz), milliliter (ml), liter (l), pint (pt), quart (qt), gallon (gal).\n"
-        f"   - Weight: gram (g), kilogram (kg), ounce (oz), pound (lb).\n"
-        f"   - Count: piece, clove, slice, whole, bunch, head, stalk, stick, can, jar.\n"
-        f"   - Miscellaneous measurable units: dash, pinch, drop, splash.\n"
-        f"5. For immeasurable or qualitative units such as 'to taste', 'as needed', 'a handful', place these in the 'unittype' field, and set the 'quantity' field to null or leave it empty. If a standard measurable unit is used with a fraction or decimal value, ensure the quantity is converted to a decimal format (e.g., 1.5 instead of fractions like ½).\n"
-        f"6. Handle singular and plural forms consistently (e.g., 'clove' and 'cloves' should be standardized as 'clove').\n"
-        f"7. Categorize each ingredient into one of the following shopping aisles and label it accordingly:\n"
-        f"---list starts here---\n"
-        f"Produce\n"
-        f"Fresh meats\n"
-        f"Cooked Meats\n"
-        f"Milk/Butter/Cream/Cheese/Yoghurts\n"
-        f"Eggs/Sugar/Bread/Baking goods\n"
-        f"Oil/Jam/Tinned fruit/Honey/Spices/Stock\n"
-        f"Sauces/Mayonnaise/Pickles/Rice/Pulses\n"
-        f"Tinned Foods/Pasta/Soups\n"
-        f"Dried fruits, seeds & nuts\n"
-        f"Coffee/Cereal\n"
-        f"Biscuits/Chocolate/Sweets/Tea\n"
-        f"Fizzy drinks/Crackers/Nuts/Crisps\n"
-        f"Cordials/Bottled water\n"
-        f"Wine/Beer/Cider\n"
-        f"Other\n"
-        f"---list ends here---\n"
-        f"Return the information enclosed between [JSON_START] and [JSON_END] in the following JSON format:\n"
-        f"[JSON_START]\n"
-        f"{{\n"
-        f"  \"recipeName\": \"Example Recipe Name\",\n"
-        f"  \"ingredients\": [\n"
-        f"    {{ \"quantity\": \"X\", \"unittype\": \"unit(s)\", \"ingredient\": \"Ingredient 1\", \"aisle\": \"Aisle Name\" }},\n"
-        f"    {{ \"quantity\": \"null\", \"unittype\": \"to taste\", \"ingredient\": \"Ingredient 2\", \"aisle\": \"Aisle Name\" }},\n"
-        f"    {{ \"quantity\": \"X\", \"unittype\": \"unit(s)\", \"ingredient\": \"Ingredient 3\", \"aisle\": \"Aisle Name\" }}\n"
-        f"  ]\n"
-        f"}}\n"
-        f"[JSON_END]\n\n"
+    name = _IMAGE_HASH_SUFFIX_RE.sub('', os.path.splitext(filename)[0])
+    return name.replace('-', ' ').title()
+
+# Steps 2-6 of the extraction instructions, shared by the single and batch prompts
+RECIPE_EXTRACTION_STEPS = (
+    "2. Identify each individual ingredient required for the recipe.\n"
+    "3. For each ingredient, only extract the name of the ingredient and remove any preparation instructions associated with them, such as details on how it should be prepared (e.g., chopped, diced) or its purpose (e.g., to make a soup).\n"
+    "4. For each ingredient, standardize the unit type into one of the following standardized units:\n"
+    "   - Volume: teaspoon (tsp), tablespoon (tbsp), cup, fluid ounce (fl oz), milliliter (ml), liter (l), pint (pt), quart (qt), gallon (gal).\n"
+    "   - Weight: gram (g), kilogram (kg), ounce (oz), pound (lb).\n"
+    "   - Count: piece, clove, slice, whole, bunch, head, stalk, stick, can, jar.\n"
+    "   - Miscellaneous measurable units: dash, pinch, drop, splash.\n"
+    "5. For immeasurable or qualitative units such as 'to taste', 'as needed', 'a handful', place these in the 'unittype' field, and set the 'quantity' field to null or leave it empty. If a standard measurable unit is used with a fraction or decimal value, ensure the quantity is converted to a decimal format (e.g., 1.5 instead of fractions like ½).\n"
+    "6. Handle singular and plural forms consistently (e.g., 'clove' and 'cloves' should be standardized as 'clove').\n"
+)
+
+# The instructions, unit list and output format. They are the same for every recipe and come
+# first in the prompt, byte for byte, so OpenAI and Anthropic can reuse their cached copy of this prefix
+# instead of processing it again. Anything that varies per recipe goes after it.
+RECIPE_PROMPT_PREFIX = (
+    "Below is a text extraction from the contents of a website or image. Please extract information from this file following these steps in order:\n"
+    "1. Identify the recipe name. If the recipe name is not found in the content, use the fallback recipe name given below these instructions.\n"
+    + RECIPE_EXTRACTION_STEPS +
+    "Return the information enclosed between [JSON_START] and [JSON_END] in the following JSON format:\n"
+    "[JSON_START]\n"
+    "{\n"
+    "  \"recipeName\": \"Example Recipe Name\",\n"
+    "  \"ingredients\": [\n"
+    "    { \"quantity\": \"X\", \"unittype\": \"unit(s)\", \"ingredient\": \"Ingredient 1\" },\n"
+    "    { \"quantity\": \"null\", \"unittype\": \"to taste\", \"ingredient\": \"Ingredient 2\" },\n"
+    "    { \"quantity\": \"X\", \"unittype\": \"unit(s)\", \"ingredient\": \"Ingredient 3\" }\n"
+    "  ]\n"
+    "}\n"
+    "[JSON_END]\n\n"
+)
+
+# The same for several recipes in one request
+BATCH_PROMPT_PREFIX = (
+    "Below are text extractions from the contents of websites or images, each between "
+    "[RECIPE n START] and [RECIPE n END] markers. Please extract information from each recipe separately following these steps in order:\n"
+    "1. Identify the recipe name. If the recipe name is not found in the content, use the fallback name given after its start marker.\n"
+    + RECIPE_EXTRACTION_STEPS +
+    "Return the information for every recipe, in the same order, enclosed between [JSON_START] and [JSON_END] in the following JSON format:\n"
+    "[JSON_START]\n"
+    "{\n"
+    "  \"recipes\": [\n"
+    "    {\n"
+    "      \"recipeNumber\": 1,\n"
+    "      \"recipeName\": \"Example Recipe Name\",\n"
+    "      \"ingredients\": [\n"
+    "        { \"quantity\": \"X\", \"unittype\": \"unit(s)\", \"ingredient\": \"Ingredient 1\" },\n"
+    "        { \"quantity\": \"null\", \"unittype\": \"to taste\", \"ingredient\": \"Ingredient 2\" }\n"
+    "      ]\n"
+    "    }\n"
+    "  ]\n"
+    "}\n"
+    "[JSON_END]\n\n"
+)
+
+def build_recipe_prompt_parts(dynamic_content, recipe_name_from_filename):
+    """Build the extraction prompt for a recipe's text as its static prefix and its per-recipe part.
+
+    Args:
+        dynamic_content (str): The recipe text.
+        recipe_name_from_filename (str): The recipe name to use if the content does not give one.
+
+    Returns:
+        tuple: (RECIPE_PROMPT_PREFIX, the fallback name and recipe text).
+    """
+    return RECIPE_PROMPT_PREFIX, (
+        f"Fallback recipe name: {recipe_name_from_filename}\n\n"
         f"Below is the content to be processed:\n\n"
+        f"{dynamic_content}"
     )
 
-    # Combine base prompt with dynamic content
-    final_prompt = base_prompt + dynamic_content
-
-    if disable_streaming:
-        # If disable_streaming is set, generate response without streaming
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a chef's bot assistant looking to extract ingredients from a recipe to create shopping list."},
-                {"role": "user", "content": final_prompt}
-            ],
-            stream=False  # Disable streaming
-        )
+def build_recipe_prompt(dynamic_content, recipe_name_from_filename):
+    """Build the extraction prompt for a recipe's text.
 
-        # Collect the full response
-        full_response = response.choices[0].message.content
+    Returns:
+        str: The user prompt.
+    """
+    return ''.join(build_recipe_prompt_parts(dynamic_content, recipe_name_from_filename))
 
-    else:
-        # Stream the response as it is being generated
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a chef's bot assistant looking to extract ingredients from a recipe to create shopping list."},
-                {"role": "user", "content": final_prompt}
-            ],
-            stream=True  # Enable streaming
-        )
+# Changes whenever the prompt template is edited, which invalidates cached responses
+RECIPE_TEMPLATE_VERSION = template_version(build_recipe_prompt('', '{recipe_name_from_filename}'))
 
-        # Stream the response as it is being generated
-        full_response = ""
-        for chunk in response:
-            try:
-                # Ensure we are accessing a dictionary or object with 'content' attribute
-                chunk_delta = chunk.choices[0].delta
-                chunk_text = chunk_delta.content if hasattr(chunk_delta, 'content') else ''
-            except (KeyError, AttributeError) as e:
-                # Print the error to help diagnose any issues
-                print(f"Error accessing content in chunk: {e}")
-                chunk_text = ''
-
-            print(chunk_text, end='')  # Print each chunk of text as it arrives
-            full_response += chunk_text if chunk_text is not None else ''
-
-        print("\n\nFull response received.")
+def build_batch_prompt_parts(recipes):
+    """Build one extraction prompt for several recipes as its static prefix and its per-batch part.
+
+    Args:
+        recipes (list): (recipe text, recipe name to use if the content does not give one) for each recipe.
+
+    Returns:
+        tuple: (BATCH_PROMPT_PREFIX, the numbered recipes). The model is asked for one entry per recipe,
+               numbered from 1 in the same order.
+    """
+    sections = [
+        f"[RECIPE {number} START] Fallback name: {fallback_name}\n{dynamic_content}\n[RECIPE {number} END]"
+        for number, (dynamic_content, fallback_name) in enumerate(recipes, start=1)
+    ]
+    return BATCH_PROMPT_PREFIX, f"Below are the {len(recipes)} recipes to be processed:\n\n" + '\n\n'.join(sections)
+
+def build_batch_prompt(recipes):
+    """Build one extraction prompt for several recipes, so the instructions are only sent once."""
+    return ''.join(build_batch_prompt_parts(recipes))
+
+def cached_recipe_json(dynamic_content, recipe_name_from_filename, model=MODEL):
+    """Return the recipe JSON from an earlier identical request, or None."""
+    return get_llm_cache().lookup(model, SYSTEM_PROMPT, RECIPE_TEMPLATE_VERSION, recipe_name_from_filename + '\n' + dynamic_content)
+
+def cache_recipe_json(dynamic_content, recipe_name_from_filename, result_json, model=MODEL):
+    """Remember the recipe JSON for this request."""
+    get_llm_cache().store(model, SYSTEM_PROMPT, RECIPE_TEMPLATE_VERSION, recipe_name_from_filename + '\n' + dynamic_content, result_json)
+
+def build_messages(final_prompt):
+    """Wrap a prompt in the chat messages sent to the model."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": final_prompt}
+    ]
 
+def assign_aisles(result_json):
+    """Put every ingredient of a recipe in a shopping aisle with the local aisle classifier.
+
+    The model is not asked for aisles, so this runs on every parsed recipe before it is checked, cached or saved.
+    """
+    ingredients = result_json.get('ingredients') if isinstance(result_json, dict) else None
+    if not isinstance(ingredients, list):
+        return
+    ingredients = [ingredient for ingredient in ingredients if isinstance(ingredient, dict)]
+    # An aisle the model added anyway is replaced, so every recipe is classified the same way
+    for ingredient in ingredients:
+        ingredient.pop('aisle', None)
+    get_aisle_classifier().fill_aisles(ingredients)
+
+def parse_recipe_response(full_response, recipe_name_from_filename):
+    """Pull the recipe JSON out of the model's response.
+
+    Returns:
+        dict or None: The recipe with sequential ingredient IDs, or None if the response holds no valid JSON.
+    """
     # Extract JSON content between [JSON_START] and [JSON_END]
     json_match = re.search(r'\[JSON_START\](.*?)\[JSON_END\]', full_response, re.DOTALL)
     if not json_match:
         print("Failed to locate JSON delimiters in the response.")
-        return None if return_json_filepath else None
+        return None
 
     json_content = json_match.group(1).strip()
 
@@ -133,7 +194,7 @@ def send_recipe_to_openai(file_path, disable_streaming=None, return_json_filepat
         result_json = json.loads(json_content)
     except json.JSONDecodeError as e:
         print(f"Failed to decode JSON. Error: {e}")
-        return None if return_json_filepath else None
+        return None
 
     # If recipeName is empty, use the name from the filename
     if not result_json.get('recipeName') or result_json['recipeName'] == "{{recipe_name_from_filename}}":
@@ -143,9 +204,62 @@ def send_recipe_to_openai(file_path, disable_streaming=None, return_json_filepat
     for index, ingredient in enumerate(result_json.get('ingredients', []), start=1):
         ingredient['ID'] = index
 
+    assign_aisles(result_json)
+    return result_json
+
+def parse_batch_response(full_response, fallback_names):
+    """Split the model's response to a batch prompt into one recipe JSON per recipe.
+
+    Args:
+        full_response (str): The model's response.
+        fallback_names (list): The recipe name to use for each recipe if the model gives none, in prompt order.
+
+    Returns:
+        list: The recipe JSON for each recipe, in prompt order. Recipes the model skipped, or returned without
+              any ingredients, are None so that only they need to be sent again.
+    """
+    results = [None] * len(fallback_names)
+    batch_json = parse_recipe_response(full_response, '')
+    if batch_json is None:
+        return results
+
+    recipes = batch_json.get('recipes')
+    if not isinstance(recipes, list):
+        print("The batch response has no list of recipes.")
+        return results
+
+    for position, recipe in enumerate(recipes):
+        if not isinstance(recipe, dict):
+            continue
+        # Trust the recipe number if the model gave a valid one, otherwise its position in the list
+        number = recipe.pop('recipeNumber', None)
+        index = number - 1 if isinstance(number, int) and 0 < number <= len(results) else position
+        if index >= len(results) or results[index] is not None:
+            continue
+        ingredients = recipe.get('ingredients')
+        if not isinstance(ingredients, list) or not ingredients:
+            continue
+
+        if not recipe.get('recipeName'):
+            recipe['recipeName'] = fallback_names[index]
+        # Assign sequential IDs to each ingredient
+        for ingredient_id, ingredient in enumerate(ingredients, start=1):
+            if isinstance(ingredient, dict):
+                ingredient['ID'] = ingredient_id
+        assign_aisles(recipe)
+        results[index] = recipe
+
+    return results
+
+def save_recipe_json(result_json, file_path):
+    """Save a recipe's JSON next to its source file, with the same name and a .json extension.
+
+    Returns:
+        str: The JSON file path.
+    """
     # Define the path for saving the JSON file in the same folder as the source file
     source_directory = os.path.dirname(file_path)
-    json_file_name = os.path.splitext(filename)[0] + '.json'
+    json_file_name = os.path.splitext(os.path.basename(file_path))[0] + '.json'
     json_file_path = os.path.join(source_directory, json_file_name)
 
     # Save the JSON content to a file
@@ -153,6 +267,93 @@ def send_recipe_to_openai(file_path, disable_streaming=None, return_json_filepat
         json.dump(result_json, json_file, indent=4)
 
     print(f"\nJSON content successfully saved to {json_file_path}")
+    return json_file_path
+
+def chunk_text(chunk):
+    """Return the text of one chunk of a streamed chat completion."""
+    try:
+        # Ensure we are accessing a dictionary or object with 'content' attribute
+        chunk_delta = chunk.choices[0].delta
+        return chunk_delta.content if hasattr(chunk_delta, 'content') else ''
+    except (KeyError, AttributeError, IndexError) as e:
+        # Print the error to help diagnose any issues
+        print(f"Error accessing content in chunk: {e}")
+        return ''
+
+def stream_recipe_response(final_prompt, model=MODEL):
+    """Stream the model's answer, parsing the JSON as it arrives.
+
+    If the answer stops being valid JSON, the stream is closed straight away and the request is made again.
+
+    Returns:
+        str or None: The full response, or None if every attempt was malformed.
+    """
+    def open_stream():
+        # Stream the response as it is being generated
+        return get_client().chat.completions.create(
+            model=model,
+            messages=build_messages(final_prompt),
+            stream=True  # Enable streaming
+        )
+
+    parser = stream_json_with_retries(open_stream, chunk_text)
+    return parser.text if parser else None
+
+def send_recipe_to_openai(file_path, disable_streaming=None, return_json_filepath=False):
+    """
+    Sends recipe content to OpenAI API, processes the response, and optionally returns the JSON file path.
+    
+    Args:
+        file_path (str): The path to the input file (.html or .txt) containing the recipe.
+        disable_streaming (bool, optional): If set, disables streaming response from OpenAI.
+        return_json_filepath (bool, optional): If True, the function returns the JSON file path.
+        
+    Returns:
+        str or None: Returns the JSON file path if return_json_filepath is True; otherwise, returns None.
+    """
+    # Only the ingredient lists are needed, so drop method steps, comments and page furniture first
+    dynamic_content = reduce_for_prompt(read_recipe_file(file_path), model=MODEL)
+
+    # Extract recipe name from filename as a fallback
+    fallback_name = recipe_name_from_filename(file_path)
+
+    # Identical recipe text has been extracted before, so skip the API call
+    cascade = get_model_cascade()
+    for model in cascade.models:
+        result_json = cached_recipe_json(dynamic_content, fallback_name, model=model)
+        if result_json is not None:
+            print("Recipe JSON served from the LLM response cache.")
+            json_file_path = save_recipe_json(result_json, file_path)
+            return json_file_path if return_json_filepath else None
+
+    final_prompt = build_recipe_prompt(dynamic_content, fallback_name)
+
+    def request(model):
+        if disable_streaming:
+            # If disable_streaming is set, generate response without streaming
+            response = get_client().chat.completions.create(
+                model=model,
+                messages=build_messages(final_prompt),
+                stream=False  # Disable streaming
+            )
+
+            # Collect the full response
+            full_response = response.choices[0].message.content
+
+        else:
+            full_response = stream_recipe_response(final_prompt, model=model)
+            if full_response is None:
+                return None
+
+        return parse_recipe_response(full_response, fallback_name)
+
+    # Try the cheapest model first and only ask a larger one if the answer fails validation
+    model, result_json = cascade.run(request, validate_recipe_json)
+    if result_json is None:
+        return None
+    cache_recipe_json(dynamic_content, fallback_name, result_json, model=model)
+
+    json_file_path = save_recipe_json(result_json, file_path)
 
     # Return the JSON file path if requested
     if return_json_filepath:
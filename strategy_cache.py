@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from disk_cache import cache_folder_path
+
+# The ways a recipe page can be scraped, cheapest first
+TIERS = ['structured', 'static', 'browser']
+
+# Every Nth visit to a domain tries the tiers in the default order again, so a site that
+# stops needing JavaScript (or starts publishing structured data) is noticed
+REPROBE_INTERVAL = 10
+
+def domain_of(url):
+    """Return the host of a URL without any 'www.' prefix."""
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+class StrategyCache:
+    """A persistent record of which scraping tier works for each domain.
+
+    Args:
+        path (str, optional): The JSON file the record is kept in.
+        reprobe_interval (int, optional): How often (in visits) the cheaper tiers are re-tried.
+    """
+
+    def __init__(self, path=None, reprobe_interval=REPROBE_INTERVAL):
+        self.path = path or os.path.join(cache_folder_path, 'strategies.json')
+        self.reprobe_interval = reprobe_interval
+        self._lock = threading.Lock()
+        self._dirty = False        # Visits counted since the record was last written
+        self._domains = self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        """Load the record from disk, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Write the record atomically. The caller holds the lock."""
+        folder = os.path.dirname(self.path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._domains, file, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def flush(self):
+        """Write the visits counted since the record was last saved."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def plan(self, url):
+        """Return the order in which to try the tiers for a URL and count the visit.
+
+        The tier that last succeeded on the domain goes first, followed by the others in the default order.
+        Unknown domains, and every reprobe_interval-th visit, use the default cheapest-first order. A domain
+        whose pages have no structured data therefore goes straight to the streamed static fetch, which can
+        stop once the recipe sections have arrived; looking for structured data may need the whole page.
+        """
+        with self._lock:
+            record = self._domains.setdefault(domain_of(url), {'visits': 0, 'preferred': None, 'tiers': {}})
+            record['visits'] += 1
+            preferred = record['preferred']
+            reprobe = record['visits'] % self.reprobe_interval == 0
+            # The visit is written with the outcome record() saves next, or at exit
+            self._dirty = True
+
+        if not preferred or reprobe:
+            return list(TIERS)
+        return [preferred] + [tier for tier in TIERS if tier != preferred]
+
+    def preferred_tier(self, url):
+        """Return the tier that last succeeded on a URL's domain, or None, without counting a visit."""
+        with self._lock:
+            record = self._domains.get(domain_of(url))
+            return record['preferred'] if record else None
+
+    def record(self, url, tier, success):
+        """Record the outcome of trying a tier on a URL."""
+        with self._lock:
+            record = self._domains.setdefault(domain_of(url), {'visits': 0, 'preferred': None, 'tiers': {}})
+            stats = record['tiers'].setdefault(tier, {'attempts': 0, 'successes': 0, 'last_success': None})
+            stats['attempts'] += 1
+            if success:
+                stats['successes'] += 1
+                stats['last_success'] = time.time()
+                record['preferred'] = tier
+            self._save()
+
+    def print_stats(self):
+        """Print the preferred tier and per-tier hit rates of every known domain."""
+        with self._lock:
+            domains = json.loads(json.dumps(self._domains))
+
+        if not domains:
+            return
+        print("\nScraping strategy per domain:")
+        for domain, record in sorted(domains.items()):
+            tiers = []
+            for tier in TIERS:
+                stats = record['tiers'].get(tier)
+                if not stats:
+                    continue
+                last = datetime.fromtimestamp(stats['last_success']).strftime('%Y-%m-%d') if stats['last_success'] else 'never'
+                tiers.append(f"{tier} {stats['successes']}/{stats['attempts']} (last success {last})")
+            print(f"  {domain}: prefers {record['preferred'] or 'nothing yet'} - {', '.join(tiers)}")
+
+_strategy_cache = None
+_strategy_cache_lock = threading.Lock()
+
+def get_strategy_cache():
+    """Return the shared strategy cache, creating it on first use."""
+    global _strategy_cache
+    with _strategy_cache_lock:
+        if _strategy_cache is None:
+            _strategy_cache = StrategyCache()
+        return _strategy_cache
+
+# Example usage:
+# get_strategy_cache().plan('https://www.madewithlau.com/recipes/vegetable-lo-mein')  # e.g. ['browser', 'structured', 'static']
@@ -0,0 +1,290 @@
+import json
+
+JSON_START = '[JSON_START]'
+JSON_END = '[JSON_END]'
+
+# A response that has not started its JSON after this many characters is not following the prompt
+MAX_PREAMBLE_CHARS = 2000
+
+# How many times a streamed request is made before giving up on malformed responses
+MAX_STREAM_ATTEMPTS = 2
+
+# Characters that can make up a number, true, false or null
+_LITERAL_CHARS = set('0123456789+-.eEtruefalsn')
+
+class MalformedResponseError(ValueError):
+    """Raised as soon as a streamed response can no longer be valid JSON in the expected format."""
+
+class StreamingJSONParser:
+    """Parses a model's JSON answer incrementally as the response streams in.
+
+    feed() takes each chunk of text and returns the objects inside arrays (e.g. each ingredient of a recipe,
+    or each item of a shopping list aisle) that were completed by that chunk, so they can be used before
+    the model has finished. The structure is checked character by character, so a response that stops
+    following the format raises MalformedResponseError straight away instead of after the whole answer.
+
+    Args:
+        allow_bare_json (bool, optional): Also accept JSON that is not wrapped in [JSON_START]/[JSON_END],
+            starting at the first '{'.
+        max_preamble (int, optional): How much text may come before the JSON starts.
+    """
+
+    def __init__(self, allow_bare_json=False, max_preamble=MAX_PREAMBLE_CHARS):
+        self.allow_bare_json = allow_bare_json
+        self.max_preamble = max_preamble
+        self._chunks = []          # The whole response, joined once at the end
+        self._json = []            # The characters of the JSON document
+        self._preamble = ''        # Text seen before the JSON started (bounded by max_preamble)
+        self._started = False
+        self._closed = False       # The root JSON value has been completed
+        self._tail = ''            # Text after the JSON, searched for JSON_END
+        self._bare = False
+
+        # Parser state
+        self._stack = []           # [container type, expecting ('key', 'colon', 'value', 'comma'), key of the current value]
+        self._in_string = False
+        self._escape = False
+        self._string = []          # Characters of the string being read, if it is a key
+        self._string_is_key = False
+        self._capture = None       # Characters of the array item object being read
+        self._capture_depth = None
+        self._capture_key = None
+
+    @property
+    def done(self):
+        """True once the JSON document is complete (and, if it was wrapped, JSON_END has arrived)."""
+        return self._closed and (self._bare or JSON_END in self._tail)
+
+    @property
+    def text(self):
+        """The full response received so far."""
+        return ''.join(self._chunks)
+
+    def result(self):
+        """Return the parsed JSON document once it is complete."""
+        if not self._closed:
+            raise MalformedResponseError("The response ended before the JSON was complete.")
+        try:
+            return json.loads(''.join(self._json))
+        except ValueError as e:
+            raise MalformedResponseError(f"Invalid JSON: {e}") from e
+
+    def feed(self, text):
+        """Parse the next chunk of the response.
+
+        Returns:
+            list: (key of the enclosing array, parsed object) for each array item completed by this chunk.
+        """
+        self._chunks.append(text)
+        if self._closed:
+            self._tail = (self._tail + text)[-len(JSON_END) * 4:]
+            return []
+
+        if not self._started:
+            text = self._find_start(text)
+            if text is None:
+                return []
+
+        completed = []
+        for index, char in enumerate(text):
+            if self._closed:
+                self._tail = (self._tail + text[index:])[-len(JSON_END) * 4:]
+                break
+            item = self._consume(char)
+            if item is not None:
+                completed.append(item)
+        return completed
+
+    def _find_start(self, text):
+        """Look for the start of the JSON in the preamble. Returns the text after it, or None if it has not started."""
+        self._preamble += text
+        marker = self._preamble.find(JSON_START)
+        brace = self._preamble.find('{') if self.allow_bare_json else -1
+        if marker != -1 and (brace == -1 or marker < brace):
+            rest = self._preamble[marker + len(JSON_START):]
+        elif brace != -1:
+            self._bare = True
+            rest = self._preamble[brace:]
+        else:
+            if len(self._preamble) > self.max_preamble:
+                raise MalformedResponseError(f"No JSON in the first {self.max_preamble} characters of the response.")
+            # Keep only enough to find a marker split across chunks
+            self._preamble = self._preamble[-len(JSON_START):]
+            return None
+        self._started = True
+        self._preamble = ''
+        return rest
+
+    def _fail(self, char, expected):
+        raise MalformedResponseError(f"Unexpected {char!r} in the response JSON, expected {expected}.")
+
+    def _consume(self, char):
+        """Advance the parser by one character. Returns a completed array item, if any."""
+        if self._capture is not None:
+            self._capture.append(char)
+
+        if self._in_string:
+            self._json.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self._stack[-1][2] = ''.join(self._string)
+                    self._stack[-1][1] = 'colon'
+                else:
+                    self._value_done()
+            elif self._string_is_key:
+                self._string.append(char)
+            return None
+
+        if char.isspace():
+            if self._json:
+                self._json.append(char)
+            return None
+
+        expecting = self._stack[-1][1] if self._stack else 'value'
+        if not self._stack and self._json:
+            self._fail(char, 'the end of the JSON')
+        if expecting == 'literal':
+            if char in _LITERAL_CHARS:
+                self._json.append(char)
+                return None
+            # The number/true/false/null ended, this character follows it
+            self._stack.pop()
+            self._value_done()
+            expecting = self._stack[-1][1] if self._stack else 'value'
+
+        if not self._stack and not self._json and char != '{':
+            self._fail(char, "'{' to start the JSON")
+        self._json.append(char)
+
+        if expecting == 'key':
+            if char == '"':
+                self._start_string(is_key=True)
+            elif char == '}' and self._stack[-1][3] == 0:
+                return self._close('object')
+            else:
+                self._fail(char, 'a key')
+        elif expecting == 'colon':
+            if char != ':':
+                self._fail(char, "':'")
+            self._stack[-1][1] = 'value'
+        elif expecting == 'comma':
+            if char == ',':
+                container = self._stack[-1]
+                container[1] = 'key' if container[0] == 'object' else 'value'
+                container[3] += 1
+            elif char == '}' and self._stack[-1][0] == 'object':
+                return self._close('object')
+            elif char == ']' and self._stack[-1][0] == 'array':
+                return self._close('array')
+            else:
+                self._fail(char, "',' or the end of the " + self._stack[-1][0])
+        else:  # expecting a value
+            if char == ']' and self._stack and self._stack[-1][0] == 'array' and self._stack[-1][3] == 0:
+                return self._close('array')
+            if char == '{':
+                self._open('object')
+            elif char == '[':
+                self._open('array')
+            elif char == '"':
+                self._start_string(is_key=False)
+            elif char in _LITERAL_CHARS:
+                self._stack.append(['literal', 'literal', None, 0])
+            else:
+                self._fail(char, 'a value')
+        return None
+
+    def _start_string(self, is_key):
+        self._in_string = True
+        self._string_is_key = is_key
+        self._string = []
+
+    def _open(self, kind):
+        parent = self._stack[-1] if self._stack else None
+        if kind == 'object' and parent is not None and parent[0] == 'array' and self._capture is None:
+            # An object directly inside an array is an item to hand out as soon as it closes
+            self._capture = ['{']
+            self._capture_depth = len(self._stack)
+            self._capture_key = parent[2]
+        key = parent[2] if parent is not None else None
+        self._stack.append([kind, 'key' if kind == 'object' else 'value', key, 0])
+
+    def _close(self, kind):
+        self._stack.pop()
+        item = None
+        if kind == 'object' and self._capture is not None and len(self._stack) == self._capture_depth:
+            try:
+                item = (self._capture_key, json.loads(''.join(self._capture)))
+            except ValueError as e:
+                raise MalformedResponseError(f"Invalid JSON object in the response: {e}") from e
+            self._capture = None
+        self._value_done()
+        return item
+
+    def _value_done(self):
+        """A value has ended: its container now expects a comma or its end, or the document is complete."""
+        if self._stack:
+            self._stack[-1][1] = 'comma'
+        else:
+            self._closed = True
+
+def consume_stream(text_chunks, parser, on_item=None):
+    """Feed a stream of text chunks to a parser, printing each chunk as it arrives.
+
+    Reading stops as soon as the JSON is complete, so nothing after [JSON_END] is waited for.
+
+    Args:
+        text_chunks (iterable): The response text, chunk by chunk.
+        parser (StreamingJSONParser): The parser to feed.
+        on_item (callable, optional): Called with (key of the enclosing array, object) for each completed array item.
+
+    Raises:
+        MalformedResponseError: As soon as the response stops being valid JSON.
+    """
+    for chunk_text in text_chunks:
+        print(chunk_text, end='')  # Print each chunk of text as it arrives
+        for key, item in parser.feed(chunk_text):
+            if on_item:
+                on_item(key, item)
+        if parser.done:
+            break
+    print("\n\nFull response received.")
+
+def stream_json_with_retries(open_stream, chunk_text, allow_bare_json=False, on_item=None, attempts=MAX_STREAM_ATTEMPTS):
+    """Stream a response and parse its JSON as it arrives, asking again if the response is malformed.
+
+    A malformed stream is closed as soon as the problem is seen, so no more of it is generated or paid for.
+
+    Args:
+        open_stream (callable): Makes the streamed request and returns the stream.
+        chunk_text (callable): Returns the text of one chunk of the stream.
+        allow_bare_json (bool, optional): Also accept JSON that is not wrapped in [JSON_START]/[JSON_END].
+        on_item (callable, optional): Called with (key of the enclosing array, object) for each completed array item.
+        attempts (int, optional): How many times to make the request.
+
+    Returns:
+        StreamingJSONParser or None: The parser holding the complete response, or None if every attempt was malformed.
+    """
+    for attempt in range(1, attempts + 1):
+        stream = open_stream()
+        parser = StreamingJSONParser(allow_bare_json=allow_bare_json)
+        try:
+            consume_stream((chunk_text(chunk) or '' for chunk in stream), parser, on_item)
+        except MalformedResponseError as e:
+            print(f"\n\nMalformed response on attempt {attempt} of {attempts}: {e}")
+            continue
+        finally:
+            stream.close()
+        return parser
+    return None
+
+# Example usage:
+# parser = StreamingJSONParser()
+# for chunk in stream:
+#     for key, item in parser.feed(chunk):
+#         print(key, item)
+# recipe = parser.result()
@@ -0,0 +1,162 @@
+import codecs
+from html.parser import HTMLParser
+from section_extractor import HEADER_TAGS, CONTAINER_TAGS
+
+# Never download more than this from one page
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+
+# After the ingredients and method sections have closed, keep reading this much in case another
+# recipe section (e.g. a recipe card after the blog post) follows
+GRACE_BYTES = 128 * 1024
+
+# Same rule as scrape_with_beautifulsoup: a section needs more than this many words
+MIN_SECTION_WORDS = 10
+
+INGREDIENT_KEYWORDS = ["ingredients"]
+INSTRUCTION_KEYWORDS = ["method", "instructions", "directions", "steps", "preparation"]
+
+# Elements that never have a closing tag, so they are not pushed on the open element stack
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+class SectionWatcher(HTMLParser):
+    """An incremental parser that notices when a page's ingredients and method sections have closed.
+
+    A section counts as closed once a classed section/div/span that contained its header also closes
+    with more than MIN_SECTION_WORDS words after the header. That element is the same as, or an ancestor
+    of, the one the section extractor will pick, so everything it needs has been downloaded.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []            # (tag name, has class) for every open element
+        self.open_sections = []    # [kind, depth of the header, words seen since the header]
+        self.closed = set()        # Kinds of section ('ingredients', 'instructions') that have closed
+        self.header_text = None    # Text of the header being read, if inside one
+        self.header_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        if tag in HEADER_TAGS:
+            self.header_text = []
+            self.header_depth = len(self.stack)
+        self.stack.append((tag, any(name == 'class' for name, _ in attrs)))
+
+    def handle_endtag(self, tag):
+        # Pop back to the matching element, tolerating unclosed children as browsers do
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        closing = self.stack[index:]
+        del self.stack[index:]
+
+        if tag in HEADER_TAGS and self.header_text is not None:
+            self._header_closed(' '.join(self.header_text).lower())
+            self.header_text = None
+
+        for offset, (name, has_class) in enumerate(closing):
+            if name in CONTAINER_TAGS and has_class:
+                self._container_closed(index + offset)
+
+    def handle_data(self, data):
+        # Script and style contents are not text, get_text() skips them too
+        if self.stack and self.stack[-1][0] in ('script', 'style'):
+            return
+        if self.header_text is not None:
+            self.header_text.append(data)
+        words = len(data.split())
+        if words:
+            for section in self.open_sections:
+                section[2] += words
+
+    def _header_closed(self, text):
+        """Start tracking a section if the header mentions ingredients or instructions."""
+        if any(keyword in text for keyword in INGREDIENT_KEYWORDS):
+            self.open_sections.append(['ingredients', self.header_depth, 0])
+        elif any(keyword in text for keyword in INSTRUCTION_KEYWORDS):
+            self.open_sections.append(['instructions', self.header_depth, 0])
+
+    def _container_closed(self, depth):
+        """Close every tracked section whose header sat inside the container that just closed.
+
+        Only a container above the header counts; a sibling of the header closing at its depth does not.
+        """
+        still_open = []
+        for section in self.open_sections:
+            kind, header_depth, words = section
+            if depth < header_depth and words > MIN_SECTION_WORDS:
+                self.closed.add(kind)
+            else:
+                still_open.append(section)
+        self.open_sections = still_open
+
+    @property
+    def done(self):
+        """True once both an ingredients and an instructions section have closed and none is still open."""
+        return {'ingredients', 'instructions'} <= self.closed and not self.open_sections
+
+def read_streamed_body(response, max_bytes=DEFAULT_MAX_BYTES, chunk_size=CHUNK_SIZE, grace_bytes=GRACE_BYTES):
+    """Read a streamed response until the recipe sections have closed or max_bytes is reached.
+
+    Args:
+        response (requests.Response): A response opened with stream=True. It is closed before returning.
+        max_bytes (int, optional): The most bytes to download.
+        chunk_size (int, optional): The size of each read.
+        grace_bytes (int, optional): How much more to read once the sections have closed.
+
+    Returns:
+        tuple: (body bytes, stats dict with 'bytes_read' (decompressed), 'content_length', 'stopped_early'
+               and 'bytes_saved' (None if the server did not send a Content-Length)).
+    """
+    watcher = SectionWatcher()
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    chunks = []
+    bytes_read = 0
+    done_at = None
+    stopped_early = False
+
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            chunks.append(chunk)
+            bytes_read += len(chunk)
+            watcher.feed(decoder.decode(chunk))
+
+            if watcher.done:
+                if done_at is None:
+                    done_at = bytes_read
+                elif bytes_read - done_at >= grace_bytes:
+                    stopped_early = True
+                    break
+            else:
+                # Another recipe section opened during the grace period, wait for it to close too
+                done_at = None
+
+            if bytes_read >= max_bytes:
+                stopped_early = True
+                break
+    finally:
+        try:
+            wire_bytes = response.raw.tell()
+        except (AttributeError, OSError):
+            wire_bytes = bytes_read
+        response.close()
+
+    # Content-Length counts the bytes on the wire, which are compressed for most pages
+    content_length = response.headers.get('Content-Length')
+    content_length = int(content_length) if content_length and content_length.isdigit() else None
+    bytes_saved = max(content_length - wire_bytes, 0) if content_length else None
+
+    stats = {
+        'bytes_read': bytes_read,
+        'content_length': content_length,
+        'stopped_early': stopped_early,
+        'bytes_saved': bytes_saved,
+    }
+    return b''.join(chunks), stats
+
+# Example usage:
+# response = session.get(url, stream=True, timeout=10)
+# body, stats = read_streamed_body(response)
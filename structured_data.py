@@ -0,0 +1,130 @@
+import os
+import re
+import json
+import html
+import requests
+from scrape_with_beautifulsoup import fetch_page, url_to_filename
+from ingredient_parser import build_ingredient_entries
+
+# Get the root directory of the application (the directory where this script is located)
+root_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Define the path for the 'temp' folder
+temp_folder_path = os.path.join(root_directory, 'temp')
+
+JSON_LD_RE = re.compile(
+    r'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+
+def _is_recipe(node):
+    """Check if a JSON-LD node has the schema.org Recipe type."""
+    node_type = node.get('@type')
+    if isinstance(node_type, list):
+        return 'Recipe' in node_type
+    return node_type == 'Recipe'
+
+def _walk(node):
+    """Yield every object in a JSON-LD document, including those inside @graph lists."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ('@graph', 'mainEntity', 'mainEntityOfPage'):
+            if isinstance(node.get(key), (list, dict)):
+                yield from _walk(node[key])
+
+def find_json_ld_recipe(page_html):
+    """Find the first schema.org Recipe object with ingredients embedded in a page.
+
+    Args:
+        page_html (str or bytes): The raw HTML of the page.
+
+    Returns:
+        dict or None: The Recipe object, or None if the page has no usable structured data.
+    """
+    if isinstance(page_html, bytes):
+        page_html = page_html.decode('utf-8', errors='replace')
+
+    for match in JSON_LD_RE.finditer(page_html):
+        try:
+            # strict=False lets through the raw newlines and tabs many sites leave inside strings
+            document = json.loads(match.group(1).strip(), strict=False)
+        except ValueError:
+            continue
+
+        for node in _walk(document):
+            if _is_recipe(node):
+                ingredients = node.get('recipeIngredient') or node.get('ingredients')
+                if isinstance(ingredients, list) and any(isinstance(item, str) and item.strip() for item in ingredients):
+                    return node
+    return None
+
+def _clean_text(text):
+    """Unescape HTML entities and drop any tags left inside a JSON-LD string."""
+    text = html.unescape(html.unescape(str(text)))  # Some sites double-escape their entities
+    return re.sub(r'<[^>]+>', '', text).strip()
+
+def recipe_to_ingredient_json(recipe, fallback_name):
+    """Convert a schema.org Recipe into the same JSON structure send_recipe_to_openai produces.
+
+    Args:
+        recipe (dict): The Recipe object.
+        fallback_name (str): The recipe name to use if the object has none.
+
+    Returns:
+        dict: {'recipeName': ..., 'ingredients': [...]} with quantity, unittype, ingredient, aisle and ID per ingredient.
+    """
+    ingredients = recipe.get('recipeIngredient') or recipe.get('ingredients') or []
+    lines = [_clean_text(item) for item in ingredients if isinstance(item, str)]
+    return {
+        'recipeName': _clean_text(recipe.get('name') or '') or fallback_name,
+        'ingredients': build_ingredient_entries(lines),
+    }
+
+def scrape_structured_recipe(url):
+    """Build the recipe's ingredient JSON straight from its schema.org structured data, with no LLM call.
+
+    Args:
+        url (str): The recipe page.
+
+    Returns:
+        str or None: The path of the saved JSON file, or None if the page has no Recipe structured data.
+    """
+    try:
+        # The streamed download usually holds the JSON-LD, and is the same one the static tier reads
+        page_html = fetch_page(url)
+        recipe = find_json_ld_recipe(page_html)
+        if recipe is None:
+            # JSON-LD can also sit at the end of the body, after the point a streamed fetch stops at. A page
+            # that was read in full is served from the page cache here rather than downloaded again.
+            full_html = fetch_page(url, stream=False)
+            if full_html != page_html:
+                recipe = find_json_ld_recipe(full_html)
+    except requests.exceptions.RequestException as e:
+        print(f"Error occurred during the request: {e}")
+        return None
+
+    if recipe is None:
+        print(f"No schema.org Recipe data found on {url}.")
+        return None
+
+    # Name the JSON file the same way send_recipe_to_openai names it from the scraped text file
+    base_name = os.path.splitext(url_to_filename(url))[0]
+    fallback_name = base_name.replace('-', ' ').title()
+    result_json = recipe_to_ingredient_json(recipe, fallback_name)
+
+    # Ensure the 'temp' folder exists
+    if not os.path.exists(temp_folder_path):
+        os.makedirs(temp_folder_path)
+
+    json_file_path = os.path.join(temp_folder_path, base_name + '.json')
+    with open(json_file_path, 'w', encoding='utf-8') as json_file:
+        json.dump(result_json, json_file, indent=4)
+
+    print(f"Recipe '{result_json['recipeName']}' read from structured data with {len(result_json['ingredients'])} ingredients, saved to {json_file_path}")
+    return json_file_path
+
+# Example usage:
+# scrape_structured_recipe('https://www.bbcgoodfood.com/recipes/easy-pancakes')
@@ -0,0 +1,160 @@
+import re
+from ingredient_parser import parse_ingredient_line, normalise_fractions, QUALITATIVE_UNITS
+
+# The most recipe text tokens sent with a prompt. An ingredient list rarely needs a third of this.
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Ingredient lines are short; anything longer is a method step or a paragraph
+MAX_INGREDIENT_WORDS = 14
+
+# A block needs at least this many ingredient-like lines to count as an ingredient list
+MIN_BLOCK_LINES = 2
+
+INGREDIENT_HEADER_RE = re.compile(r'^\W*ingredients?\b', re.IGNORECASE)
+STOP_HEADER_RE = re.compile(r'^\W*(?:method|instructions|directions|steps|preparation|notes?|nutrition|equipment)\b', re.IGNORECASE)
+BULLET_RE = re.compile(r'^\s*(?:[•*▢☐□◦·‣-]|\d+\.\s+(?=\d))')
+
+_encodings = {}
+
+def _get_encoding(model):
+    """Load the tiktoken encoding for a model once, or return None if tiktoken (or its data) is unavailable."""
+    if model not in _encodings:
+        try:
+            import tiktoken
+
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            # tiktoken is not installed, or could not download the encoding file
+            print(f"Exact token counting unavailable ({type(e).__name__}), estimating from the text length.")
+            _encodings[model] = None
+    return _encodings[model]
+
+def count_tokens(text, model='gpt-4'):
+    """Count the tokens in a text with the model's tokenizer, or estimate them (about 4 characters per token)."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def is_ingredient_line(line):
+    """Check if a line looks like one ingredient: short, not a sentence, and with a quantity, unit or bullet."""
+    words = line.split()
+    if not words or len(words) > MAX_INGREDIENT_WORDS:
+        return False
+    if line.rstrip().endswith('.') and len(words) > 6:
+        return False
+    if BULLET_RE.match(line):
+        return True
+    lower = line.lower()
+    if any(unit in lower for unit in QUALITATIVE_UNITS):
+        return True
+    parsed = parse_ingredient_line(normalise_fractions(line))
+    return bool(parsed['quantity'] or parsed['unittype']) and bool(parsed['ingredient'])
+
+def is_sub_header(line):
+    """Check if a line is a short heading inside an ingredient list, e.g. 'For the sauce:'."""
+    words = line.split()
+    return 0 < len(words) <= 5 and (line.rstrip().endswith(':') or line.lower().startswith('for the '))
+
+def dedupe_lines(lines):
+    """Drop repeated lines (e.g. a recipe card printed twice on the page), keeping the first of each."""
+    seen = set()
+    unique = []
+    for line in lines:
+        key = ' '.join(line.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(line.strip())
+    return unique
+
+def find_ingredient_blocks(lines):
+    """Find the runs of lines that make up ingredient lists.
+
+    A block starts at an 'Ingredients' header or an ingredient-like line and continues through ingredient
+    lines, sub-headings and single stray lines (e.g. a wrapped ingredient), until a method/notes header or
+    two non-ingredient lines in a row.
+
+    Returns:
+        list: (start, end) line index ranges of blocks with at least MIN_BLOCK_LINES ingredient lines.
+    """
+    flags = [is_ingredient_line(line) for line in lines]
+    blocks = []
+    index = 0
+    while index < len(lines):
+        if not (flags[index] or INGREDIENT_HEADER_RE.match(lines[index])):
+            index += 1
+            continue
+
+        start = end = index
+        count = int(flags[index])
+        index += 1
+        while index < len(lines) and not STOP_HEADER_RE.match(lines[index]):
+            if flags[index]:
+                count += 1
+                end = index
+            elif not (is_sub_header(lines[index]) or (index + 1 < len(lines) and flags[index + 1])):
+                break
+            index += 1
+
+        if count >= MIN_BLOCK_LINES:
+            blocks.append((start, end + 1))
+    return blocks
+
+def trim_to_budget(text, token_budget, model='gpt-4'):
+    """Cut a text at a line boundary so it fits in token_budget tokens."""
+    if count_tokens(text, model) <= token_budget:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        line_tokens = count_tokens(line + '\n', model)
+        if used + line_tokens > token_budget:
+            break
+        kept.append(line)
+        used += line_tokens
+    return '\n'.join(kept)
+
+def reduce_recipe_text(text, token_budget=DEFAULT_TOKEN_BUDGET, model='gpt-4'):
+    """Cut scraped or OCR'd recipe text down to the ingredient lists before it is sent to the LLM.
+
+    Repeated lines are dropped, the ingredient blocks are kept together with their headings, and the
+    result is trimmed to the token budget. If no ingredient list can be recognised, the de-duplicated
+    text is sent (within the budget) so the LLM can still find the ingredients.
+
+    Args:
+        text (str): The recipe text.
+        token_budget (int, optional): The most tokens to keep.
+        model (str, optional): The model whose tokenizer is used for counting.
+
+    Returns:
+        tuple: (reduced text, stats dict with 'tokens_before', 'tokens_after' and 'blocks').
+    """
+    lines = dedupe_lines(text.splitlines())
+    blocks = find_ingredient_blocks(lines)
+    if blocks:
+        reduced = '\n\n'.join('\n'.join(lines[start:end]) for start, end in blocks)
+    else:
+        reduced = '\n'.join(lines)
+    reduced = trim_to_budget(reduced, token_budget, model)
+
+    stats = {
+        'tokens_before': count_tokens(text, model),
+        'tokens_after': count_tokens(reduced, model),
+        'blocks': len(blocks),
+    }
+    return reduced, stats
+
+def reduce_for_prompt(text, token_budget=DEFAULT_TOKEN_BUDGET, model='gpt-4'):
+    """Reduce recipe text for a prompt and print how many tokens were saved."""
+    reduced, stats = reduce_recipe_text(text, token_budget, model)
+    before, after = stats['tokens_before'], stats['tokens_after']
+    saved = (1 - after / before) * 100 if before else 0
+    print(f"Recipe text reduced from {before} to {after} tokens ({saved:.0f}% fewer, "
+          f"{stats['blocks']} ingredient blocks found).")
+    return reduced
+
+# Example usage:
+# reduced_text = reduce_for_prompt(open('/path/to/recipe.txt', encoding='utf-8').read())
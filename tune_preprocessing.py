@@ -0,0 +1,142 @@
+import os
+import glob
+import time
+import argparse
+import difflib
+import cv2
+from ocr_engine import create_engine
+from scrape_text_from_image import (
+    DEFAULT_PREPROCESS_CONFIG, IMAGE_EXTENSIONS, OCR_INGREDIENTS_ONLY, PREPROCESS_CONFIG_PATH,
+    load_preprocess_config, read_array_text, save_preprocess_config,
+)
+
+# Preprocessing variants to compare, as changes to the default settings
+VARIANTS = {
+    'default': {},
+    'no-blur': {'median_blur': 0},
+    'no-contrast': {'alpha': 1.0},
+    'block-31': {'block_size': 31, 'c': 7},
+    'otsu': {'threshold': 'otsu'},
+    'otsu-no-blur': {'threshold': 'otsu', 'median_blur': 0},
+    'downscale-2500': {'max_side': 2500},
+    'downscale-2000': {'max_side': 2000},
+    'downscale-2000-no-blur': {'max_side': 2000, 'median_blur': 0},
+    'otsu-2000-no-blur': {'threshold': 'otsu', 'max_side': 2000, 'median_blur': 0},
+}
+
+# When no floor is given, a variant may lose at most this much accuracy compared with the default settings
+DEFAULT_ACCURACY_MARGIN = 0.01
+
+def load_corpus(corpus_directory):
+    """Load every image in a folder that has its ground-truth text next to it (photo.jpg + photo.txt).
+
+    The ground truth is the text the app should read: the ingredient list when only ingredient lists are OCR'd.
+
+    Returns:
+        list: (image name, decoded image, ground-truth text). Images are decoded once, so decoding is not timed.
+    """
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(corpus_directory, '*'))):
+        truth_path = os.path.splitext(path)[0] + '.txt'
+        if not path.lower().endswith(IMAGE_EXTENSIONS) or not os.path.exists(truth_path):
+            continue
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Skipping unreadable image {path}")
+            continue
+        with open(truth_path, 'r', encoding='utf-8') as file:
+            corpus.append((os.path.basename(path), img, file.read()))
+    return corpus
+
+def character_accuracy(text, truth):
+    """Return the share of characters that match the ground truth, ignoring differences in whitespace.
+
+    Matching characters are counted against the longer of the two texts, so both missed and spurious
+    characters lower the score.
+    """
+    text, truth = ' '.join(text.split()), ' '.join(truth.split())
+    if not text and not truth:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, text, truth, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    return matched / max(len(text), len(truth))
+
+def run_variant(config, corpus, engine, ingredients_only=OCR_INGREDIENTS_ONLY):
+    """Preprocess and OCR the corpus with one configuration, the same way the app reads images.
+
+    With ingredients_only, the ingredient list is located and only it is OCR'd, as scrape_text_from_image does.
+
+    Returns:
+        tuple: (total preprocessing + OCR seconds, mean character accuracy).
+    """
+    total_time = 0.0
+    accuracies = []
+    for _, img, truth in corpus:
+        start = time.perf_counter()
+        text = read_array_text(img, ingredients_only, config, engine, verbose=False)
+        total_time += time.perf_counter() - start
+        accuracies.append(character_accuracy(text, truth))
+    return total_time, sum(accuracies) / len(accuracies)
+
+def tune(corpus_directory, floor=None, save=False, ingredients_only=OCR_INGREDIENTS_ONLY):
+    """Benchmark every preprocessing variant and pick the fastest one that meets the accuracy floor.
+
+    Args:
+        corpus_directory (str): A folder of recipe images, each with a .txt file holding its true text.
+        floor (float, optional): The lowest acceptable mean character accuracy (0-1). Defaults to the
+            accuracy of the default settings minus DEFAULT_ACCURACY_MARGIN.
+        save (bool, optional): Save the chosen settings for preprocess_image to use.
+        ingredients_only (bool, optional): OCR only each image's ingredient list, as the app does by default.
+
+    Returns:
+        dict or None: The chosen settings, or None if no variant meets the floor.
+    """
+    corpus = load_corpus(corpus_directory)
+    if not corpus:
+        print(f"No images with ground-truth .txt files found in {corpus_directory}.")
+        return None
+
+    variants = {name: dict(DEFAULT_PREPROCESS_CONFIG, **changes) for name, changes in VARIANTS.items()}
+    current = load_preprocess_config()
+    if current not in variants.values():
+        variants['current'] = current
+
+    engine = create_engine()
+    target = "ingredient lists" if ingredients_only else "whole pages"
+    print(f"Tuning preprocessing on the {target} of {len(corpus)} images from {corpus_directory} with {engine.name}.\n")
+    print(f"{'variant':<26}{'time (s)':>10}{'per image (s)':>15}{'accuracy':>10}")
+    results = {}
+    for name, config in variants.items():
+        total_time, accuracy = run_variant(config, corpus, engine, ingredients_only)
+        results[name] = (total_time, accuracy)
+        print(f"{name:<26}{total_time:>10.2f}{total_time / len(corpus):>15.3f}{accuracy:>10.1%}")
+    engine.close()
+
+    if floor is None:
+        floor = results['default'][1] - DEFAULT_ACCURACY_MARGIN
+    eligible = [name for name, (_, accuracy) in results.items() if accuracy >= floor]
+    if not eligible:
+        print(f"\nNo variant reaches the accuracy floor of {floor:.1%}.")
+        return None
+
+    best = min(eligible, key=lambda name: results[name][0])
+    speedup = results['default'][0] / results[best][0] if results[best][0] else float('inf')
+    print(f"\nFastest variant with at least {floor:.1%} accuracy: {best} "
+          f"({results[best][1]:.1%} accuracy, {speedup:.2f}x the speed of the default settings).")
+    if save:
+        save_preprocess_config(variants[best])
+    else:
+        print(f"Run again with --save to write it to {PREPROCESS_CONFIG_PATH}.")
+    return variants[best]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark OCR preprocessing settings and pick the fastest accurate one.")
+    parser.add_argument('corpus', help="Folder of recipe images, each with a .txt file of its true text (photo.jpg + photo.txt)")
+    parser.add_argument('--floor', type=float, help="Lowest acceptable mean character accuracy between 0 and 1")
+    parser.add_argument('--save', action='store_true', help="Save the chosen settings for preprocess_image to use")
+    parser.add_argument('--full-page', action='store_true', help="OCR whole pages instead of only the ingredient lists")
+    args = parser.parse_args()
+    tune(args.corpus, args.floor, args.save, ingredients_only=OCR_INGREDIENTS_ONLY and not args.full_page)
+
+# Example usage:
+# python tune_preprocessing.py /path/to/ocr/corpus --floor 0.95 --save